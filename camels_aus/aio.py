@@ -0,0 +1,60 @@
+"""Support for the asynchronous loaders of `CamelsAus`, used inside asyncio services.
+
+Blocking work (parsing files) runs in an executor. Concurrent requests for the same result,
+identified by a key, share a single task: several coroutines asking for `streamflow_mmd` at
+once trigger one parse. A caller may be cancelled without affecting the others; the shared
+task itself is cancelled when the last caller waiting for it is.
+"""
+
+import asyncio
+from typing import Any, Awaitable, Callable, Dict, Hashable
+
+
+class SharedTasks:
+    """Tasks shared by the concurrent callers asking for the same key, within an event loop"""
+
+    def __init__(self) -> None:
+        self._tasks: Dict[Hashable, asyncio.Future] = {}
+        self._waiters: Dict[asyncio.Future, int] = {}
+        self.started = 0
+
+    def __contains__(self, key: Hashable) -> bool:
+        return key in self._tasks
+
+    def __len__(self) -> int:
+        return len(self._tasks)
+
+    def _forget(self, key: Hashable, task: asyncio.Future) -> None:
+        if self._tasks.get(key) is task:
+            del self._tasks[key]
+
+    async def run(self, key: Hashable, start: Callable[[], Awaitable]) -> Any:
+        """Result of the task of a key, started if no task of this key is in progress
+
+        Args:
+            key (Hashable): identifies the result, e.g. ("daily", directory, varname)
+            start (Callable[[], Awaitable]): starts the work, e.g. `lambda: loop.run_in_executor(executor, f)`
+
+        Returns:
+            Any: result of the task; its exception is raised to all the callers
+        """
+        task = self._tasks.get(key)
+        if task is None:
+            task = asyncio.ensure_future(start())
+            self._tasks[key] = task
+            self._waiters[task] = 0
+            self.started += 1
+            task.add_done_callback(lambda t: self._forget(key, t))
+        self._waiters[task] += 1
+        try:
+            return await asyncio.shield(task)
+        except asyncio.CancelledError:
+            if self._waiters[task] == 1 and not task.done():
+                # the last caller: nobody needs the result any more
+                task.cancel()
+                self._forget(key, task)
+            raise
+        finally:
+            self._waiters[task] -= 1
+            if self._waiters[task] == 0:
+                del self._waiters[task]
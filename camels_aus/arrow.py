@@ -0,0 +1,216 @@
+"""Arrow views of the CAMELS-AUS dataset in memory, without copying the data arrays.
+
+Daily series are exposed in long format, one row per (day, station), as a stream of record
+batches of whole days. For time-major (time, station) arrays, C-ordered as in the binary cache,
+the rows of a block of days are a contiguous range of each array: the value columns of a batch
+wrap the NumPy buffers of the dataset, including memory-mapped ones, without copy; other arrays,
+e.g. as parsed from the CSV files, are copied once to a time-major array. Only the key
+columns are built: `station_id`, a dictionary column whose indices are the same buffer for all
+batches, and `time`, a timestamp column of the size of one batch.
+
+Station attributes are exposed as a table with the same `station_id` dictionary, so that the
+daily series and the attributes can be joined on the dictionary indices. Numeric attributes are
+wrapped without copy; attributes stored as integer codes by a dtype policy (see
+`camels_aus.dtypes`) become dictionary columns wrapping the codes.
+
+Polars and DuckDB read these objects directly, e.g. `polars.from_arrow(table)` or
+`duckdb.sql("select ... from reader")` with `reader` a local variable.
+
+Requires the optional dependency `pyarrow`.
+"""
+
+from typing import List
+
+import numpy as np
+
+from .conventions import (
+    STATION_ID_VARNAME,
+    TIME_DIM_NAME,
+    XR_UNITS_ATTRIB_ID,
+    get_xr_units,
+)
+from .dtypes import CATEGORIES_ATTRIB_ID
+
+DEFAULT_BATCH_DAYS = 366
+"""Default number of days per record batch"""
+
+
+def _pyarrow():
+    try:
+        import pyarrow as pa
+    except ImportError:
+        raise ImportError(
+            "Arrow views require the optional package 'pyarrow' (pip install pyarrow)"
+        )
+    return pa
+
+
+def _metadata(da):
+    units = get_xr_units(da)
+    return {XR_UNITS_ATTRIB_ID.encode(): units.encode()} if units else None
+
+
+def _station_type(pa):
+    return pa.dictionary(pa.int32(), pa.string())
+
+
+def _station_dictionary(pa, ds):
+    return pa.array([str(s) for s in ds[STATION_ID_VARNAME].values], type=pa.string())
+
+
+def _daily_varnames(ds, varnames: List[str] = None) -> List[str]:
+    if varnames is None:
+        varnames = [
+            v
+            for v in ds.data_vars
+            if ds[v].dims == (TIME_DIM_NAME, STATION_ID_VARNAME)
+            and (ds[v].dtype.kind in "biuf" or CATEGORIES_ATTRIB_ID in ds[v].attrs)
+        ]
+    for v in varnames:
+        if ds[v].dims != (TIME_DIM_NAME, STATION_ID_VARNAME):
+            raise ValueError(
+                "{0} is not a daily series of dimensions (time, station_id)".format(v)
+            )
+    return varnames
+
+
+def _values_array(pa, values: np.ndarray, attrs, nan_as_null: bool):
+    # wraps numeric values without copy; only strings are converted
+    if CATEGORIES_ATTRIB_ID in attrs:
+        # integer codes of a dtype policy, -1 for missing
+        codes = pa.array(values, mask=values < 0).cast(pa.int32())
+        return pa.DictionaryArray.from_arrays(
+            codes, pa.array(list(attrs[CATEGORIES_ATTRIB_ID]), type=pa.string())
+        )
+    if values.dtype.kind == "O":
+        return pa.array(values, type=pa.string(), from_pandas=True)
+    return pa.array(values, from_pandas=nan_as_null)
+
+
+def daily_schema(ds, varnames: List[str] = None, attributes: List[str] = None):
+    """Schema of the record batches of `daily_batches`"""
+    pa = _pyarrow()
+    fields = [
+        pa.field(TIME_DIM_NAME, pa.timestamp("ns"), nullable=False),
+        pa.field(STATION_ID_VARNAME, _station_type(pa), nullable=False),
+    ]
+    for v in _daily_varnames(ds, varnames) + list(attributes or []):
+        a = _values_array(pa, ds[v].values[:0].ravel(), ds[v].attrs, True)
+        fields.append(pa.field(v, a.type, metadata=_metadata(ds[v])))
+    return pa.schema(fields)
+
+
+def daily_batches(
+    ds,
+    varnames: List[str] = None,
+    batch_days: int = DEFAULT_BATCH_DAYS,
+    nan_as_null: bool = True,
+    attributes: List[str] = None,
+):
+    """Record batches of the daily series in long format, blocks of whole days
+
+    Args:
+        ds (xr.Dataset): dataset, typically `CamelsAus.data`
+        varnames (List[str], optional): daily series. Defaults to None, all numeric or integer coded daily series.
+        batch_days (int, optional): number of days per batch. Defaults to DEFAULT_BATCH_DAYS.
+        nan_as_null (bool, optional): mark NaN values as nulls, with a validity bitmap; the values are still not copied. Defaults to True.
+        attributes (List[str], optional): station attributes repeated on each row, e.g. "drainage_division",
+            taken from the attribute columns by station index. Defaults to None.
+
+    Yields:
+        pa.RecordBatch: columns `time`, `station_id`, then one per variable and attribute
+    """
+    pa = _pyarrow()
+    varnames = _daily_varnames(ds, varnames)
+    schema = daily_schema(ds, varnames, attributes)
+    time = ds[TIME_DIM_NAME].values.astype("datetime64[ns]")
+    n_stations = len(ds[STATION_ID_VARNAME])
+    arrays = dict(
+        [
+            (v, ds[v].transpose(TIME_DIM_NAME, STATION_ID_VARNAME).values)
+            for v in varnames
+        ]
+    )
+    for v, x in arrays.items():
+        if not x.flags.c_contiguous:
+            # e.g. a station-major layout: one copy, then batches are views again
+            arrays[v] = np.ascontiguousarray(x)
+    dictionary = _station_dictionary(pa, ds)
+    indices = pa.array(np.tile(np.arange(n_stations, dtype=np.int32), batch_days))
+    attribute_arrays = [
+        _values_array(pa, ds[a].values, ds[a].attrs, nan_as_null)
+        for a in (attributes or [])
+    ]
+    for t0 in range(0, len(time), batch_days):
+        t1 = min(t0 + batch_days, len(time))
+        n = (t1 - t0) * n_stations
+        batch_indices = indices.slice(0, n)
+        columns = [
+            pa.array(np.repeat(time[t0:t1], n_stations), type=pa.timestamp("ns")),
+            pa.DictionaryArray.from_arrays(batch_indices, dictionary),
+        ]
+        for v in varnames:
+            columns.append(
+                _values_array(pa, arrays[v][t0:t1].ravel(), ds[v].attrs, nan_as_null)
+            )
+        for a in attribute_arrays:
+            columns.append(a.take(batch_indices))
+        yield pa.RecordBatch.from_arrays(columns, schema=schema)
+
+
+def daily_reader(
+    ds,
+    varnames: List[str] = None,
+    batch_days: int = DEFAULT_BATCH_DAYS,
+    nan_as_null: bool = True,
+    attributes: List[str] = None,
+):
+    """A record batch reader of the daily series in long format, see `daily_batches`
+
+    Returns:
+        pa.RecordBatchReader: stream of batches, consumed once, e.g. by DuckDB or `read_all`
+    """
+    pa = _pyarrow()
+    return pa.RecordBatchReader.from_batches(
+        daily_schema(ds, _daily_varnames(ds, varnames), attributes),
+        daily_batches(ds, varnames, batch_days, nan_as_null, attributes),
+    )
+
+
+def daily_table(
+    ds,
+    varnames: List[str] = None,
+    batch_days: int = DEFAULT_BATCH_DAYS,
+    nan_as_null: bool = True,
+    attributes: List[str] = None,
+):
+    """The daily series in long format as a table, one chunk per batch of `daily_batches`; value columns are not copied"""
+    return daily_reader(ds, varnames, batch_days, nan_as_null, attributes).read_all()
+
+
+def attributes_table(ds, varnames: List[str] = None, nan_as_null: bool = True):
+    """Station attributes as a table, one row per station
+
+    Args:
+        ds (xr.Dataset): dataset, typically `CamelsAus.data`
+        varnames (List[str], optional): station variables. Defaults to None, all station variables.
+        nan_as_null (bool, optional): mark NaN values as nulls. Defaults to True.
+
+    Returns:
+        pa.Table: column `station_id`, with the dictionary of the daily batches, then one column per attribute
+    """
+    pa = _pyarrow()
+    if varnames is None:
+        varnames = [v for v in ds.data_vars if ds[v].dims == (STATION_ID_VARNAME,)]
+    n = len(ds[STATION_ID_VARNAME])
+    columns = [
+        pa.DictionaryArray.from_arrays(
+            pa.array(np.arange(n, dtype=np.int32)), _station_dictionary(pa, ds)
+        )
+    ]
+    fields = [pa.field(STATION_ID_VARNAME, _station_type(pa), nullable=False)]
+    for v in varnames:
+        a = _values_array(pa, ds[v].values, ds[v].attrs, nan_as_null)
+        columns.append(a)
+        fields.append(pa.field(v, a.type, metadata=_metadata(ds[v])))
+    return pa.Table.from_arrays(columns, schema=pa.schema(fields))
@@ -0,0 +1,713 @@
+"""Binary cache of the CAMELS-AUS dataset, and incremental refresh of that cache from the reference CSV files.
+
+A cache directory contains:
+
+* `manifest.json`: time axis, station identifiers, variable descriptions, missing data summaries,
+    and an identifier of the last write
+* `daily/<variable>.npy`: daily series, shape (time, station), time-major by default so that new
+    days can be appended in place at the end of each file, or station-major for per-station
+    workloads (see `camels_aus.layout`)
+* `stations.npz` and `stations.json`: numeric and textual station attributes
+* `boundaries.gpkg`: catchment boundaries, if they were available when the cache was written
+* `boundaries_lod/`: simplified levels of detail of the boundaries, see `camels_aus.spatial`
+* `gaps.npz`: run-length index of the missing values of the daily series, see `camels_aus.gaps`
+* `resampled/`: memoised monthly and annual series, see `CamelsAus.resampled`
+* `memo/`: other memoised derived products, see `camels_aus.memo` and `CamelsAus.derived`
+
+Streamflow quality codes are stored as integer codes (-1 for missing) with their categories
+listed in the manifest.
+
+A cache is written from a dataset in memory with `save_cache`, or streamed from the CSV files
+in blocks of rows with `build_cache_from_text_files`, for datasets too large for memory.
+"""
+
+import io
+import json
+import os
+import shutil
+import uuid
+from typing import Dict, List, Tuple
+
+import numpy as np
+import pandas as pd
+import xarray as xr
+
+from .conventions import (
+    STATION_ID_VARNAME,
+    TIME_DIM_NAME,
+    get_xr_units,
+    set_xr_units,
+)
+from .dtypes import CATEGORIES_ATTRIB_ID
+from .gaps import GapIndex, run_lengths
+from .layout import TIME_MAJOR, check_layout, to_layout
+from .resample import RESAMPLED_SUBDIR
+from .read import daily_series_sources, load_csv_stations_tseries
+
+CACHE_FORMAT_VERSION = 1
+MANIFEST_FN = "manifest.json"
+DAILY_SUBDIR = "daily"
+STATIONS_NUMERIC_FN = "stations.npz"
+STATIONS_TEXT_FN = "stations.json"
+BOUNDARIES_FN = "boundaries.gpkg"
+
+MISSING_CODE = -1
+
+
+def _daily_fn(directory: str, varname: str) -> str:
+    return os.path.join(directory, DAILY_SUBDIR, varname + ".npy")
+
+
+def read_manifest(directory: str) -> Dict:
+    """Reads the manifest of a cache directory
+
+    Args:
+        directory (str): cache directory
+
+    Raises:
+        FileNotFoundError: the directory does not contain a cache manifest
+
+    Returns:
+        Dict: manifest
+    """
+    fn = os.path.join(directory, MANIFEST_FN)
+    if not os.path.exists(fn):
+        raise FileNotFoundError("File {0} not found".format(fn))
+    with open(fn, "r") as f:
+        return json.load(f)
+
+
+def write_manifest(directory: str, manifest: Dict) -> None:
+    """Writes the manifest of a cache directory, atomically, with a new write identifier
+
+    The write identifier `write_id` changes whenever the content of the cache does, and stamps the
+    products derived from it, see `camels_aus.memo.dataset_fingerprint`.
+
+    Args:
+        directory (str): cache directory
+        manifest (Dict): manifest, updated with its new `write_id`
+    """
+    manifest["write_id"] = uuid.uuid4().hex
+    fn = os.path.join(directory, MANIFEST_FN)
+    tmp_fn = fn + ".tmp"
+    with open(tmp_fn, "w") as f:
+        json.dump(manifest, f, indent=1)
+    os.replace(tmp_fn, fn)
+
+
+def time_axis(manifest: Dict) -> pd.DatetimeIndex:
+    """Daily time axis described by a cache manifest"""
+    start = np.datetime64(manifest["start"], "D")
+    return pd.DatetimeIndex(start + np.arange(manifest["length"]))
+
+
+def _is_missing_mask(values: np.ndarray) -> np.ndarray:
+    if values.dtype.kind == "f":
+        return np.isnan(values)
+    if values.dtype.kind in "iu":
+        return values == MISSING_CODE
+    return pd.isna(values)
+
+
+def encode_categories(
+    values: np.ndarray, categories: List[str]
+) -> Tuple[np.ndarray, List[str]]:
+    """Encodes an array of strings into integer codes, extending the list of categories if needed
+
+    Args:
+        values (np.ndarray): array of strings, with NaN or None for missing values
+        categories (List[str]): known categories. New categories are appended, so that existing codes remain valid.
+
+    Returns:
+        Tuple[np.ndarray, List[str]]: int8 codes (-1 for missing values) and the updated categories
+    """
+    flat = values.ravel()
+    present = pd.unique(flat[~pd.isna(flat)])
+    categories = list(categories)
+    categories += sorted(set([str(x) for x in present]) - set(categories))
+    if len(categories) > np.iinfo(np.int8).max:
+        raise ValueError(
+            "Too many distinct categories to encode: {0}".format(len(categories))
+        )
+    codes = pd.Categorical(flat, categories=categories).codes.astype(np.int8)
+    return codes.reshape(values.shape), categories
+
+
+def decode_categories(codes: np.ndarray, categories: List[str]) -> np.ndarray:
+    """Decodes integer codes into an array of strings, NaN for missing values"""
+    lookup = np.array(list(categories) + [np.nan], dtype=object)
+    return lookup[codes]
+
+
+def _tail_offsets(filename: str) -> Tuple[int, int]:
+    """Byte offsets of the start of the last line, and of the end of the data, in a text file"""
+    with open(filename, "rb") as f:
+        f.seek(0, os.SEEK_END)
+        end = f.tell()
+        block = min(end, 65536)
+        f.seek(end - block)
+        tail = f.read(block)
+    stripped = tail.rstrip(b"\r\n")
+    last_line_start = end - block + stripped.rfind(b"\n") + 1
+    return last_line_start, end
+
+
+def _line_date(filename: str, offset: int) -> np.datetime64:
+    """Date of the CSV row starting at a byte offset, None if there is no such row"""
+    with open(filename, "rb") as f:
+        f.seek(max(offset - 1, 0))
+        previous = f.read(1) if offset > 0 else b"\n"
+        line = f.readline().decode(errors="replace")
+    try:
+        if previous != b"\n":
+            return None
+        year, month, day = [int(float(x)) for x in line.split(",")[:3]]
+        return np.datetime64("{0:04d}-{1:02d}-{2:02d}".format(year, month, day), "D")
+    except ValueError:
+        return None
+
+
+def _write_station_variables(directory: str, ds: xr.Dataset, manifest: Dict) -> None:
+    numeric = {}
+    text = {}
+    for v in ds.data_vars:
+        da = ds[v]
+        if da.dims != (STATION_ID_VARNAME,):
+            continue
+        if da.dtype.kind in "biuf":
+            numeric[v] = da.values
+        else:
+            text[v] = [None if pd.isna(x) else str(x) for x in da.values]
+        manifest["station_variables"][v] = {"units": get_xr_units(da)}
+    np.savez(os.path.join(directory, STATIONS_NUMERIC_FN), **numeric)
+    with open(os.path.join(directory, STATIONS_TEXT_FN), "w") as f:
+        json.dump(text, f)
+
+
+def save_cache(
+    ds: xr.Dataset,
+    directory: str,
+    version: str = "1.0",
+    source_directory: str = None,
+    boundaries=None,
+    layout: str = TIME_MAJOR,
+) -> None:
+    """Saves a CAMELS-AUS dataset to a binary cache directory
+
+    Args:
+        ds (xr.Dataset): dataset, typically `CamelsAus.data`
+        directory (str): cache directory
+        version (str, optional): version of the dataset. Defaults to "1.0".
+        source_directory (str, optional): directory of the CSV files `ds` was loaded from.
+            If given, the position of the end of each daily file is recorded, so that
+            `append_from_text_files` can parse only the new rows. Defaults to None.
+        boundaries (geopandas.GeoDataFrame, optional): catchment boundaries. Defaults to None.
+        layout (str, optional): layout of the daily files, see `camels_aus.layout`. A station-major cache
+            is loaded station-major, but cannot be appended to. Defaults to TIME_MAJOR.
+
+    Raises:
+        ValueError: the time axis of the dataset is not contiguous and daily
+    """
+    check_layout(layout)
+    time = pd.DatetimeIndex(ds[TIME_DIM_NAME].values)
+    expected = pd.date_range(time[0], periods=len(time), freq="D")
+    if not (time == expected).all():
+        raise ValueError("The time axis of the dataset must be daily and contiguous")
+    os.makedirs(os.path.join(directory, DAILY_SUBDIR), exist_ok=True)
+    manifest = {
+        "format": CACHE_FORMAT_VERSION,
+        "version": version,
+        "start": str(time[0].date()),
+        "length": len(time),
+        "layout": layout,
+        STATION_ID_VARNAME: [str(s) for s in ds[STATION_ID_VARNAME].values],
+        "daily_variables": {},
+        "station_variables": {},
+    }
+    sources = daily_series_sources()
+    gaps = GapIndex(manifest[STATION_ID_VARNAME], time[0].to_datetime64(), len(time))
+    for v in ds.data_vars:
+        da = ds[v]
+        if da.dims != (TIME_DIM_NAME, STATION_ID_VARNAME):
+            continue
+        desc = {"units": get_xr_units(da)}
+        values = da.values
+        if values.dtype.kind == "O":
+            values, desc["categories"] = encode_categories(values, [])
+        elif CATEGORIES_ATTRIB_ID in da.attrs:
+            values = values.astype(np.int8)
+            desc["categories"] = list(da.attrs[CATEGORIES_ATTRIB_ID])
+        np.save(_daily_fn(directory, v), to_layout(values, layout))
+        desc["dtype"] = values.dtype.str
+        missing = _is_missing_mask(values)
+        desc["missing_counts"] = missing.sum(axis=0).tolist()
+        gaps.gaps[v] = run_lengths(missing)
+        if v in sources:
+            rel_dir, short_fn = sources[v][:2]
+            desc["source"] = os.path.join(rel_dir, short_fn)
+            if source_directory is not None:
+                src = os.path.join(source_directory, desc["source"])
+                desc["last_line_offset"], desc["end_offset"] = _tail_offsets(src)
+        manifest["daily_variables"][v] = desc
+    _write_station_variables(directory, ds, manifest)
+    gaps.save(directory)
+    if boundaries is not None:
+        from .spatial import SimplifiedBoundaries
+
+        boundaries.to_file(os.path.join(directory, BOUNDARIES_FN), driver="GPKG")
+        SimplifiedBoundaries.build(boundaries).save(directory)
+    _clear_resampled(directory)
+    write_manifest(directory, manifest)
+
+
+def _clear_resampled(directory: str) -> None:
+    # memoised resampled series are keyed by the time axis and stations, not the values: stale after a write
+    shutil.rmtree(os.path.join(directory, RESAMPLED_SUBDIR), ignore_errors=True)
+
+
+def _count_data_rows(filename: str) -> int:
+    """Number of data rows of a CSV file with a header line, counting line ends block by block"""
+    n = 0
+    last = b"\n"
+    with open(filename, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            n += block.count(b"\n")
+            last = block[-1:]
+    if last != b"\n":
+        n += 1
+    return n - 1
+
+
+def build_cache_from_text_files(
+    directory: str,
+    cache_directory: str,
+    version: str = "1.0",
+    max_block_bytes: int = 64 * 1024**2,
+) -> None:
+    """Builds a binary cache from the CSV files without loading the dataset in memory
+
+    Each daily file is parsed in blocks of rows written in place to the daily .npy files of
+    the cache, so that the memory used is bounded by `max_block_bytes` whatever the number of
+    stations and days. The cache is the same as written by `save_cache`, and can then be
+    opened memory-mapped with `load_cache(..., mmap=True)`.
+
+    Args:
+        directory (str): root directory of the CSV files, in the CAMELS-AUS layout
+        cache_directory (str): cache directory
+        version (str, optional): version of the dataset. Defaults to "1.0".
+        max_block_bytes (int, optional): approximate size of the blocks of rows parsed at once. Defaults to 64 MiB.
+
+    Raises:
+        FileNotFoundError: missing file
+        ValueError: daily files with different stations or time axes, or with a time axis not daily and contiguous
+    """
+    from .read import load_csv_stations_columns
+    from .validate import BOUNDARIES_FILE, DATE_COLUMNS, station_tables
+
+    d = {}
+    for rel, colnames in station_tables().items():
+        fn = os.path.join(directory, rel)
+        if not os.path.exists(fn):
+            raise FileNotFoundError("File {0} not found".format(fn))
+        d.update(load_csv_stations_columns(fn, colnames))
+    stations_ds = xr.Dataset(data_vars=d)
+    station_ids = [str(s) for s in stations_ds[STATION_ID_VARNAME].values]
+
+    os.makedirs(os.path.join(cache_directory, DAILY_SUBDIR), exist_ok=True)
+    manifest = {
+        "format": CACHE_FORMAT_VERSION,
+        "version": version,
+        "start": None,
+        "length": None,
+        "layout": TIME_MAJOR,
+        STATION_ID_VARNAME: station_ids,
+        "daily_variables": {},
+        "station_variables": {},
+    }
+    gaps = None
+    for v, (
+        rel_dir,
+        short_fn,
+        is_missing,
+        units,
+        dtype,
+    ) in daily_series_sources().items():
+        source = os.path.join(rel_dir, short_fn)
+        fn = os.path.join(directory, source)
+        if not os.path.exists(fn):
+            raise FileNotFoundError("File {0} not found".format(fn))
+        columns = pd.read_csv(fn, nrows=0).columns
+        if list(columns[3:]) != station_ids:
+            raise ValueError(
+                "Stations in {0} differ from those of the station tables".format(fn)
+            )
+        n_rows = _count_data_rows(fn)
+        is_text = dtype == "str"
+        values_dtype = np.int8 if is_text else np.dtype(dtype)
+        out = np.lib.format.open_memmap(
+            _daily_fn(cache_directory, v),
+            mode="w+",
+            dtype=values_dtype,
+            shape=(n_rows, len(station_ids)),
+        )
+        chunk_rows = max(1, max_block_bytes // (8 * max(len(station_ids), 1)))
+        column_types = dict([(c, str if is_text else dtype) for c in station_ids])
+        categories = []
+        missing_counts = np.zeros(len(station_ids), dtype=np.int64)
+        var_gaps = GapIndex(station_ids, np.datetime64("1970-01-01"), 0)
+        row = 0
+        first_day = None
+        previous_day = None
+        for block in pd.read_csv(fn, chunksize=chunk_rows, dtype=column_types):
+            days = pd.to_datetime(block[DATE_COLUMNS]).values.astype("datetime64[D]")
+            if first_day is None:
+                first_day = days[0]
+            expected = (previous_day if previous_day is not None else first_day - 1) + 1
+            if days[0] != expected or (np.diff(days).astype(np.int64) != 1).any():
+                raise ValueError(
+                    "The time axis of {0} is not daily and contiguous".format(fn)
+                )
+            previous_day = days[-1]
+            values = block[station_ids].values
+            if is_text:
+                values, categories = encode_categories(values, categories)
+            else:
+                if is_missing is not None:
+                    values = np.where(is_missing(values), np.nan, values)
+                values = values.astype(values_dtype)
+            out[row : row + len(block)] = values
+            missing = _is_missing_mask(values)
+            missing_counts += missing.sum(axis=0)
+            var_gaps.extend(v, missing)
+            var_gaps.set_length(var_gaps.length + len(block))
+            row += len(block)
+        out.flush()
+        del out
+        if row != n_rows:
+            raise ValueError("Could not count the rows of {0}".format(fn))
+        if manifest["start"] is None:
+            manifest["start"] = str(first_day)
+            manifest["length"] = n_rows
+            gaps = GapIndex(station_ids, first_day, n_rows)
+        elif manifest["start"] != str(first_day) or manifest["length"] != n_rows:
+            raise ValueError(
+                "The time axis of {0} differs from that of the other daily files".format(
+                    fn
+                )
+            )
+        desc = {"units": units or "", "dtype": np.dtype(values_dtype).str}
+        if is_text:
+            desc["categories"] = categories
+        desc["missing_counts"] = missing_counts.tolist()
+        desc["source"] = source
+        desc["last_line_offset"], desc["end_offset"] = _tail_offsets(fn)
+        manifest["daily_variables"][v] = desc
+        gaps.gaps[v] = var_gaps.gaps[v]
+    _write_station_variables(cache_directory, stations_ds, manifest)
+    gaps.save(cache_directory)
+    boundaries_fn = os.path.join(directory, BOUNDARIES_FILE)
+    if os.path.exists(boundaries_fn):
+        import geopandas as gpd
+
+        from .spatial import SimplifiedBoundaries
+
+        boundaries = gpd.read_file(boundaries_fn)
+        boundaries.to_file(os.path.join(cache_directory, BOUNDARIES_FN), driver="GPKG")
+        SimplifiedBoundaries.build(boundaries).save(cache_directory)
+    _clear_resampled(cache_directory)
+    write_manifest(cache_directory, manifest)
+
+
+def load_cache(
+    directory: str, varnames: List[str] = None, mmap: bool = False
+) -> xr.Dataset:
+    """Loads a CAMELS-AUS dataset from a binary cache directory
+
+    Args:
+        directory (str): cache directory
+        varnames (List[str], optional): daily variables to load. Defaults to None, all of them.
+        mmap (bool, optional): memory-map the daily series rather than reading them into memory.
+            Memory-mapped quality codes stay int8 codes, -1 for missing values, with their categories in the
+            attribute `categories` (see `camels_aus.dtypes.decode_categorical`); otherwise they are decoded
+            into strings. Defaults to False.
+
+    Returns:
+        xr.Dataset: dataset with the same layout as `CamelsAus.data`; daily series in the memory layout of the cache
+    """
+    manifest = read_manifest(directory)
+    station_ids = np.array(manifest[STATION_ID_VARNAME], dtype=object)
+    time = time_axis(manifest)
+    d = {}
+    with np.load(os.path.join(directory, STATIONS_NUMERIC_FN)) as numeric:
+        numeric = dict(numeric)
+    with open(os.path.join(directory, STATIONS_TEXT_FN), "r") as f:
+        text = json.load(f)
+    for v, desc in manifest["station_variables"].items():
+        if v in numeric:
+            values = numeric[v]
+        else:
+            values = np.array(
+                [np.nan if x is None else x for x in text[v]], dtype=object
+            )
+        d[v] = xr.DataArray(
+            values, coords={STATION_ID_VARNAME: station_ids}, dims=[STATION_ID_VARNAME]
+        )
+        set_xr_units(d[v], desc["units"] or None)
+    if varnames is None:
+        varnames = list(manifest["daily_variables"].keys())
+    for v in varnames:
+        desc = manifest["daily_variables"][v]
+        values = np.load(_daily_fn(directory, v), mmap_mode="r" if mmap else None)
+        attrs = {}
+        if "categories" in desc:
+            if mmap:
+                attrs[CATEGORIES_ATTRIB_ID] = list(desc["categories"])
+            else:
+                values = decode_categories(values, desc["categories"])
+        d[v] = xr.DataArray(
+            values,
+            coords={TIME_DIM_NAME: time, STATION_ID_VARNAME: station_ids},
+            dims=[TIME_DIM_NAME, STATION_ID_VARNAME],
+            attrs=attrs,
+        )
+        set_xr_units(d[v], desc["units"] or None)
+    return xr.Dataset(data_vars=d)
+
+
+def cached_boundaries_filename(directory: str) -> str:
+    """File name of the catchment boundaries in a cache directory, None if not cached"""
+    fn = os.path.join(directory, BOUNDARIES_FN)
+    return fn if os.path.exists(fn) else None
+
+
+def append_npy_rows(filename: str, rows: np.ndarray) -> None:
+    """Appends rows, in place, at the end of a C-ordered .npy file
+
+    The header of .npy files is padded so that the first dimension can grow
+    without moving the data, which is what this relies on.
+
+    Args:
+        filename (str): .npy file, C-ordered
+        rows (np.ndarray): rows to append, with the same dtype and trailing shape as the array in the file
+
+    Raises:
+        ValueError: incompatible array, or header that cannot be updated in place
+    """
+    with open(filename, "r+b") as f:
+        version = np.lib.format.read_magic(f)
+        if version == (1, 0):
+            shape, fortran_order, dtype = np.lib.format.read_array_header_1_0(f)
+            write_header = np.lib.format.write_array_header_1_0
+        else:
+            shape, fortran_order, dtype = np.lib.format.read_array_header_2_0(f)
+            write_header = np.lib.format.write_array_header_2_0
+        header_len = f.tell()
+        if (
+            fortran_order
+            or tuple(rows.shape[1:]) != tuple(shape[1:])
+            or rows.dtype != dtype
+        ):
+            raise ValueError(
+                "Cannot append rows of shape {0} and type {1} to {2}".format(
+                    rows.shape, rows.dtype, filename
+                )
+            )
+        new_header = io.BytesIO()
+        d = {
+            "descr": np.lib.format.dtype_to_descr(dtype),
+            "fortran_order": False,
+            "shape": (shape[0] + rows.shape[0],) + tuple(shape[1:]),
+        }
+        write_header(new_header, d)
+        if len(new_header.getvalue()) != header_len:
+            raise ValueError(
+                "The header of {0} cannot be updated in place".format(filename)
+            )
+        f.seek(0, os.SEEK_END)
+        f.write(np.ascontiguousarray(rows).tobytes())
+        f.seek(0)
+        f.write(new_header.getvalue())
+
+
+def _data_end_offset(filename: str, n_rows: int) -> int:
+    """Byte offset of the end of the first n_rows data rows of a CSV file, scanning lines without parsing them"""
+    with open(filename, "rb") as f:
+        f.readline()
+        for _ in range(n_rows):
+            f.readline()
+        return f.tell()
+
+
+def _read_new_rows(
+    filename: str, desc: Dict, n_cached: int, end_date: np.datetime64, is_missing, dtype
+) -> xr.DataArray:
+    """Parses only the rows of a daily CSV file that come after the cached time axis. None if there are no new rows."""
+    offset = None
+    if "end_offset" in desc and os.path.getsize(filename) >= desc["end_offset"]:
+        if _line_date(filename, desc["last_line_offset"]) == end_date:
+            offset = desc["end_offset"]
+    if offset is None:
+        # file rewritten since the cache was built: locate the end of the cached rows
+        offset = _data_end_offset(filename, n_cached)
+    with open(filename, "rb") as f:
+        header = f.readline()
+        f.seek(offset)
+        tail = f.read()
+    if len(tail.strip()) == 0:
+        return None
+    tseries = load_csv_stations_tseries(
+        io.BytesIO(header + tail), is_missing=is_missing, dtype=dtype
+    )
+    first = np.datetime64(tseries[TIME_DIM_NAME].values[0], "D")
+    if first != end_date + np.timedelta64(1, "D"):
+        raise ValueError(
+            "New rows of {0} start on {1}, expected the day after {2}".format(
+                filename, first, end_date
+            )
+        )
+    return tseries
+
+
+def append_from_text_files(cache_directory: str, directory: str) -> int:
+    """Appends to a cache, in place, the days found in the daily CSV files after the end of the cached time axis
+
+    Only the new rows of each file are parsed. The missing data summaries in the manifest,
+    and the gap index, are updated from the new rows only.
+
+    Args:
+        cache_directory (str): cache directory written by `save_cache`
+        directory (str): root directory of the CSV files, in the CAMELS-AUS layout
+
+    Raises:
+        ValueError: the files have different numbers of new days, different stations, or do not follow on from the cache;
+            or the cache is station-major
+
+    Returns:
+        int: number of days appended
+    """
+    manifest = read_manifest(cache_directory)
+    if manifest.get("layout", TIME_MAJOR) != TIME_MAJOR:
+        raise ValueError(
+            "Days can only be appended to a time-major cache, {0} is {1}".format(
+                cache_directory, manifest["layout"]
+            )
+        )
+    time = time_axis(manifest)
+    end_date = np.datetime64(time[-1], "D")
+    station_ids = manifest[STATION_ID_VARNAME]
+    sources = daily_series_sources()
+    new_rows = {}
+    for v, desc in manifest["daily_variables"].items():
+        if not "source" in desc:
+            continue
+        fn = os.path.join(directory, desc["source"])
+        if not os.path.exists(fn):
+            raise FileNotFoundError("File {0} not found".format(fn))
+        is_missing, _, dtype = sources[v][2:] if v in sources else (None, None, None)
+        tseries = _read_new_rows(fn, desc, len(time), end_date, is_missing, dtype)
+        if tseries is None:
+            continue
+        if [str(s) for s in tseries[STATION_ID_VARNAME].values] != station_ids:
+            raise ValueError(
+                "Stations in {0} differ from the cached stations".format(fn)
+            )
+        new_rows[v] = (tseries, fn)
+    if len(new_rows) == 0:
+        return 0
+    n_new = set([len(t[TIME_DIM_NAME]) for t, _ in new_rows.values()])
+    if len(n_new) > 1 or len(new_rows) != len(
+        [d for d in manifest["daily_variables"].values() if "source" in d]
+    ):
+        raise ValueError(
+            "All daily files must have the same number of new days to append"
+        )
+    n_new = n_new.pop()
+    gaps = GapIndex.load(cache_directory) if GapIndex.exists(cache_directory) else None
+    for v, (tseries, fn) in new_rows.items():
+        desc = manifest["daily_variables"][v]
+        values = tseries.values
+        if "categories" in desc:
+            values, desc["categories"] = encode_categories(values, desc["categories"])
+        values = values.astype(np.dtype(desc["dtype"]))
+        append_npy_rows(_daily_fn(cache_directory, v), values)
+        missing = _is_missing_mask(values)
+        counts = np.array(desc["missing_counts"]) + missing.sum(axis=0)
+        desc["missing_counts"] = counts.tolist()
+        if gaps is not None:
+            gaps.extend(v, missing)
+        desc["last_line_offset"], desc["end_offset"] = _tail_offsets(fn)
+    manifest["length"] = manifest["length"] + n_new
+    if gaps is not None:
+        gaps.set_length(manifest["length"])
+        gaps.save(cache_directory)
+    _clear_resampled(cache_directory)
+    write_manifest(cache_directory, manifest)
+    return n_new
+
+
+def missing_data_summary(cache_directory: str) -> xr.Dataset:
+    """Proportion of missing values per station, for each daily variable in a cache, from the manifest only
+
+    Args:
+        cache_directory (str): cache directory
+
+    Returns:
+        xr.Dataset: proportions of missing data, one variable per daily series, dimension station_id
+    """
+    manifest = read_manifest(cache_directory)
+    station_ids = np.array(manifest[STATION_ID_VARNAME], dtype=object)
+    d = {}
+    for v, desc in manifest["daily_variables"].items():
+        d[v] = xr.DataArray(
+            np.array(desc["missing_counts"]) / manifest["length"],
+            coords={STATION_ID_VARNAME: station_ids},
+            dims=[STATION_ID_VARNAME],
+        )
+    return xr.Dataset(data_vars=d)
+
+
+def verify_cache(directory: str, deep: bool = False) -> List[str]:
+    """Checks the consistency of a cache directory with its manifest
+
+    Args:
+        directory (str): cache directory
+        deep (bool, optional): also recount missing values in each daily series and compare with the manifest. Defaults to False.
+
+    Returns:
+        List[str]: descriptions of the problems found; empty if the cache is consistent
+    """
+    problems = []
+    try:
+        manifest = read_manifest(directory)
+    except (FileNotFoundError, ValueError) as e:
+        return [str(e)]
+    expected_shape = (manifest["length"], len(manifest[STATION_ID_VARNAME]))
+    for v, desc in manifest["daily_variables"].items():
+        fn = _daily_fn(directory, v)
+        if not os.path.exists(fn):
+            problems.append("{0}: file {1} not found".format(v, fn))
+            continue
+        try:
+            values = np.load(fn, mmap_mode="r")
+        except ValueError as e:
+            problems.append("{0}: {1}".format(v, e))
+            continue
+        if values.shape != expected_shape:
+            problems.append(
+                "{0}: shape {1}, expected {2}".format(v, values.shape, expected_shape)
+            )
+            continue
+        if values.dtype.str != desc["dtype"]:
+            problems.append(
+                "{0}: type {1}, expected {2}".format(v, values.dtype.str, desc["dtype"])
+            )
+        if deep:
+            counts = _is_missing_mask(np.asarray(values)).sum(axis=0).tolist()
+            if counts != desc["missing_counts"]:
+                problems.append(
+                    "{0}: missing value counts differ from the manifest".format(v)
+                )
+    for fn in [STATIONS_NUMERIC_FN, STATIONS_TEXT_FN]:
+        if not os.path.exists(os.path.join(directory, fn)):
+            problems.append("file {0} not found".format(os.path.join(directory, fn)))
+    return problems
@@ -0,0 +1,368 @@
+"""Parallel calibration of a rainfall-runoff model over the CAMELS-AUS catchments.
+
+Tasks are (station, fold) pairs: a model is calibrated on the days of a fold (a calibration
+period) for one station. Tasks are scheduled over a process pool, the longest first (most days
+of observed streamflow in the fold), so that a long series does not start last. The input
+series are written once into a shared memory block, station-major (see
+`camels_aus.layout.fused_block`), and mapped read-only without copy by each worker: the inputs
+of a task are contiguous slices, and tasks only carry indices. Results are appended to a checkpoint file as tasks complete, and a
+run started again with the same checkpoint skips the tasks already done with the same fold
+dates, model, search strategy and objective.
+
+A model is a callable `model(params, rainfall, pet) -> streamflow`, and a search strategy a
+callable `strategy(objective) -> (params, score)` maximising `objective(params)`. Both must be
+picklable, i.e. defined at the top level of a module, to run in worker processes.
+"""
+
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import Callable, Dict, List, Tuple
+
+import numpy as np
+
+from .conventions import (
+    ET_MORTON_ACTUAL_SILO_VARNAME,
+    PRECIPITATION_AWAP_VARNAME,
+    STATION_ID_VARNAME,
+    STREAMFLOW_MMD_VARNAME,
+    TIME_DIM_NAME,
+)
+from .layout import fused_block
+
+CALIBRATION_INPUTS = [
+    PRECIPITATION_AWAP_VARNAME,
+    ET_MORTON_ACTUAL_SILO_VARNAME,
+    STREAMFLOW_MMD_VARNAME,
+]
+"""Daily series used by default: rainfall, evapotranspiration, observed streamflow"""
+
+
+def nse(simulated: np.ndarray, observed: np.ndarray) -> float:
+    """Nash-Sutcliffe efficiency over the days with observations"""
+    ok = np.isfinite(observed) & np.isfinite(simulated)
+    if ok.sum() < 2:
+        return np.nan
+    o = observed[ok]
+    return 1.0 - np.sum((simulated[ok] - o) ** 2) / np.sum((o - o.mean()) ** 2)
+
+
+def linear_reservoir(
+    params: np.ndarray, rainfall: np.ndarray, pet: np.ndarray
+) -> np.ndarray:
+    """A minimal two-parameter model, for tests and examples: effective rainfall `max(P - c * PET, 0)` routed through a linear store of constant `k` (1/day)
+
+    Args:
+        params (np.ndarray): (k, c)
+        rainfall (np.ndarray): daily rainfall, mm
+        pet (np.ndarray): daily evapotranspiration, mm
+
+    Returns:
+        np.ndarray: daily streamflow, mm
+    """
+    k, c = params
+    effective = np.maximum(np.nan_to_num(rainfall) - c * np.nan_to_num(pet), 0.0)
+    q = np.empty(len(effective))
+    store = 0.0
+    for i, p in enumerate(effective):
+        store += p
+        q[i] = k * store
+        store -= q[i]
+    return q
+
+
+class RandomSearch:
+    """Uniform random sampling of parameters in bounds; the best of `n_samples` is kept"""
+
+    def __init__(
+        self,
+        lower: List[float],
+        upper: List[float],
+        n_samples: int = 200,
+        seed: int = 0,
+    ) -> None:
+        """Constructor
+
+        Args:
+            lower (List[float]): lower bounds of the parameters
+            upper (List[float]): upper bounds of the parameters
+            n_samples (int, optional): number of parameter sets evaluated. Defaults to 200.
+            seed (int, optional): seed of the random generator, for reproducible calibrations. Defaults to 0.
+        """
+        self.lower = np.asarray(lower, dtype=np.float64)
+        self.upper = np.asarray(upper, dtype=np.float64)
+        self.n_samples = n_samples
+        self.seed = seed
+
+    def __call__(
+        self, objective: Callable[[np.ndarray], float]
+    ) -> Tuple[np.ndarray, float]:
+        rng = np.random.default_rng(self.seed)
+        samples = self.lower + rng.random((self.n_samples, len(self.lower))) * (
+            self.upper - self.lower
+        )
+        scores = np.array([objective(p) for p in samples])
+        if np.isnan(scores).all():
+            return samples[0], np.nan
+        best = np.nanargmax(scores)
+        return samples[best], float(scores[best])
+
+
+# Inputs and settings of the worker processes, set by _init_worker
+_worker = {}
+
+
+def _init_worker(
+    blocks: Dict[str, Tuple[str, Tuple, str]], model, strategy, objective
+) -> None:
+    from multiprocessing import shared_memory
+
+    _worker.clear()
+    _worker["shm"] = []
+    for name, (shm_name, shape, dtype) in blocks.items():
+        shm = shared_memory.SharedMemory(name=shm_name)
+        _worker["shm"].append(shm)
+        _worker[name] = np.ndarray(shape, dtype=dtype, buffer=shm.buf)
+        _worker[name].flags.writeable = False
+    _worker["model"] = model
+    _worker["strategy"] = strategy
+    _worker["objective"] = objective
+
+
+def _run_task(
+    station: int, start: int, warmup_start: int, end: int
+) -> Tuple[List[float], float]:
+    # contiguous views of the station-major block
+    rainfall, pet, observed = _worker["inputs"][station, :, warmup_start:end]
+    n_warmup = start - warmup_start
+    model, objective = _worker["model"], _worker["objective"]
+
+    def score(params):
+        simulated = model(params, rainfall, pet)
+        return objective(simulated[n_warmup:], observed[n_warmup:])
+
+    params, best = _worker["strategy"](score)
+    return [float(p) for p in params], best
+
+
+def read_checkpoint(filename: str) -> List[Dict]:
+    """Results recorded in a checkpoint file, one per completed task"""
+    if filename is None or not os.path.exists(filename):
+        return []
+    results = []
+    with open(filename, "r") as f:
+        for line in f:
+            line = line.strip()
+            if len(line) == 0:
+                continue
+            try:
+                results.append(json.loads(line))
+            except ValueError:
+                # a line truncated by an interruption; the task is run again
+                continue
+    return results
+
+
+def _callable_id(f: Callable) -> str:
+    # functions by their qualified name; other callables, e.g. a configured search strategy, by their class and attributes
+    if hasattr(f, "__qualname__"):
+        return "{0}.{1}".format(f.__module__, f.__qualname__)
+    t = type(f)
+    attrs = sorted(
+        [
+            (k, v.tolist() if isinstance(v, np.ndarray) else v)
+            for k, v in getattr(f, "__dict__", {}).items()
+        ]
+    )
+    return "{0}.{1}{2}".format(
+        t.__module__, t.__qualname__, json.dumps(attrs, default=str)
+    )
+
+
+_TASK_KEY_FIELDS = [
+    STATION_ID_VARNAME,
+    "first",
+    "last",
+    "model",
+    "strategy",
+    "objective",
+]
+"""Fields of a checkpoint entry identifying its task"""
+
+
+def _task_key(r: Dict) -> Tuple:
+    return tuple([r.get(k) for k in _TASK_KEY_FIELDS])
+
+
+def _ends_line(filename: str) -> bool:
+    # True if a file is empty or ends with a line break
+    with open(filename, "rb") as f:
+        f.seek(0, os.SEEK_END)
+        if f.tell() == 0:
+            return True
+        f.seek(-1, os.SEEK_END)
+        return f.read(1) == b"\n"
+
+
+def _shared_fused_block(ds, varnames: List[str], observed_varname: str):
+    # the inputs are fused directly into a shared memory buffer, without an intermediate copy
+    from multiprocessing import shared_memory
+
+    shape = (len(ds[STATION_ID_VARNAME]), len(varnames), len(ds[TIME_DIM_NAME]))
+    shm = shared_memory.SharedMemory(create=True, size=max(int(np.prod(shape)) * 8, 1))
+    block = np.ndarray(shape, dtype=np.float64, buffer=shm.buf)
+    try:
+        fused_block(ds, varnames, out=block)
+        observed_ok = np.isfinite(block[:, varnames.index(observed_varname), :])
+    except BaseException:
+        # no view may remain on the buffer when it is released
+        del block
+        shm.close()
+        shm.unlink()
+        raise
+    return shm, (shape, block.dtype.str), observed_ok
+
+
+def calibrate_all(
+    ds,
+    model: Callable,
+    strategy: Callable,
+    folds: List[Tuple[str, str]] = None,
+    station_ids: List[str] = None,
+    objective: Callable = nse,
+    warmup_days: int = 365,
+    n_workers: int = None,
+    checkpoint: str = None,
+    varnames: List[str] = None,
+):
+    """Calibrates a model for every (station, fold)
+
+    Args:
+        ds (xr.Dataset): dataset, typically `CamelsAus.data`
+        model (Callable): `model(params, rainfall, pet) -> streamflow`
+        strategy (Callable): `strategy(objective) -> (params, score)`, e.g. `RandomSearch`
+        folds (List[Tuple[str, str]], optional): calibration periods, as (first day, last day). Defaults to None, the whole record.
+        station_ids (List[str], optional): stations. Defaults to None, all stations.
+        objective (Callable, optional): `objective(simulated, observed) -> score` to maximise. Defaults to `nse`.
+        warmup_days (int, optional): days simulated before each fold, not scored. Defaults to 365.
+        n_workers (int, optional): number of worker processes; 0 runs the tasks in this process. Defaults to None, the number of CPUs.
+        checkpoint (str, optional): file where results are appended as tasks complete, and read to skip completed tasks.
+            Entries are keyed by station, fold dates, model, strategy and objective, so a checkpoint can be shared by
+            runs with other settings. Defaults to None.
+        varnames (List[str], optional): names of the rainfall, evapotranspiration and observed streamflow series. Defaults to `CALIBRATION_INPUTS`.
+
+    Returns:
+        pd.DataFrame: one row per (station, fold), with columns `station_id`, `fold`, `score` and `params`
+    """
+    import pandas as pd
+
+    varnames = CALIBRATION_INPUTS if varnames is None else varnames
+    observed_varname = varnames[CALIBRATION_INPUTS.index(STREAMFLOW_MMD_VARNAME)]
+    if station_ids is not None:
+        ds = ds.sel({STATION_ID_VARNAME: station_ids})
+    time = ds[TIME_DIM_NAME].to_index()
+    if folds is None:
+        folds = [(str(time[0].date()), str(time[-1].date()))]
+    fold_dates = [
+        (str(pd.Timestamp(first).date()), str(pd.Timestamp(last).date()))
+        for first, last in folds
+    ]
+    stations = [str(s) for s in ds[STATION_ID_VARNAME].values]
+    settings = {
+        "model": _callable_id(model),
+        "strategy": _callable_id(strategy),
+        "objective": _callable_id(objective),
+    }
+
+    def entry(s, fold):
+        first, last = fold_dates[fold]
+        return dict({STATION_ID_VARNAME: s, "first": first, "last": last}, **settings)
+
+    # results of the current tasks only, with the fold numbers of this run
+    wanted = dict(
+        [
+            (_task_key(entry(s, fold)), fold)
+            for fold in range(len(folds))
+            for s in stations
+        ]
+    )
+    results = []
+    for r in read_checkpoint(checkpoint):
+        fold = wanted.pop(_task_key(r), None)
+        if fold is not None:
+            results.append(dict(r, fold=fold))
+
+    out = None
+    shm = None
+    try:
+        shm, (shape, dtype), observed_ok = _shared_fused_block(
+            ds, varnames, observed_varname
+        )
+        tasks = []
+        for fold, (first, last) in enumerate(folds):
+            start, end = time.slice_indexer(first, last).indices(len(time))[:2]
+            counts = observed_ok[:, start:end].sum(axis=1)
+            for j, s in enumerate(stations):
+                if not _task_key(entry(s, fold)) in wanted:
+                    continue
+                tasks.append(
+                    (int(counts[j]), j, fold, start, max(start - warmup_days, 0), end)
+                )
+        # longest first
+        tasks.sort(key=lambda t: -t[0])
+
+        out = None if checkpoint is None else open(checkpoint, "a")
+        if out is not None and not _ends_line(checkpoint):
+            # terminate a line truncated by an interruption, so that the next result is not merged into it
+            out.write("\n")
+
+        def record(j, fold, params, score):
+            r = entry(stations[j], fold)
+            r.update({"fold": fold, "score": score, "params": params})
+            results.append(r)
+            if out is not None:
+                out.write(json.dumps(r) + "\n")
+                out.flush()
+
+        blocks = {"inputs": (shm.name, shape, dtype)}
+        if n_workers == 0:
+            _init_worker(blocks, model, strategy, objective)
+            for _, j, fold, start, warmup_start, end in tasks:
+                params, score = _run_task(j, start, warmup_start, end)
+                record(j, fold, params, score)
+        elif len(tasks) > 0:
+            with ProcessPoolExecutor(
+                max_workers=n_workers,
+                initializer=_init_worker,
+                initargs=(blocks, model, strategy, objective),
+            ) as pool:
+                futures = dict(
+                    [
+                        (pool.submit(_run_task, j, start, warmup_start, end), (j, fold))
+                        for _, j, fold, start, warmup_start, end in tasks
+                    ]
+                )
+                for f in as_completed(futures):
+                    j, fold = futures[f]
+                    params, score = f.result()
+                    record(j, fold, params, score)
+    finally:
+        # handles opened by _init_worker in this process when n_workers is 0
+        worker_shm = _worker.get("shm", [])
+        _worker.clear()
+        for s in worker_shm:
+            s.close()
+        if out is not None:
+            out.close()
+        if shm is not None:
+            shm.close()
+            shm.unlink()
+
+    res = pd.DataFrame(results, columns=[STATION_ID_VARNAME, "fold", "score", "params"])
+    order = dict([(s, i) for i, s in enumerate(stations)])
+    res["_order"] = res[STATION_ID_VARNAME].map(order)
+    return (
+        res.sort_values(["_order", "fold"])
+        .drop(columns="_order")
+        .reset_index(drop=True)
+    )
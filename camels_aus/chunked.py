@@ -0,0 +1,235 @@
+"""Out-of-core reductions over the daily series of a binary cache, block by block.
+
+The daily series of a cache (see `camels_aus.cache`) are memory-mapped, and reduced in blocks
+of bounded size: blocks of whole periods along the time axis for resampling, and blocks of
+stations over the whole record for per-station statistics. Blocks are processed by a pool of
+threads, which share the memory maps; numpy releases the GIL in the reductions, and the
+operating system pages the files in and out, so that the memory used is about the size of
+the blocks in flight, whatever the size of the dataset.
+
+Typical use, for a dataset larger than memory:
+
+    build_cache_from_text_files(text_dir, cache_dir)
+    monthly = ChunkedCache(cache_dir).resample("M", how="sum")
+"""
+
+import os
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, List, Tuple
+
+import numpy as np
+
+from .conventions import STATION_ID_VARNAME, TIME_DIM_NAME
+
+DEFAULT_BLOCK_BYTES = 64 * 1024**2
+"""Default size of the blocks of data in flight per thread, 64 MiB"""
+
+
+class ChunkedCache:
+    """Memory-mapped daily series of a cache directory, with reductions computed block by block"""
+
+    def __init__(
+        self,
+        directory: str,
+        max_block_bytes: int = DEFAULT_BLOCK_BYTES,
+        n_workers: int = None,
+    ) -> None:
+        """Constructor
+
+        Args:
+            directory (str): cache directory
+            max_block_bytes (int, optional): approximate size of each block of values read at once. Defaults to DEFAULT_BLOCK_BYTES.
+            n_workers (int, optional): number of threads. Defaults to None, the number of CPUs.
+        """
+        from .cache import read_manifest, time_axis
+
+        self.directory = directory
+        self.manifest = read_manifest(directory)
+        self.time = time_axis(self.manifest)
+        self.station_ids = np.array(self.manifest[STATION_ID_VARNAME], dtype=object)
+        self.max_block_bytes = max_block_bytes
+        self.n_workers = os.cpu_count() if n_workers is None else n_workers
+
+    @property
+    def varnames(self) -> List[str]:
+        """Numeric daily variables; quality codes, stored as integer codes, are excluded"""
+        return [
+            v
+            for v, desc in self.manifest["daily_variables"].items()
+            if not "categories" in desc
+        ]
+
+    def array(self, varname: str) -> np.ndarray:
+        """Memory-mapped daily series, shape (time, station)"""
+        from .cache import _daily_fn
+
+        if not varname in self.manifest["daily_variables"]:
+            raise KeyError(
+                "No daily variable {0} in {1}".format(varname, self.directory)
+            )
+        return np.load(_daily_fn(self.directory, varname), mmap_mode="r")
+
+    def _map(self, func: Callable, items: List) -> List:
+        if self.n_workers <= 1 or len(items) <= 1:
+            return [func(x) for x in items]
+        with ThreadPoolExecutor(max_workers=self.n_workers) as pool:
+            return list(pool.map(func, items))
+
+    def row_blocks(self, boundaries: np.ndarray = None) -> List[Tuple[int, int]]:
+        """Blocks of rows of the time axis, of at most `max_block_bytes` of float64 values
+
+        Args:
+            boundaries (np.ndarray, optional): indices at which blocks may start, e.g. the first days of periods.
+                Blocks span whole intervals between boundaries, even if larger than the budget. Defaults to None, any row.
+
+        Returns:
+            List[Tuple[int, int]]: (first row, row after the last) of each block
+        """
+        n_time = len(self.time)
+        rows = max(1, self.max_block_bytes // (8 * max(len(self.station_ids), 1)))
+        if boundaries is None:
+            boundaries = np.arange(0, n_time, rows)
+        boundaries = np.append(np.asarray(boundaries, dtype=np.int64), n_time)
+        blocks = []
+        start = int(boundaries[0])
+        for i in range(1, len(boundaries)):
+            b = int(boundaries[i])
+            if b - start > rows and int(boundaries[i - 1]) > start:
+                blocks.append((start, int(boundaries[i - 1])))
+                start = int(boundaries[i - 1])
+        blocks.append((start, n_time))
+        return blocks
+
+    def station_blocks(self) -> List[Tuple[int, int]]:
+        """Blocks of stations, of at most `max_block_bytes` of float64 values over the whole time axis"""
+        n = len(self.station_ids)
+        cols = max(1, self.max_block_bytes // (8 * max(len(self.time), 1)))
+        return [(j, min(j + cols, n)) for j in range(0, n, cols)]
+
+    def map_station_blocks(self, func: Callable, varname: str) -> List:
+        """Applies a function to blocks of stations of a daily series
+
+        Args:
+            func (Callable): `func(values)` of an in-memory float64 array of shape (time, stations of the block)
+            varname (str): daily series
+
+        Returns:
+            List: results for each block of `station_blocks`, in order
+        """
+        x = self.array(varname)
+
+        def run(block):
+            j0, j1 = block
+            return func(np.asarray(x[:, j0:j1], dtype=np.float64))
+
+        return self._map(run, self.station_blocks())
+
+    def resample(
+        self,
+        freq: str = "M",
+        how: str = "sum",
+        min_completeness: float = 0.0,
+        water_year_start: int = 7,
+        varnames: List[str] = None,
+    ):
+        """Monthly, annual or water year totals or means, computed by blocks of whole periods
+
+        Args:
+            freq (str, optional): "M", "Y" or "WY". Defaults to "M".
+            how (str, optional): "sum" or "mean". Defaults to "sum".
+            min_completeness (float, optional): minimum proportion of days with data per period. Defaults to 0.0.
+            water_year_start (int, optional): first month of the water years. Defaults to 7.
+            varnames (List[str], optional): daily variables. Defaults to None, all numeric daily variables.
+
+        Returns:
+            xr.Dataset: the same as `camels_aus.resample.resample_dataset` on the loaded dataset
+        """
+        import xarray as xr
+
+        from .resample import PeriodMapping
+
+        varnames = self.varnames if varnames is None else varnames
+        time = self.time.values
+        mapping = PeriodMapping(time, freq, water_year_start)
+        blocks = self.row_blocks(mapping.starts)
+        coords = {
+            TIME_DIM_NAME: mapping.labels.astype("datetime64[ns]"),
+            STATION_ID_VARNAME: self.station_ids,
+        }
+        dims = [TIME_DIM_NAME, STATION_ID_VARNAME]
+        d = {}
+        for v in varnames:
+            x = self.array(v)
+
+            def run(block):
+                r0, r1 = block
+                m = PeriodMapping(time[r0:r1], freq, water_year_start)
+                return m.reduce(x[r0:r1], how, min_completeness)
+
+            results = self._map(run, blocks)
+            res = np.concatenate([r[0] for r in results])
+            completeness = np.concatenate([r[1] for r in results])
+            d[v] = xr.DataArray(res, coords=coords, dims=dims)
+            units = self.manifest["daily_variables"][v]["units"]
+            if units:
+                d[v].attrs["units"] = units
+            d[v + "_completeness"] = xr.DataArray(
+                completeness.astype(np.float32), coords=coords, dims=dims
+            )
+        return xr.Dataset(
+            d,
+            attrs={
+                "freq": freq,
+                "how": how,
+                "min_completeness": min_completeness,
+                "water_year_start": mapping.water_year_start,
+            },
+        )
+
+    def station_statistics(
+        self, varname: str, quantiles: List[float] = (0.05, 0.5, 0.95)
+    ):
+        """Per station statistics of a daily series over the whole record: mean, standard deviation, quantiles and proportion missing
+
+        Args:
+            varname (str): daily series, e.g. "streamflow_mmd"
+            quantiles (List[float], optional): quantiles. Defaults to (0.05, 0.5, 0.95), e.g. flow duration curve signatures.
+
+        Returns:
+            pd.DataFrame: one row per station; columns `mean`, `std`, `q<percent>` per quantile and `missing`
+        """
+        import pandas as pd
+
+        quantiles = list(quantiles)
+
+        def stats(x):
+            with np.errstate(invalid="ignore", divide="ignore"):
+                n = np.isfinite(x).sum(axis=0)
+                columns = [
+                    np.nansum(x, axis=0) / n,
+                    np.sqrt(
+                        np.nansum((x - np.nansum(x, axis=0) / n) ** 2, axis=0) / (n - 1)
+                    ),
+                ]
+                if len(quantiles) > 0:
+                    has_data = n > 0
+                    q = np.full((len(quantiles), x.shape[1]), np.nan)
+                    if has_data.any():
+                        q[:, has_data] = np.nanquantile(
+                            x[:, has_data], quantiles, axis=0
+                        )
+                    columns += list(q)
+            columns.append(1.0 - n / x.shape[0])
+            return np.column_stack(columns)
+
+        res = np.concatenate(self.map_station_blocks(stats, varname))
+        names = (
+            ["mean", "std"]
+            + ["q{0:g}".format(100 * q) for q in quantiles]
+            + ["missing"]
+        )
+        return pd.DataFrame(
+            res,
+            columns=names,
+            index=pd.Index(self.station_ids, name=STATION_ID_VARNAME),
+        )
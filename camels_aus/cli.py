@@ -0,0 +1,420 @@
+"""The `camels-aus` command line tool: download, load, cache, export and benchmark the CAMELS-AUS dataset.
+
+Heavy dependencies are imported by each subcommand only, so that the tool starts quickly.
+All subcommands return a non-zero exit code on failure, for use in provisioning scripts and cron jobs.
+
+Examples:
+
+    camels-aus download ~/data/camels/aus
+    camels-aus cache build ~/data/camels/aus ~/data/camels/aus_cache
+    camels-aus cache update ~/data/camels/aus ~/data/camels/aus_cache
+    camels-aus cache verify ~/data/camels/aus_cache --deep
+    camels-aus validate ~/data/camels/aus --checksums checksums.json
+    camels-aus info --cache ~/data/camels/aus_cache
+    camels-aus export --cache ~/data/camels/aus_cache out_dir --format parquet --stations 912101A,102101A
+    camels-aus bench --text ~/data/camels/aus --json
+    camels-aus serve --cache ~/data/camels/aus_cache --port 8080
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+from typing import Dict, List
+
+from ._version import __version__
+
+
+def _print(args, content: Dict) -> None:
+    if args.json:
+        print(json.dumps(content, indent=1, default=str))
+    else:
+        for k, v in content.items():
+            print("{0}: {1}".format(k, v))
+
+
+def _split(x: str) -> List[str]:
+    return None if x is None else [s.strip() for s in x.split(",") if s.strip()]
+
+
+def _load_repo(args):
+    from .repository import CamelsAus
+
+    repo = CamelsAus()
+    if args.cache is not None:
+        repo.load_from_cached_files(args.cache, version=args.version)
+    elif args.text is not None:
+        repo.load_from_text_files(args.text, version=args.version)
+    else:
+        raise ValueError("One of --text or --cache is required")
+    return repo
+
+
+def _add_source_arguments(parser: argparse.ArgumentParser) -> None:
+    g = parser.add_mutually_exclusive_group(required=True)
+    g.add_argument(
+        "--text", help="directory of the CSV files, as downloaded and extracted"
+    )
+    g.add_argument("--cache", help="binary cache directory")
+
+
+def cmd_download(args) -> int:
+    from .repository import download_camels_aus
+
+    download_camels_aus(args.directory, version=args.version)
+    return 0
+
+
+def cmd_info(args) -> int:
+    from .conventions import STATION_ID_VARNAME, TIME_DIM_NAME
+
+    repo = _load_repo(args)
+    ds = repo.data
+    time = ds[TIME_DIM_NAME].values
+    _print(
+        args,
+        {
+            "stations": len(ds[STATION_ID_VARNAME]),
+            "start": str(time[0])[:10],
+            "end": str(time[-1])[:10],
+            "days": len(time),
+            "variables": len(ds.data_vars),
+            "nbytes": int(ds.nbytes),
+        },
+    )
+    return 0
+
+
+def cmd_cache_build(args) -> int:
+    from .repository import CamelsAus
+
+    if args.streaming:
+        from .cache import build_cache_from_text_files, read_manifest
+
+        if args.layout != "time_major":
+            raise ValueError("A streamed cache is time-major")
+        build_cache_from_text_files(
+            args.text_directory, args.cache_directory, version=args.version
+        )
+        n_days = read_manifest(args.cache_directory)["length"]
+        _print(args, {"cache": args.cache_directory, "days": n_days})
+        return 0
+    repo = CamelsAus()
+    repo.load_from_text_files(args.text_directory, version=args.version)
+    repo.save_to_cached_files(
+        args.cache_directory, version=args.version, layout=args.layout
+    )
+    _print(args, {"cache": args.cache_directory, "days": len(repo.data.time)})
+    return 0
+
+
+def cmd_cache_update(args) -> int:
+    from .cache import append_from_text_files
+
+    n = append_from_text_files(args.cache_directory, args.text_directory)
+    _print(args, {"cache": args.cache_directory, "appended_days": n})
+    return 0
+
+
+def cmd_cache_verify(args) -> int:
+    from .cache import verify_cache
+
+    problems = verify_cache(args.cache_directory, deep=args.deep)
+    _print(
+        args,
+        {"cache": args.cache_directory, "ok": len(problems) == 0, "problems": problems},
+    )
+    return 0 if len(problems) == 0 else 1
+
+
+def cmd_validate(args) -> int:
+    from .validate import (
+        compute_checksums,
+        load_checksums,
+        save_checksums,
+        validate_directory,
+    )
+
+    checksums = None if args.checksums is None else load_checksums(args.checksums)
+    report = validate_directory(
+        args.directory, checksums=checksums, values=not args.no_values
+    )
+    if args.write_checksums is not None:
+        save_checksums(args.write_checksums, compute_checksums(args.directory))
+    if args.json:
+        print(json.dumps(report.to_dict(), indent=1, default=str))
+    else:
+        print("{0}: {1}".format(args.directory, "ok" if report.ok else "INVALID"))
+        for i in report.issues:
+            print(
+                "{0} [{1}] {2}: {3}".format(
+                    i["severity"], i["check"], i["file"] or "", i["message"]
+                )
+            )
+    return 0 if report.ok else 1
+
+
+def subset_dataset(
+    ds,
+    station_ids: List[str] = None,
+    varnames: List[str] = None,
+    start: str = None,
+    end: str = None,
+):
+    """Subset of a dataset by stations, daily variables and period
+
+    Args:
+        ds (xr.Dataset): dataset, typically `CamelsAus.data`
+        station_ids (List[str], optional): stations to keep. Defaults to None, all stations.
+        varnames (List[str], optional): daily variables to keep; station attributes are always kept. Defaults to None, all variables.
+        start (str, optional): first day to keep. Defaults to None.
+        end (str, optional): last day to keep. Defaults to None.
+
+    Returns:
+        xr.Dataset: subset
+    """
+    from .conventions import STATION_ID_VARNAME, TIME_DIM_NAME, daily_varnames
+
+    if station_ids is not None:
+        ds = ds.sel({STATION_ID_VARNAME: station_ids})
+    if start is not None or end is not None:
+        ds = ds.sel({TIME_DIM_NAME: slice(start, end)})
+    if varnames is not None:
+        dropped = [
+            v for v in daily_varnames() if v in ds.data_vars and not v in varnames
+        ]
+        ds = ds.drop_vars(dropped)
+    return ds
+
+
+def cmd_export(args) -> int:
+    repo = _load_repo(args)
+    ds = subset_dataset(
+        repo.data, _split(args.stations), _split(args.variables), args.start, args.end
+    )
+    if args.format == "parquet":
+        from .parquet import write_parquet
+
+        write_parquet(ds, args.output, partition_by=args.partition_by)
+    elif args.format == "netcdf":
+        ds.to_netcdf(args.output)
+    elif args.format == "cache":
+        from .cache import save_cache
+
+        save_cache(ds, args.output, version=args.version)
+    _print(
+        args,
+        {"output": args.output, "format": args.format, "stations": len(ds.station_id)},
+    )
+    return 0
+
+
+def _timed(f, repeat: int) -> float:
+    timings = []
+    for _ in range(repeat):
+        t = time.perf_counter()
+        f()
+        timings.append(time.perf_counter() - t)
+    return min(timings)
+
+
+def station_read_timings(ds, varnames: List[str], repeat: int = 3) -> Dict:
+    """Time reading the whole record of every station, as contiguous arrays, in each memory layout
+
+    This is the access pattern of per-station workloads such as calibration: time-major series are
+    gathered with a stride, station-major series and the fused block are read as contiguous slices.
+    """
+    import numpy as np
+
+    from .layout import STATION_MAJOR, TIME_MAJOR, fused_block, to_layout
+
+    n_stations = len(ds.station_id)
+    results = {}
+    for layout in [TIME_MAJOR, STATION_MAJOR]:
+        arrays = [to_layout(ds[v].values, layout) for v in varnames]
+
+        def read():
+            for j in range(n_stations):
+                for x in arrays:
+                    np.ascontiguousarray(x[:, j]).sum()
+
+        results["station_reads_{0}_s".format(layout)] = _timed(read, repeat)
+    block = fused_block(ds, varnames)
+
+    def read_fused():
+        for j in range(n_stations):
+            block[j].sum(axis=1)
+
+    results["station_reads_fused_s"] = _timed(read_fused, repeat)
+    return results
+
+
+def cmd_bench(args) -> int:
+    import tempfile
+
+    from .calibration import CALIBRATION_INPUTS
+    from .repository import CamelsAus
+
+    results = {}
+    repo = CamelsAus()
+    if args.text is not None:
+        results["load_from_text_files_s"] = _timed(
+            lambda: repo.load_from_text_files(args.text, version=args.version),
+            args.repeat,
+        )
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        cache_dir = args.cache
+        if cache_dir is None:
+            cache_dir = os.path.join(tmp_dir, "cache")
+            results["save_to_cached_files_s"] = _timed(
+                lambda: repo.save_to_cached_files(cache_dir, version=args.version), 1
+            )
+        results["load_from_cached_files_mmap_s"] = _timed(
+            lambda: repo.load_from_cached_files(
+                cache_dir, version=args.version, mmap=True
+            ),
+            args.repeat,
+        )
+        # loaded last, so that the data measured below is in memory
+        results["load_from_cached_files_s"] = _timed(
+            lambda: repo.load_from_cached_files(cache_dir, version=args.version),
+            args.repeat,
+        )
+        # measured before the temporary cache is deleted
+        results.update(station_read_timings(repo.data, CALIBRATION_INPUTS, args.repeat))
+        results["stations"] = len(repo.data.station_id)
+        results["days"] = len(repo.data.time)
+        results["nbytes"] = int(repo.data.nbytes)
+    _print(args, results)
+    return 0
+
+
+def cmd_serve(args) -> int:
+    from .server import serve
+
+    repo = _load_repo(args)
+    serve(repo, host=args.host, port=args.port, cache_size=args.cache_size)
+    return 0
+
+
+def build_parser() -> argparse.ArgumentParser:
+    """Command line parser of the `camels-aus` tool"""
+    parser = argparse.ArgumentParser(
+        prog="camels-aus",
+        description="Download, cache, export and benchmark the CAMELS-AUS dataset",
+    )
+    parser.add_argument(
+        "--version", default="1.0", help="version of the dataset (default: 1.0)"
+    )
+    parser.add_argument("--json", action="store_true", help="print results as JSON")
+    parser.add_argument(
+        "-V", "--package-version", action="version", version=__version__
+    )
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    p = sub.add_parser("download", help="download and extract the dataset")
+    p.add_argument("directory", help="local directory for the dataset")
+    p.set_defaults(func=cmd_download)
+
+    p = sub.add_parser("info", help="load the dataset and summarise it")
+    _add_source_arguments(p)
+    p.set_defaults(func=cmd_info)
+
+    cache = sub.add_parser("cache", help="build, update or verify a binary cache")
+    cache_sub = cache.add_subparsers(dest="cache_command", required=True)
+    p = cache_sub.add_parser("build", help="build a binary cache from the CSV files")
+    p.add_argument("text_directory")
+    p.add_argument("cache_directory")
+    p.add_argument(
+        "--streaming",
+        action="store_true",
+        help="parse the CSV files in blocks, for datasets larger than memory",
+    )
+    p.add_argument(
+        "--layout",
+        choices=["time_major", "station_major"],
+        default="time_major",
+        help="memory layout of the daily series; station-major suits per-station reads, but cannot be updated",
+    )
+    p.set_defaults(func=cmd_cache_build)
+    p = cache_sub.add_parser(
+        "update", help="append new days found in the CSV files to a cache"
+    )
+    p.add_argument("text_directory")
+    p.add_argument("cache_directory")
+    p.set_defaults(func=cmd_cache_update)
+    p = cache_sub.add_parser("verify", help="check a cache against its manifest")
+    p.add_argument("cache_directory")
+    p.add_argument(
+        "--deep", action="store_true", help="recount missing values in every series"
+    )
+    p.set_defaults(func=cmd_cache_verify)
+
+    p = sub.add_parser("validate", help="check a dataset directory before loading it")
+    p.add_argument("directory", help="directory of the CSV files")
+    p.add_argument("--checksums", help="JSON file of expected SHA-256 checksums")
+    p.add_argument(
+        "--write-checksums", help="write the checksums of the files to a JSON file"
+    )
+    p.add_argument(
+        "--no-values",
+        action="store_true",
+        help="skip the value range checks, which read the daily files entirely",
+    )
+    p.set_defaults(func=cmd_validate)
+
+    p = sub.add_parser("export", help="export a subset of the dataset")
+    _add_source_arguments(p)
+    p.add_argument("output", help="output file (netcdf) or directory (parquet, cache)")
+    p.add_argument(
+        "--format", choices=["parquet", "netcdf", "cache"], default="parquet"
+    )
+    p.add_argument(
+        "--partition-by", choices=["station", "drainage_division"], default="station"
+    )
+    p.add_argument("--stations", help="comma-separated station identifiers")
+    p.add_argument("--variables", help="comma-separated daily variable names")
+    p.add_argument("--start", help="first day, e.g. 1990-01-01")
+    p.add_argument("--end", help="last day, e.g. 2010-12-31")
+    p.set_defaults(func=cmd_export)
+
+    p = sub.add_parser(
+        "bench",
+        help="time loading the dataset, and per-station reads in each memory layout, on this machine",
+    )
+    g = p.add_mutually_exclusive_group(required=True)
+    g.add_argument("--text", help="directory of the CSV files")
+    g.add_argument("--cache", help="existing binary cache directory")
+    p.add_argument(
+        "--repeat", type=int, default=3, help="repetitions; the fastest is reported"
+    )
+    p.set_defaults(func=cmd_bench)
+
+    p = sub.add_parser("serve", help="serve the dataset over HTTP, for dashboards")
+    _add_source_arguments(p)
+    p.add_argument("--host", default="127.0.0.1")
+    p.add_argument("--port", type=int, default=8080)
+    p.add_argument(
+        "--cache-size", type=int, default=256, help="responses kept in memory"
+    )
+    p.set_defaults(func=cmd_serve)
+    return parser
+
+
+def main(argv: List[str] = None) -> int:
+    """Entry point of the `camels-aus` command line tool
+
+    Args:
+        argv (List[str], optional): command line arguments. Defaults to None, in which case sys.argv is used.
+
+    Returns:
+        int: exit code
+    """
+    parser = build_parser()
+    args = parser.parse_args(argv)
+    try:
+        return args.func(args)
+    except (FileNotFoundError, ValueError, KeyError) as e:
+        print("ERROR: {0}".format(e), file=sys.stderr)
+        return 2
@@ -0,0 +1,319 @@
+"""Climate indices of the catchments over many periods, from the daily hydrometeorological series.
+
+The indices follow the definitions of the CAMELS data sets (Addor et al., 2017):
+
+* `p_mean`, `pet_mean`: mean daily precipitation and potential evapotranspiration, mm/d
+* `aridity`: ratio of the mean potential evapotranspiration to the mean precipitation
+* `p_seasonality`: seasonality and timing of precipitation, from sine curves fitted to the
+    daily precipitation and temperature; positive for summer dominant precipitation
+* `frac_snow`: fraction of the precipitation falling on days with a mean temperature below 0 °C
+* `high_prec_freq`, `high_prec_dur`: frequency (days/year) and mean duration (days) of
+    days with precipitation at least 5 times the mean daily precipitation of the period
+* `low_prec_freq`, `low_prec_dur`: frequency and mean duration of days with less than 1 mm
+
+Potential evapotranspiration is computed from the temperature, radiation and vapour pressure
+series with the Priestley-Taylor equation, net radiation being estimated as in FAO-56.
+
+The daily series are read once. Daily quantities are accumulated along the time axis, so
+that the sums behind all the indices of any period are differences of two rows of cumulative
+sums; the sine curve fits are solved from such sums too, for all periods and stations at once.
+Only the high precipitation indices, whose threshold depends on the period, read the days of
+each period again.
+"""
+
+from typing import List, Tuple
+
+import numpy as np
+
+from .conventions import (
+    PRECIPITATION_AWAP_VARNAME,
+    SOLARRAD_AWAP_VARNAME,
+    STATION_ID_VARNAME,
+    TIME_DIM_NAME,
+    TMAX_AWAP_VARNAME,
+    TMIN_AWAP_VARNAME,
+    VPRP_AWAP_VARNAME,
+)
+
+CLIMATE_INDICES = [
+    "p_mean",
+    "pet_mean",
+    "aridity",
+    "p_seasonality",
+    "frac_snow",
+    "high_prec_freq",
+    "high_prec_dur",
+    "low_prec_freq",
+    "low_prec_dur",
+]
+"""Names of the indices, in the order of the index dimension of `climate_indices`"""
+
+INDEX_DIM_NAME = "index"
+PERIOD_DIM_NAME = "period"
+
+HIGH_PREC_FACTOR = 5.0
+LOW_PREC_THRESHOLD = 1.0
+"""Daily precipitation below which a day is dry, mm"""
+
+_DAYS_PER_YEAR = 365.25
+
+
+def priestley_taylor_pet(
+    tmax: np.ndarray,
+    tmin: np.ndarray,
+    solarrad: np.ndarray,
+    vapour_pressure: np.ndarray,
+    lat: np.ndarray,
+    day_of_year: np.ndarray,
+    alpha: float = 1.26,
+    albedo: float = 0.23,
+) -> np.ndarray:
+    """Daily potential evapotranspiration with the Priestley-Taylor equation
+
+    Args:
+        tmax (np.ndarray): daily maximum temperature, °C, shape (time, station)
+        tmin (np.ndarray): daily minimum temperature, °C
+        solarrad (np.ndarray): daily incoming solar radiation, MJ/m^2
+        vapour_pressure (np.ndarray): actual vapour pressure, hPa
+        lat (np.ndarray): latitude of each station, degrees
+        day_of_year (np.ndarray): day of the year of each day, 1 to 366
+        alpha (float, optional): Priestley-Taylor coefficient. Defaults to 1.26.
+        albedo (float, optional): albedo of the reference surface. Defaults to 0.23.
+
+    Returns:
+        np.ndarray: potential evapotranspiration, mm/d
+    """
+    tmean = (tmax + tmin) / 2.0
+    # FAO-56 equations 13, 21, 37, 38, 39
+    es = 0.6108 * np.exp(17.27 * tmean / (tmean + 237.3))
+    delta = 4098.0 * es / (tmean + 237.3) ** 2
+    gamma = 0.0674
+    phi = np.radians(np.asarray(lat, dtype=np.float64))[np.newaxis, :]
+    j = np.asarray(day_of_year, dtype=np.float64)[:, np.newaxis]
+    dr = 1.0 + 0.033 * np.cos(2.0 * np.pi * j / 365.0)
+    decl = 0.409 * np.sin(2.0 * np.pi * j / 365.0 - 1.39)
+    ws = np.arccos(np.clip(-np.tan(phi) * np.tan(decl), -1.0, 1.0))
+    ra = (
+        24.0
+        * 60.0
+        / np.pi
+        * 0.0820
+        * dr
+        * (ws * np.sin(phi) * np.sin(decl) + np.cos(phi) * np.cos(decl) * np.sin(ws))
+    )
+    rso = 0.75 * ra
+    ea = vapour_pressure / 10.0
+    sigma = 4.903e-9
+    with np.errstate(invalid="ignore", divide="ignore"):
+        cloudiness = np.clip(1.35 * solarrad / rso - 0.35, 0.05, 1.0)
+        rnl = (
+            sigma
+            * ((tmax + 273.16) ** 4 + (tmin + 273.16) ** 4)
+            / 2.0
+            * (0.34 - 0.14 * np.sqrt(np.maximum(ea, 0.0)))
+            * cloudiness
+        )
+    rn = (1.0 - albedo) * solarrad - rnl
+    return np.maximum(alpha * delta / (delta + gamma) * rn / 2.45, 0.0)
+
+
+def _cumulative(x: np.ndarray) -> np.ndarray:
+    # cumulative sums along time with a leading row of zeros
+    res = np.zeros((x.shape[0] + 1,) + x.shape[1:])
+    np.cumsum(x, axis=0, out=res[1:])
+    return res
+
+
+def _period_indices(time: np.ndarray, periods: List[Tuple[str, str]]):
+    import pandas as pd
+
+    index = pd.DatetimeIndex(time)
+    bounds = [index.slice_indexer(a, b).indices(len(index))[:2] for a, b in periods]
+    start, end = [np.array(x, dtype=np.int64) for x in zip(*bounds)]
+    return start, end
+
+
+def _period_sums(x: np.ndarray, start: np.ndarray, end: np.ndarray) -> np.ndarray:
+    # sums of x over each period, shape (period, station)
+    c = _cumulative(x)
+    return c[end] - c[start]
+
+
+def _sine_fits(x: np.ndarray, valid: np.ndarray, omega_t: np.ndarray, start, end):
+    # least squares fits x ~ a + b sin + c cos over each period, solved from period sums of the normal equations
+    basis = [np.ones_like(omega_t), np.sin(omega_t), np.cos(omega_t)]
+    w = valid.astype(np.float64)
+    xw = np.where(valid, x, 0.0)
+    shape = (len(start), x.shape[1])
+    a = np.empty(shape + (3, 3))
+    b = np.empty(shape + (3,))
+    for i in range(3):
+        b[..., i] = _period_sums(xw * basis[i][:, np.newaxis], start, end)
+        for j in range(i, 3):
+            a[..., i, j] = _period_sums(
+                w * (basis[i] * basis[j])[:, np.newaxis], start, end
+            )
+            a[..., j, i] = a[..., i, j]
+    # singular systems (too few days) give NaN
+    ok = np.abs(np.linalg.det(a)) > 1e-9
+    coefs = np.full(b.shape, np.nan)
+    coefs[ok] = np.linalg.solve(a[ok], b[ok][..., np.newaxis])[..., 0]
+    mean = coefs[..., 0]
+    amplitude = np.hypot(coefs[..., 1], coefs[..., 2])
+    phase = np.arctan2(coefs[..., 2], coefs[..., 1])
+    return mean, amplitude, phase
+
+
+def _run_counts(flag: np.ndarray, start: np.ndarray, end: np.ndarray):
+    # number of days flagged, and of runs of flagged days, within each period
+    starts = flag.copy()
+    starts[1:] &= ~flag[:-1]
+    n_days = _period_sums(flag, start, end)
+    n_runs = _period_sums(starts, start, end)
+    # a run under way at the start of a period counts as a run of the period
+    first = np.minimum(start, len(flag) - 1)
+    ongoing = flag[first] & ~starts[first] & (end > start)[:, np.newaxis]
+    return n_days, n_runs + ongoing
+
+
+def climate_indices_arrays(
+    p: np.ndarray,
+    pet: np.ndarray,
+    tmean: np.ndarray,
+    time: np.ndarray,
+    periods: List[Tuple[str, str]],
+) -> np.ndarray:
+    """Climate indices of (time, station) arrays over periods
+
+    Args:
+        p (np.ndarray): daily precipitation, mm, shape (time, station)
+        pet (np.ndarray): daily potential evapotranspiration, mm
+        tmean (np.ndarray): daily mean temperature, °C
+        time (np.ndarray): days of the time axis, contiguous
+        periods (List[Tuple[str, str]]): periods, as (first day, last day)
+
+    Returns:
+        np.ndarray: indices, shape (station, period, index) with the indices of `CLIMATE_INDICES`
+    """
+    p, pet, tmean = [np.asarray(x, dtype=np.float64) for x in [p, pet, tmean]]
+    start, end = _period_indices(time, periods)
+    n_stations = p.shape[1]
+    res = np.full((len(periods), n_stations, len(CLIMATE_INDICES)), np.nan)
+    col = dict([(k, i) for i, k in enumerate(CLIMATE_INDICES)])
+
+    p_ok = np.isfinite(p)
+    pet_ok = np.isfinite(pet)
+    t_ok = np.isfinite(tmean)
+    total = {
+        "p": _period_sums(np.where(p_ok, p, 0.0), start, end),
+        "p_n": _period_sums(p_ok, start, end),
+        "pet": _period_sums(np.where(pet_ok, pet, 0.0), start, end),
+        "pet_n": _period_sums(pet_ok, start, end),
+        "p_t": _period_sums(np.where(p_ok & t_ok, p, 0.0), start, end),
+        "p_snow": _period_sums(
+            np.where(p_ok & t_ok & (tmean < 0.0), p, 0.0), start, end
+        ),
+    }
+
+    with np.errstate(invalid="ignore", divide="ignore"):
+        p_mean = total["p"] / total["p_n"]
+        pet_mean = total["pet"] / total["pet_n"]
+        res[..., col["p_mean"]] = p_mean
+        res[..., col["pet_mean"]] = pet_mean
+        res[..., col["aridity"]] = pet_mean / p_mean
+        res[..., col["frac_snow"]] = total["p_snow"] / total["p_t"]
+
+        days = np.asarray(time).astype("datetime64[D]")
+        omega_t = 2.0 * np.pi * (days - days[0]).astype(np.float64) / _DAYS_PER_YEAR
+        p_fit = _sine_fits(p, p_ok, omega_t, start, end)
+        t_fit = _sine_fits(tmean, t_ok, omega_t, start, end)
+        delta_p = p_fit[1] / p_fit[0]
+        res[..., col["p_seasonality"]] = delta_p * np.cos(p_fit[2] - t_fit[2])
+
+        dry = p_ok & (p < LOW_PREC_THRESHOLD)
+        n_days, n_runs = _run_counts(dry, start, end)
+        res[..., col["low_prec_freq"]] = n_days / total["p_n"] * _DAYS_PER_YEAR
+        res[..., col["low_prec_dur"]] = n_days / n_runs
+
+        for i, (s, e) in enumerate(zip(start, end)):
+            if e <= s:
+                continue
+            x = p[s:e]
+            high = np.isfinite(x) & (x >= HIGH_PREC_FACTOR * p_mean[i])
+            n_days, n_runs = _run_counts(high, np.array([0]), np.array([e - s]))
+            res[i, :, col["high_prec_freq"]] = (
+                n_days[0] / total["p_n"][i] * _DAYS_PER_YEAR
+            )
+            res[i, :, col["high_prec_dur"]] = n_days[0] / n_runs[0]
+    return res.transpose(1, 0, 2)
+
+
+def _station_latitudes(ds) -> np.ndarray:
+    for v in ["lat_centroid", "lat_outlet"]:
+        if v in ds:
+            return ds[v].values
+    raise KeyError("No station latitudes (lat_centroid or lat_outlet) in the dataset")
+
+
+def potential_evapotranspiration(ds) -> np.ndarray:
+    """Daily Priestley-Taylor potential evapotranspiration of a dataset, mm/d, shape (time, station)"""
+    import pandas as pd
+
+    def daily(v):
+        return (
+            ds[v].transpose(TIME_DIM_NAME, STATION_ID_VARNAME).values.astype(np.float64)
+        )
+
+    return priestley_taylor_pet(
+        daily(TMAX_AWAP_VARNAME),
+        daily(TMIN_AWAP_VARNAME),
+        daily(SOLARRAD_AWAP_VARNAME),
+        daily(VPRP_AWAP_VARNAME),
+        _station_latitudes(ds),
+        pd.DatetimeIndex(ds[TIME_DIM_NAME].values).dayofyear.values,
+    )
+
+
+def climate_indices(ds, periods: List[Tuple[str, str]] = None, pet: str = None):
+    """Climate indices of all stations over a list of periods
+
+    Args:
+        ds (xr.Dataset): dataset, typically `CamelsAus.data`
+        periods (List[Tuple[str, str]], optional): periods, as (first day, last day). Defaults to None, the whole record.
+        pet (str, optional): daily variable used as potential evapotranspiration. Defaults to None,
+            the Priestley-Taylor estimate from the temperature, radiation and vapour pressure series.
+
+    Returns:
+        xr.DataArray: indices of dimensions (station_id, period, index); the first and last days of each period are the
+            coordinates `period_start` and `period_end`
+    """
+    import xarray as xr
+
+    time = ds[TIME_DIM_NAME].values
+    if periods is None:
+        periods = [(str(time[0])[:10], str(time[-1])[:10])]
+
+    def daily(v):
+        return ds[v].transpose(TIME_DIM_NAME, STATION_ID_VARNAME).values
+
+    pet_values = potential_evapotranspiration(ds) if pet is None else daily(pet)
+    tmean = (
+        daily(TMAX_AWAP_VARNAME).astype(np.float64)
+        + daily(TMIN_AWAP_VARNAME).astype(np.float64)
+    ) / 2.0
+    res = climate_indices_arrays(
+        daily(PRECIPITATION_AWAP_VARNAME), pet_values, tmean, time, periods
+    )
+    labels = ["{0}/{1}".format(a, b) for a, b in periods]
+    return xr.DataArray(
+        res,
+        dims=[STATION_ID_VARNAME, PERIOD_DIM_NAME, INDEX_DIM_NAME],
+        coords={
+            STATION_ID_VARNAME: ds[STATION_ID_VARNAME].values,
+            PERIOD_DIM_NAME: labels,
+            INDEX_DIM_NAME: CLIMATE_INDICES,
+            "period_start": (PERIOD_DIM_NAME, [str(a) for a, _ in periods]),
+            "period_end": (PERIOD_DIM_NAME, [str(b) for _, b in periods]),
+        },
+        name="climate_indices",
+    )
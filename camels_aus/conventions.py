@@ -1,6 +1,11 @@
-import xarray as xr
-import pandas as pd
-import numpy as np
+from __future__ import annotations
+
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    # xarray is only needed at run time by the functions handling data arrays,
+    # which keeps importing this module cheap.
+    import xarray as xr
 
 STATIONS_DIM_NAME = "station"
 LEAD_TIME_DIM_NAME = "lead_time"
@@ -28,6 +33,8 @@ ELEVATION_VARNAME = "elevation"
 DRAINAGE_DIVISION_VARNAME = "drainage_division"
 RIVER_REGION_VARNAME = "river_region"
 NOTES_VARNAME = "notes"
+# float catchment_area[station], km^2
+CATCHMENT_AREA_VARNAME = "catchment_area"
 
 CONVENTIONAL_VARNAMES = [
     STATIONS_DIM_NAME,
@@ -255,6 +262,20 @@ TMAX_AWAP_VARNAME = "tmax_awap"
 TMIN_AWAP_VARNAME = "tmin_awap"
 VPRP_AWAP_VARNAME = "vprp_awap"
 
+
+def daily_varnames():
+    return [
+        STREAMFLOW_MMD_VARNAME,
+        STREAMFLOW_QUALITYCODES_VARNAME,
+        PRECIPITATION_AWAP_VARNAME,
+        ET_MORTON_ACTUAL_SILO_VARNAME,
+        SOLARRAD_AWAP_VARNAME,
+        TMAX_AWAP_VARNAME,
+        TMIN_AWAP_VARNAME,
+        VPRP_AWAP_VARNAME,
+    ]
+
+
 XR_UNITS_ATTRIB_ID: str = "units"
 """key for the units attribute on xarray DataArray objects"""
 
@@ -268,6 +289,8 @@ def set_xr_units(x: xr.DataArray, units: str):
     """
     if units is None:
         return
+    import xarray as xr
+
     if isinstance(x, xr.DataArray):
         x.attrs[XR_UNITS_ATTRIB_ID] = units
 
@@ -278,6 +301,8 @@ def get_xr_units(x: xr.DataArray) -> str:
     Args:
         x (xr.DataArray): data array
     """
+    import xarray as xr
+
     assert isinstance(x, xr.DataArray)
     if not XR_UNITS_ATTRIB_ID in x.attrs.keys():
         return ""
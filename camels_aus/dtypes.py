@@ -0,0 +1,266 @@
+"""Data type policies for the loaded dataset, and a report of its memory footprint.
+
+A `DtypePolicy` says which type each kind of variable is stored as: daily series, float and
+integer station attributes, attributes bounded in [0, 1] (proportions, indices), and string
+attributes, which can be stored as integer codes with their categories in the attributes of
+the variable. `memory_report` breaks down the bytes used by a dataset per variable and per
+group of variables, to size the memory of worker processes.
+"""
+
+import sys
+from typing import List, Tuple
+
+import numpy as np
+
+from .conventions import (
+    STATION_ID_VARNAME,
+    TIME_DIM_NAME,
+    anthropogenicinfluences_attributes_names,
+    daily_varnames,
+    geology_attributes_names,
+    landcover_attributes_names,
+    location_boundary_names,
+    metadata_names,
+    other_attributes_names,
+    streamflow_gaugingstats_names,
+    topography_attributes_names,
+)
+
+CATEGORIES_ATTRIB_ID = "categories"
+"""Attribute listing the categories of a string variable stored as integer codes; code -1 is missing"""
+
+
+class DtypePolicy:
+    """Types of the variables of a dataset. A type of None keeps the type as loaded."""
+
+    def __init__(
+        self,
+        daily_float=None,
+        attribute_float=None,
+        bounded_float=None,
+        downcast_integers: bool = False,
+        categorical_strings: bool = False,
+        bounded_varnames: List[str] = None,
+    ) -> None:
+        """Constructor
+
+        Args:
+            daily_float (optional): type of the numeric daily series, e.g. np.float32. Defaults to None.
+            attribute_float (optional): type of the float station attributes. Defaults to None.
+            bounded_float (optional): type of the float station attributes with values in [0, 1], e.g. np.float16
+                (about 3 significant digits). Defaults to None.
+            downcast_integers (bool, optional): store integer station attributes (e.g. `map_zone`) in the smallest integer type holding their values. Defaults to False.
+            categorical_strings (bool, optional): store string station attributes (e.g. `geol_prim`) as integer codes,
+                with their categories in the attribute `categories`. Defaults to False.
+            bounded_varnames (List[str], optional): float attributes stored as `bounded_float`. Defaults to None, the attributes with all values in [0, 1].
+        """
+        self.daily_float = daily_float
+        self.attribute_float = attribute_float
+        self.bounded_float = bounded_float
+        self.downcast_integers = downcast_integers
+        self.categorical_strings = categorical_strings
+        self.bounded_varnames = bounded_varnames
+
+
+DTYPE_POLICIES = {
+    "default": DtypePolicy(daily_float=np.float32),
+    "float32": DtypePolicy(
+        daily_float=np.float32,
+        attribute_float=np.float32,
+        downcast_integers=True,
+        categorical_strings=True,
+    ),
+    "compact": DtypePolicy(
+        daily_float=np.float32,
+        attribute_float=np.float32,
+        bounded_float=np.float16,
+        downcast_integers=True,
+        categorical_strings=True,
+    ),
+}
+"""Predefined policies. "default" is the types used by `CamelsAus.load_from_text_files`."""
+
+
+def dtype_policy(policy) -> DtypePolicy:
+    """A policy, given as such or by the name of one of `DTYPE_POLICIES`"""
+    if isinstance(policy, DtypePolicy):
+        return policy
+    if not policy in DTYPE_POLICIES:
+        raise KeyError(
+            "Unknown dtype policy {0}, expected one of {1}".format(
+                policy, list(DTYPE_POLICIES.keys())
+            )
+        )
+    return DTYPE_POLICIES[policy]
+
+
+def policy_key(policy) -> Tuple:
+    """A hashable key of the types of a policy, equal for policies with the same types; None for no policy"""
+    if policy is None:
+        return None
+    policy = dtype_policy(policy)
+
+    def type_key(t):
+        return None if t is None else np.dtype(t).str
+
+    bounded = policy.bounded_varnames
+    return (
+        type_key(policy.daily_float),
+        type_key(policy.attribute_float),
+        type_key(policy.bounded_float),
+        bool(policy.downcast_integers),
+        bool(policy.categorical_strings),
+        None if bounded is None else tuple(bounded),
+    )
+
+
+def _is_daily(da) -> bool:
+    return da.dims == (TIME_DIM_NAME, STATION_ID_VARNAME)
+
+
+def _is_bounded(x: np.ndarray) -> bool:
+    finite = x[np.isfinite(x)]
+    return len(finite) > 0 and finite.min() >= 0.0 and finite.max() <= 1.0
+
+
+def encode_strings(da):
+    """String variable as int8 or int16 codes, with its categories in the attribute `categories`"""
+    import pandas as pd
+
+    cat = pd.Categorical(da.values.ravel())
+    dtype = np.int8 if len(cat.categories) < 127 else np.int16
+    codes = cat.codes.astype(dtype).reshape(da.shape)
+    res = da.copy(data=codes)
+    res.attrs[CATEGORIES_ATTRIB_ID] = [str(c) for c in cat.categories]
+    return res
+
+
+def decode_categorical(da):
+    """Strings of a variable stored as integer codes by `encode_strings`; other variables are returned as is"""
+    if not CATEGORIES_ATTRIB_ID in da.attrs:
+        return da
+    lookup = np.array(list(da.attrs[CATEGORIES_ATTRIB_ID]) + [np.nan], dtype=object)
+    res = da.copy(data=lookup[da.values])
+    del res.attrs[CATEGORIES_ATTRIB_ID]
+    return res
+
+
+def _smallest_integer(x: np.ndarray):
+    for t in [np.int8, np.int16, np.int32]:
+        info = np.iinfo(t)
+        if len(x) == 0 or (x.min() >= info.min and x.max() <= info.max):
+            return t
+    return x.dtype
+
+
+def apply_dtype_policy(ds, policy: DtypePolicy):
+    """Converts the variables of a dataset according to a policy
+
+    Args:
+        ds (xr.Dataset): dataset, typically `CamelsAus.data`
+        policy (DtypePolicy): policy, or the name of one of `DTYPE_POLICIES`
+
+    Returns:
+        xr.Dataset: converted dataset; variables already of the right type are not copied
+    """
+    policy = dtype_policy(policy)
+    converted = {}
+    for v in ds.data_vars:
+        da = ds[v]
+        kind = da.dtype.kind
+        if _is_daily(da):
+            if kind == "f" and policy.daily_float is not None:
+                converted[v] = da.astype(policy.daily_float, copy=False)
+            continue
+        if kind == "f":
+            bounded = (
+                v in policy.bounded_varnames
+                if policy.bounded_varnames is not None
+                else _is_bounded(da.values)
+            )
+            t = policy.bounded_float if bounded else None
+            t = policy.attribute_float if t is None else t
+            if t is not None:
+                converted[v] = da.astype(t, copy=False)
+        elif kind in "iu" and policy.downcast_integers:
+            converted[v] = da.astype(_smallest_integer(da.values), copy=False)
+        elif kind == "O" and policy.categorical_strings:
+            converted[v] = encode_strings(da)
+    return ds.assign(converted)
+
+
+def variable_groups():
+    """Group of each variable of the dataset, as in the layout of the CSV files"""
+    groups = [
+        ("daily", daily_varnames()),
+        ("metadata", metadata_names()),
+        ("location_boundary_area", location_boundary_names()),
+        ("gauging_stats", streamflow_gaugingstats_names()),
+        ("geology", geology_attributes_names()),
+        ("topography", topography_attributes_names()),
+        ("landcover", landcover_attributes_names()),
+        ("anthropogenic_influences", anthropogenicinfluences_attributes_names()),
+        ("other", other_attributes_names()),
+    ]
+    return dict([(v, g) for g, names in groups for v in names])
+
+
+def _memory_mapped(x: np.ndarray) -> bool:
+    while x is not None:
+        if isinstance(x, np.memmap):
+            return True
+        x = getattr(x, "base", None)
+        if not isinstance(x, np.ndarray):
+            return False
+    return False
+
+
+def _nbytes(x: np.ndarray) -> int:
+    n = x.nbytes
+    if x.dtype.kind == "O":
+        # the objects referenced, counting each distinct object once (strings are often shared)
+        distinct = dict([(id(o), o) for o in x.ravel()])
+        n += sum([sys.getsizeof(o) for o in distinct.values()])
+    return int(n)
+
+
+def memory_report(ds, by: str = "variable"):
+    """Bytes used by the variables of a dataset
+
+    Args:
+        ds (xr.Dataset): dataset, typically `CamelsAus.data`
+        by (str, optional): "variable" for one row per variable and coordinate, "group" for totals per group
+            (daily, metadata, geology, ...). Defaults to "variable".
+
+    Returns:
+        pd.DataFrame: columns `group`, `dtype`, `nbytes` (including the Python objects of object arrays),
+            `resident_bytes` (excluding memory mapped arrays, which the OS pages in and out) and `memory_mapped`
+    """
+    import pandas as pd
+
+    groups = variable_groups()
+    rows = []
+    for name, da in list(ds.coords.items()) + list(ds.data_vars.items()):
+        x = da.values
+        nbytes = _nbytes(x)
+        mapped = _memory_mapped(x)
+        rows.append(
+            {
+                "variable": name,
+                "group": (
+                    "coordinates"
+                    if name in ds.coords
+                    else groups.get(name, "ungrouped")
+                ),
+                "dtype": str(x.dtype),
+                "nbytes": nbytes,
+                "resident_bytes": 0 if mapped else nbytes,
+                "memory_mapped": mapped,
+            }
+        )
+    report = pd.DataFrame(rows).set_index("variable")
+    if by == "group":
+        return report.groupby("group")[["nbytes", "resident_bytes"]].sum()
+    if by != "variable":
+        raise ValueError("by must be 'variable' or 'group', not {0}".format(by))
+    return report
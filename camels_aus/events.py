@@ -0,0 +1,283 @@
+"""Detection of flood events, annual maxima and recessions in the daily streamflow of all stations at once.
+
+The (time, station) array is processed as a whole: runs of days above a threshold, of
+decreasing flow, or periods, are found with differences along the time axis, and their
+peaks, volumes and rainfall totals reduced with `reduceat` over the runs, or with cumulative
+sums. Missing days (NaN) are never part of an event, and do not count towards the separation
+between events.
+
+Events are declustered: two candidate events are merged into one unless they are separated by
+at least `min_separation` observed days, and the flow between them falls below `max_trough`
+times the smaller of their two peaks.
+"""
+
+from typing import Tuple
+
+import numpy as np
+
+from .conventions import (
+    PRECIPITATION_AWAP_VARNAME,
+    STATION_ID_VARNAME,
+    STREAMFLOW_MMD_VARNAME,
+    TIME_DIM_NAME,
+)
+from .gaps import run_lengths
+
+
+def _flat(x: np.ndarray) -> np.ndarray:
+    # station-major flattening of a (time, station) array, so that runs are contiguous
+    return np.ascontiguousarray(np.asarray(x, dtype=np.float64).T).ravel()
+
+
+def _cumsum(x: np.ndarray) -> np.ndarray:
+    # cumulative sums along time with a leading row of zeros, NaN counted as 0
+    x = np.nan_to_num(np.asarray(x, dtype=np.float64))
+    res = np.zeros((x.shape[0] + 1, x.shape[1]))
+    np.cumsum(x, axis=0, out=res[1:])
+    return res
+
+
+def _gather(flat: np.ndarray, begin: np.ndarray, length: np.ndarray):
+    # concatenated segments [begin, begin + length) of a flat array, their positions, and the offsets of the segments
+    offsets = np.cumsum(length) - length
+    pos = np.arange(int(np.sum(length))) + np.repeat(begin - offsets, length)
+    return flat[pos], pos, offsets
+
+
+def _segment_max(flat: np.ndarray, begin: np.ndarray, length: np.ndarray):
+    # per non-empty segment of a flat array: maximum, and position of its first occurrence
+    values, pos, offsets = _gather(flat, begin, length)
+    peak = np.fmax.reduceat(values, offsets)
+    is_peak = values == np.repeat(peak, length)
+    first = np.minimum.reduceat(np.where(is_peak, pos, np.iinfo(np.int64).max), offsets)
+    return peak, first
+
+
+def _segment_min(flat: np.ndarray, begin: np.ndarray, length: np.ndarray):
+    # per non-empty segment of a flat array: minimum, NaN if all missing
+    values, _, offsets = _gather(flat, begin, length)
+    return np.fmin.reduceat(values, offsets)
+
+
+def threshold_quantile(q: np.ndarray, quantile: float = 0.95) -> np.ndarray:
+    """Per station quantile of the observed flows, as a threshold for `detect_events`"""
+    return np.nanquantile(np.asarray(q, dtype=np.float64), quantile, axis=0)
+
+
+def detect_events(
+    q: np.ndarray,
+    threshold,
+    min_separation: int = 5,
+    max_trough: float = 2.0 / 3.0,
+    min_duration: int = 1,
+) -> Tuple[np.ndarray, ...]:
+    """Peaks over threshold events in a (time, station) array
+
+    Args:
+        q (np.ndarray): daily flows, shape (time, station), NaN where missing
+        threshold (Union[float, np.ndarray]): flow above which a day is part of an event, or one per station
+        min_separation (int, optional): minimum number of observed days between independent events. Defaults to 5.
+        max_trough (float, optional): events are independent only if the flow between them falls below this
+            proportion of the smaller peak. Defaults to 2/3.
+        min_duration (int, optional): minimum number of days of an event. Defaults to 1.
+
+    Returns:
+        Tuple[np.ndarray, ...]: station index, start, end (exclusive), peak index, peak and volume (sum of the flows)
+            of each event, sorted by station then start; indices are along the time axis.
+    """
+    q = np.asarray(q, dtype=np.float64)
+    n_time, n_stations = q.shape
+    threshold = np.broadcast_to(np.asarray(threshold, dtype=np.float64), (n_stations,))
+    with np.errstate(invalid="ignore"):
+        above = q > threshold
+    station, start, length = [x.astype(np.int64) for x in run_lengths(above)]
+    end = start + length
+    flat = _flat(q)
+    if len(station) > 1:
+        # declustering of consecutive candidate events of a station
+        peak, _ = _segment_max(flat, station * n_time + start, length)
+        observed = np.zeros((n_time + 1, n_stations), dtype=np.int64)
+        np.cumsum(np.isfinite(q), axis=0, out=observed[1:])
+        same = station[1:] == station[:-1]
+        separation = observed[start[1:], station[1:]] - observed[end[:-1], station[:-1]]
+        trough = np.full(len(same), np.nan)
+        if same.any():
+            trough[same] = _segment_min(
+                flat,
+                station[1:][same] * n_time + end[:-1][same],
+                start[1:][same] - end[:-1][same],
+            )
+        with np.errstate(invalid="ignore"):
+            independent = (separation >= min_separation) & (
+                trough < max_trough * np.minimum(peak[1:], peak[:-1])
+            )
+        new_event = np.concatenate([[True], ~same | independent])
+        last = np.concatenate([new_event[1:], [True]])
+        station, start, end = station[new_event], start[new_event], end[last]
+    duration = end - start
+    keep = duration >= min_duration
+    station, start, end = station[keep], start[keep], end[keep]
+    if len(station) > 0:
+        peak, peak_pos = _segment_max(flat, station * n_time + start, end - start)
+    else:
+        peak, peak_pos = np.zeros(0), np.zeros(0, dtype=np.int64)
+    cs = _cumsum(q)
+    volume = cs[end, station] - cs[start, station]
+    return station, start, end, peak_pos - station * n_time, peak, volume
+
+
+def detect_recessions(q: np.ndarray, min_length: int = 5) -> Tuple[np.ndarray, ...]:
+    """Recessions, runs of strictly decreasing positive flows, in a (time, station) array
+
+    Args:
+        q (np.ndarray): daily flows, shape (time, station), NaN where missing
+        min_length (int, optional): minimum number of days of decrease. Defaults to 5.
+
+    Returns:
+        Tuple[np.ndarray, ...]: station index, start, end (exclusive; the last day is the lowest flow) and recession
+            constant `k` of each recession, where `q[t + 1] = k * q[t]` on average (geometric mean of the daily ratios)
+    """
+    q = np.asarray(q, dtype=np.float64)
+    with np.errstate(invalid="ignore"):
+        decreasing = (q[1:] < q[:-1]) & (q[1:] > 0)
+    station, start, length = [x.astype(np.int64) for x in run_lengths(decreasing)]
+    keep = length >= min_length
+    station, start, length = station[keep], start[keep], length[keep]
+    end = start + length + 1
+    k = (q[end - 1, station] / q[start, station]) ** (1.0 / length)
+    return station, start, end, k
+
+
+def _daily_array(ds, varname: str) -> np.ndarray:
+    return ds[varname].transpose(TIME_DIM_NAME, STATION_ID_VARNAME).values
+
+
+def flood_events(
+    ds,
+    threshold=None,
+    quantile: float = 0.95,
+    min_separation: int = 5,
+    max_trough: float = 2.0 / 3.0,
+    min_duration: int = 1,
+    rainfall_lead_days: int = 2,
+    varname: str = STREAMFLOW_MMD_VARNAME,
+    rainfall_varname: str = PRECIPITATION_AWAP_VARNAME,
+):
+    """Table of the peaks over threshold flood events of all stations
+
+    Args:
+        ds (xr.Dataset): dataset, typically `CamelsAus.data`
+        threshold (Union[float, np.ndarray], optional): flow threshold, or one per station. Defaults to None, the `quantile` of the flows of each station.
+        quantile (float, optional): quantile of the flows used as threshold. Defaults to 0.95.
+        min_separation (int, optional): minimum number of observed days between independent events. Defaults to 5.
+        max_trough (float, optional): events are independent only if the flow between them falls below this proportion of the smaller peak. Defaults to 2/3.
+        min_duration (int, optional): minimum number of days of an event. Defaults to 1.
+        rainfall_lead_days (int, optional): days before the start of an event included in its rainfall total. Defaults to 2.
+        varname (str, optional): daily flows. Defaults to "streamflow_mmd".
+        rainfall_varname (str, optional): daily rainfall, or None for no rainfall totals. Defaults to "precipitation_AWAP".
+
+    Returns:
+        pd.DataFrame: one row per event, with columns `station_id`, `start`, `peak_time`, `peak`, `volume` (sum of the daily flows),
+            `duration` (days) and `rainfall`
+    """
+    import pandas as pd
+
+    q = _daily_array(ds, varname)
+    if threshold is None:
+        threshold = threshold_quantile(q, quantile)
+    station, start, end, peak_index, peak, volume = detect_events(
+        q, threshold, min_separation, max_trough, min_duration
+    )
+    time = ds[TIME_DIM_NAME].values
+    res = pd.DataFrame(
+        {
+            STATION_ID_VARNAME: ds[STATION_ID_VARNAME].values[station],
+            "start": time[start],
+            "peak_time": time[peak_index],
+            "peak": peak,
+            "volume": volume,
+            "duration": end - start,
+        }
+    )
+    if rainfall_varname is not None:
+        cs = _cumsum(_daily_array(ds, rainfall_varname))
+        res["rainfall"] = (
+            cs[end, station] - cs[np.maximum(start - rainfall_lead_days, 0), station]
+        )
+    return res
+
+
+def annual_maxima(
+    ds,
+    water_year_start: int = None,
+    min_completeness: float = 0.0,
+    varname: str = STREAMFLOW_MMD_VARNAME,
+):
+    """Table of the annual maximum daily flows of all stations
+
+    Args:
+        ds (xr.Dataset): dataset, typically `CamelsAus.data`
+        water_year_start (int, optional): first month of the water years. Defaults to None, calendar years.
+        min_completeness (float, optional): minimum proportion of days with data in a year; other years are dropped. Defaults to 0.0.
+        varname (str, optional): daily flows. Defaults to "streamflow_mmd".
+
+    Returns:
+        pd.DataFrame: one row per station and year with data, with columns `station_id`, `year` (first day of the year),
+            `peak_time`, `peak` and `completeness`
+    """
+    import pandas as pd
+
+    from .resample import PeriodMapping
+
+    q = np.asarray(_daily_array(ds, varname), dtype=np.float64)
+    freq = "Y" if water_year_start is None else "WY"
+    mapping = PeriodMapping(ds[TIME_DIM_NAME].values, freq, water_year_start or 7)
+    _, completeness = mapping.reduce(q)
+    peak = np.fmax.reduceat(q, mapping.starts, axis=0)
+    period_length = np.diff(np.append(mapping.starts, mapping.n_days))
+    is_peak = q == np.repeat(peak, period_length, axis=0)
+    rows = np.arange(q.shape[0])[:, np.newaxis]
+    peak_index = np.minimum.reduceat(
+        np.where(is_peak, rows, q.shape[0]), mapping.starts, axis=0
+    )
+    period, station = np.nonzero(np.isfinite(peak) & (completeness >= min_completeness))
+    order = np.lexsort((period, station))
+    period, station = period[order], station[order]
+    time = ds[TIME_DIM_NAME].values
+    return pd.DataFrame(
+        {
+            STATION_ID_VARNAME: ds[STATION_ID_VARNAME].values[station],
+            "year": mapping.labels[period].astype("datetime64[ns]"),
+            "peak_time": time[peak_index[period, station]],
+            "peak": peak[period, station],
+            "completeness": completeness[period, station],
+        }
+    )
+
+
+def recessions(ds, min_length: int = 5, varname: str = STREAMFLOW_MMD_VARNAME):
+    """Table of the recessions of all stations
+
+    Args:
+        ds (xr.Dataset): dataset, typically `CamelsAus.data`
+        min_length (int, optional): minimum number of days of decrease. Defaults to 5.
+        varname (str, optional): daily flows. Defaults to "streamflow_mmd".
+
+    Returns:
+        pd.DataFrame: one row per recession, with columns `station_id`, `start`, `duration` (days of decrease),
+            `initial_flow`, `final_flow` and `k` (recession constant)
+    """
+    import pandas as pd
+
+    q = np.asarray(_daily_array(ds, varname), dtype=np.float64)
+    station, start, end, k = detect_recessions(q, min_length)
+    return pd.DataFrame(
+        {
+            STATION_ID_VARNAME: ds[STATION_ID_VARNAME].values[station],
+            "start": ds[TIME_DIM_NAME].values[start],
+            "duration": end - start - 1,
+            "initial_flow": q[start, station],
+            "final_flow": q[end - 1, station],
+            "k": k,
+        }
+    )
@@ -0,0 +1,300 @@
+"""Run-length index of the gaps (runs of missing values) in the daily series.
+
+For each daily variable the index holds one record per gap: station, first missing day and
+number of missing days, sorted by station then start. Completeness over any period, longest
+complete windows and long gaps are computed from these records only, without reading the
+data arrays. The index is built when a binary cache is written, saved as `gaps.npz`, and
+extended in place when new days are appended to the cache.
+"""
+
+import os
+from typing import Dict, List, Tuple
+
+import numpy as np
+
+from .conventions import STATION_ID_VARNAME
+
+GAPS_FN = "gaps.npz"
+
+
+def run_lengths(
+    missing: np.ndarray, offset: int = 0
+) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Runs of missing values in a (time, station) mask
+
+    Args:
+        missing (np.ndarray): boolean mask, True where values are missing, shape (time, station)
+        offset (int, optional): index of the first row of the mask in the time axis. Defaults to 0.
+
+    Returns:
+        Tuple[np.ndarray, np.ndarray, np.ndarray]: station indices, start indices and lengths of the runs,
+            sorted by station then start
+    """
+    missing = np.asarray(missing, dtype=bool)
+    n_time, n_stations = missing.shape
+    padded = np.zeros((n_stations, n_time + 2), dtype=np.int8)
+    padded[:, 1:-1] = missing.T
+    d = np.diff(padded, axis=1)
+    station, start = np.nonzero(d == 1)
+    _, end = np.nonzero(d == -1)
+    return (
+        station.astype(np.int32),
+        (start + offset).astype(np.int32),
+        (end - start).astype(np.int32),
+    )
+
+
+class GapIndex:
+    """Gaps in the daily series of a dataset, per variable and station"""
+
+    def __init__(
+        self,
+        station_ids: List[str],
+        start: np.datetime64,
+        length: int,
+        gaps: Dict[str, Tuple[np.ndarray, np.ndarray, np.ndarray]] = None,
+    ) -> None:
+        """Constructor
+
+        Args:
+            station_ids (List[str]): station identifiers
+            start (np.datetime64): first day of the time axis
+            length (int): number of days in the time axis
+            gaps (Dict[str, Tuple[np.ndarray, np.ndarray, np.ndarray]], optional): per variable,
+                station indices, start indices and lengths of the gaps, as from `run_lengths`. Defaults to None.
+        """
+        self.station_ids = np.asarray(station_ids).astype(str)
+        self.start = np.datetime64(start, "D")
+        self.length = int(length)
+        self.gaps = {} if gaps is None else dict(gaps)
+
+    @property
+    def varnames(self) -> List[str]:
+        return list(self.gaps.keys())
+
+    @staticmethod
+    def from_dataset(ds, varnames: List[str] = None) -> "GapIndex":
+        """Builds the index from the daily series of a dataset
+
+        Args:
+            ds (xr.Dataset): dataset, typically `CamelsAus.data`, with a contiguous daily time axis
+            varnames (List[str], optional): daily variables. Defaults to None, all (time, station_id) variables.
+
+        Returns:
+            GapIndex: index
+        """
+        import pandas as pd
+
+        from .conventions import TIME_DIM_NAME
+
+        if varnames is None:
+            varnames = [
+                v
+                for v in ds.data_vars
+                if ds[v].dims == (TIME_DIM_NAME, STATION_ID_VARNAME)
+            ]
+        time = ds[TIME_DIM_NAME].values
+        index = GapIndex(ds[STATION_ID_VARNAME].values, time[0], len(time))
+        from .dtypes import CATEGORIES_ATTRIB_ID
+
+        for v in varnames:
+            x = ds[v].transpose(TIME_DIM_NAME, STATION_ID_VARNAME).values
+            # integer codes of strings are -1 where missing
+            missing = x < 0 if CATEGORIES_ATTRIB_ID in ds[v].attrs else pd.isna(x)
+            index.gaps[v] = run_lengths(missing)
+        return index
+
+    def extend(self, varname: str, missing: np.ndarray) -> None:
+        """Extends the index of a variable with new days at the end of the time axis; gaps
+        running into the new days are merged with those at the start of the new days.
+
+        Args:
+            varname (str): variable
+            missing (np.ndarray): mask of the missing values in the new days, shape (new days, station)
+        """
+        station, start, length = self.gaps.get(
+            varname, run_lengths(np.zeros((0, len(self.station_ids))))
+        )
+        new_station, new_start, new_length = run_lengths(missing, offset=self.length)
+        open_ended = np.zeros(len(self.station_ids), dtype=bool)
+        open_ended[station[start + length == self.length]] = True
+        merged = (new_start == self.length) & open_ended[new_station]
+        if merged.any():
+            last = np.full(len(self.station_ids), -1)
+            last[station] = np.arange(len(station))
+            length = length.copy()
+            length[last[new_station[merged]]] += new_length[merged]
+        station = np.concatenate([station, new_station[~merged]])
+        start = np.concatenate([start, new_start[~merged]])
+        length = np.concatenate([length, new_length[~merged]])
+        order = np.lexsort((start, station))
+        self.gaps[varname] = (station[order], start[order], length[order])
+
+    def set_length(self, length: int) -> None:
+        """Sets the length of the time axis, after all variables were extended"""
+        self.length = int(length)
+
+    def _period(self, start, end) -> Tuple[int, int]:
+        # indices [i0, i1) of a period given by its first and last days, clipped to the time axis
+        i0 = 0
+        i1 = self.length
+        if start is not None:
+            i0 = int((np.datetime64(start, "D") - self.start).astype(np.int64))
+        if end is not None:
+            i1 = int((np.datetime64(end, "D") - self.start).astype(np.int64)) + 1
+        return min(max(i0, 0), self.length), min(max(i1, 0), self.length)
+
+    def _check_var(self, varname: str) -> None:
+        if not varname in self.gaps:
+            raise KeyError("No gap index for variable {0}".format(varname))
+
+    def missing_counts(self, varname: str, start=None, end=None) -> np.ndarray:
+        """Number of missing days per station over a period
+
+        Args:
+            varname (str): variable
+            start (optional): first day of the period, e.g. "1990-01-01". Defaults to None, the start of the data.
+            end (optional): last day of the period, inclusive. Defaults to None, the end of the data.
+
+        Returns:
+            np.ndarray: counts, one per station
+        """
+        self._check_var(varname)
+        i0, i1 = self._period(start, end)
+        station, gap_start, length = self.gaps[varname]
+        overlap = np.clip(
+            np.minimum(gap_start + length, i1) - np.maximum(gap_start, i0), 0, None
+        )
+        return np.bincount(
+            station, weights=overlap, minlength=len(self.station_ids)
+        ).astype(np.int64)
+
+    def completeness(self, varname: str, start=None, end=None) -> np.ndarray:
+        """Proportion of days with data per station over a period (see `missing_counts` for the arguments)"""
+        i0, i1 = self._period(start, end)
+        n = max(i1 - i0, 0)
+        if n == 0:
+            return np.full(len(self.station_ids), np.nan)
+        return 1.0 - self.missing_counts(varname, start, end) / n
+
+    def stations_complete(
+        self, varname: str, threshold: float = 0.95, start=None, end=None
+    ) -> List[str]:
+        """Stations with at least a proportion `threshold` of days with data over a period
+
+        Args:
+            varname (str): variable
+            threshold (float, optional): minimum completeness. Defaults to 0.95.
+            start (optional): first day of the period. Defaults to None, the start of the data.
+            end (optional): last day of the period, inclusive. Defaults to None, the end of the data.
+
+        Returns:
+            List[str]: station identifiers
+        """
+        return list(
+            self.station_ids[self.completeness(varname, start, end) >= threshold]
+        )
+
+    def longest_complete_window(self, varname: str):
+        """Longest run of days without missing values, per station
+
+        Returns:
+            pd.DataFrame: indexed by station_id, with columns `start`, `end` (inclusive) and `length` in days;
+                length 0 and NaT days for stations without any data
+        """
+        import pandas as pd
+
+        self._check_var(varname)
+        n = len(self.station_ids)
+        station, gap_start, length = self.gaps[varname]
+        # complete windows lie before each gap, and after the last gap of each station
+        first = np.ones(len(station), dtype=bool)
+        first[1:] = station[1:] != station[:-1]
+        prev_end = np.zeros(len(station), dtype=np.int64)
+        prev_end[1:] = (gap_start + length)[:-1]
+        prev_end[first] = 0
+        last_end = np.zeros(n, dtype=np.int64)
+        last_end[station] = gap_start + length
+        w_station = np.concatenate([station, np.arange(n)])
+        w_start = np.concatenate([prev_end, last_end])
+        w_length = np.concatenate([gap_start - prev_end, self.length - last_end])
+        order = np.lexsort((-w_length, w_station))
+        w_station, w_start, w_length = w_station[order], w_start[order], w_length[order]
+        best = np.ones(len(w_station), dtype=bool)
+        best[1:] = w_station[1:] != w_station[:-1]
+        w_start, w_length = w_start[best], w_length[best]
+        days = self.start + w_start.astype("timedelta64[D]")
+        has_data = w_length > 0
+        return pd.DataFrame(
+            {
+                "start": np.where(has_data, days, np.datetime64("NaT")),
+                "end": np.where(
+                    has_data,
+                    days + (w_length - 1).astype("timedelta64[D]"),
+                    np.datetime64("NaT"),
+                ),
+                "length": w_length,
+            },
+            index=pd.Index(self.station_ids, name=STATION_ID_VARNAME),
+        )
+
+    def gaps_longer_than(self, varname: str, n_days: int):
+        """Gaps of more than `n_days` consecutive missing days
+
+        Returns:
+            pd.DataFrame: one row per gap, columns `station_id`, `start`, `end` (inclusive) and `length` in days
+        """
+        import pandas as pd
+
+        self._check_var(varname)
+        station, gap_start, length = self.gaps[varname]
+        sel = length > n_days
+        days = self.start + gap_start[sel].astype("timedelta64[D]")
+        return pd.DataFrame(
+            {
+                STATION_ID_VARNAME: self.station_ids[station[sel]],
+                "start": days,
+                "end": days + (length[sel] - 1).astype("timedelta64[D]"),
+                "length": length[sel],
+            }
+        )
+
+    def save(self, directory: str) -> None:
+        """Saves the index to `gaps.npz` in a cache directory"""
+        arrays = {
+            "station_id": self.station_ids,
+            "start": np.array([str(self.start)]),
+            "length": np.array([self.length]),
+        }
+        for v, (station, start, length) in self.gaps.items():
+            arrays[v + "/station"] = station
+            arrays[v + "/start"] = start
+            arrays[v + "/length"] = length
+        fn = os.path.join(directory, GAPS_FN)
+        tmp = fn + ".tmp.npz"
+        np.savez(tmp, **arrays)
+        os.replace(tmp, fn)
+
+    @staticmethod
+    def exists(directory: str) -> bool:
+        return os.path.exists(os.path.join(directory, GAPS_FN))
+
+    @staticmethod
+    def load(directory: str) -> "GapIndex":
+        """Loads an index saved with `save`"""
+        with np.load(os.path.join(directory, GAPS_FN)) as f:
+            varnames = [
+                k[: -len("/station")] for k in f.files if k.endswith("/station")
+            ]
+            gaps = dict(
+                [
+                    (v, (f[v + "/station"], f[v + "/start"], f[v + "/length"]))
+                    for v in varnames
+                ]
+            )
+            return GapIndex(
+                f["station_id"],
+                np.datetime64(str(f["start"][0])),
+                int(f["length"][0]),
+                gaps,
+            )
@@ -0,0 +1,224 @@
+"""Averaging of gridded data (rainfall, soil moisture, evapotranspiration grids...) over the CAMELS-AUS catchments.
+
+The overlap of catchment polygons with the grid cells is computed once per grid definition, as a
+sparse (station, cell) matrix of area weights. Time stacks are then aggregated with one sparse
+matrix product per chunk of time steps, instead of masking the grid with each polygon at each time step.
+Missing cells (NaN) are excluded, and the weights of the remaining cells renormalised.
+
+Requires scipy and shapely 2, imported on first use.
+"""
+
+import hashlib
+import os
+from typing import List, Tuple
+
+import numpy as np
+
+from .conventions import STATION_ID_VARNAME, TIME_DIM_NAME
+
+WEIGHTS_SUBDIR = "grid_weights"
+"""Subdirectory of the binary cache where the weight matrices are saved"""
+
+LON_DIM_NAMES = ["lon", "longitude", "x"]
+LAT_DIM_NAMES = ["lat", "latitude", "y"]
+
+
+def cell_edges(centres: np.ndarray) -> np.ndarray:
+    """Edges of grid cells from their centres, half way between neighbouring centres
+
+    Args:
+        centres (np.ndarray): coordinates of the cell centres along one axis, monotonic
+
+    Returns:
+        np.ndarray: edges, of length `len(centres) + 1`
+    """
+    centres = np.asarray(centres, dtype=np.float64)
+    if len(centres) < 2:
+        raise ValueError("At least two cells are needed along each axis of the grid")
+    mid = (centres[1:] + centres[:-1]) / 2
+    return np.concatenate(
+        [
+            [centres[0] - (mid[0] - centres[0])],
+            mid,
+            [centres[-1] + (centres[-1] - mid[-1])],
+        ]
+    )
+
+
+def grid_key(
+    lon: np.ndarray, lat: np.ndarray, station_ids: np.ndarray, geoms: np.ndarray = None
+) -> str:
+    """Hash identifying a grid definition and set of catchments, used to name cached weight matrices
+
+    Args:
+        lon (np.ndarray): longitudes of the cell centres
+        lat (np.ndarray): latitudes of the cell centres
+        station_ids (np.ndarray): station identifiers of the catchments
+        geoms (np.ndarray, optional): catchment polygons, hashed as WKB. Defaults to None.
+
+    Returns:
+        str: hexadecimal hash
+    """
+    h = hashlib.sha1()
+    for x in [lon, lat]:
+        h.update(np.ascontiguousarray(x, dtype=np.float64).tobytes())
+    h.update("\n".join([str(s) for s in station_ids]).encode())
+    if geoms is not None:
+        import shapely
+
+        for wkb in shapely.to_wkb(np.asarray(geoms)):
+            h.update(b"" if wkb is None else wkb)
+    return h.hexdigest()
+
+
+def compute_grid_weights(geoms: np.ndarray, lon: np.ndarray, lat: np.ndarray):
+    """Sparse matrix of the area weights of grid cells in catchments
+
+    Cell areas are approximated in longitude/latitude, scaled by the cosine of the latitude of the cell centre.
+
+    Args:
+        geoms (np.ndarray): catchment polygons, in longitudes and latitudes
+        lon (np.ndarray): longitudes of the cell centres
+        lat (np.ndarray): latitudes of the cell centres
+
+    Returns:
+        scipy.sparse.csr_matrix: weights of shape (n_catchments, len(lat) * len(lon)), for cells in
+            row-major (lat, lon) order. Each row sums to one, or is empty if the catchment is outside the grid.
+    """
+    import scipy.sparse
+    import shapely
+
+    lon_edges, lat_edges = cell_edges(lon), cell_edges(lat)
+    x0, x1 = np.minimum(lon_edges[:-1], lon_edges[1:]), np.maximum(
+        lon_edges[:-1], lon_edges[1:]
+    )
+    y0, y1 = np.minimum(lat_edges[:-1], lat_edges[1:]), np.maximum(
+        lat_edges[:-1], lat_edges[1:]
+    )
+    n_lon = len(lon)
+    geoms = np.asarray(geoms)
+    rows, cols, areas = [], [], []
+    for i, g in enumerate(geoms):
+        if g is None or shapely.is_empty(g):
+            continue
+        xmin, ymin, xmax, ymax = shapely.bounds(g)
+        ix = np.nonzero((x1 > xmin) & (x0 < xmax))[0]
+        iy = np.nonzero((y1 > ymin) & (y0 < ymax))[0]
+        if len(ix) == 0 or len(iy) == 0:
+            continue
+        jy, jx = [a.ravel() for a in np.meshgrid(iy, ix, indexing="ij")]
+        cells = shapely.box(x0[jx], y0[jy], x1[jx], y1[jy])
+        shapely.prepare(g)
+        a = shapely.area(shapely.intersection(cells, g))
+        a = a * np.cos(np.deg2rad(np.asarray(lat, dtype=np.float64)[jy]))
+        keep = a > 0
+        rows.append(np.full(keep.sum(), i))
+        cols.append(jy[keep] * n_lon + jx[keep])
+        areas.append(a[keep])
+    if len(rows) == 0:
+        rows, cols, areas = (
+            [np.zeros(0, dtype=np.int64)],
+            [np.zeros(0, dtype=np.int64)],
+            [np.zeros(0)],
+        )
+    w = scipy.sparse.csr_matrix(
+        (np.concatenate(areas), (np.concatenate(rows), np.concatenate(cols))),
+        shape=(len(geoms), len(lat) * n_lon),
+    )
+    totals = np.asarray(w.sum(axis=1)).ravel()
+    totals[totals == 0] = 1.0
+    return (scipy.sparse.diags(1.0 / totals) @ w).tocsr()
+
+
+def save_grid_weights(filename: str, weights, station_ids: np.ndarray) -> None:
+    """Saves a weight matrix and the station identifiers of its rows to a .npz file"""
+    w = weights.tocsr()
+    tmp = filename + ".tmp.npz"
+    np.savez(
+        tmp,
+        data=w.data,
+        indices=w.indices,
+        indptr=w.indptr,
+        shape=np.array(w.shape),
+        station_id=np.asarray(station_ids).astype(str),
+    )
+    os.replace(tmp, filename)
+
+
+def load_grid_weights(filename: str) -> Tuple:
+    """Loads a weight matrix saved with `save_grid_weights`
+
+    Returns:
+        Tuple[scipy.sparse.csr_matrix, np.ndarray]: weights, and the station identifiers of its rows
+    """
+    import scipy.sparse
+
+    with np.load(filename) as f:
+        w = scipy.sparse.csr_matrix(
+            (f["data"], f["indices"], f["indptr"]), shape=tuple(f["shape"])
+        )
+        return w, f["station_id"]
+
+
+def _grid_dims(da) -> Tuple[str, str]:
+    lon_dim = [d for d in LON_DIM_NAMES if d in da.dims]
+    lat_dim = [d for d in LAT_DIM_NAMES if d in da.dims]
+    if len(lon_dim) == 0 or len(lat_dim) == 0:
+        raise ValueError(
+            "Gridded data must have dimensions among {0} and {1}, found {2}".format(
+                LAT_DIM_NAMES, LON_DIM_NAMES, da.dims
+            )
+        )
+    return lat_dim[0], lon_dim[0]
+
+
+def aggregate_grid(da, weights, station_ids: List[str], chunk_size: int = 366):
+    """Averages gridded time series over catchments with a sparse weight matrix
+
+    Args:
+        da (xr.DataArray): gridded data of dimensions (time, lat, lon); other names of the spatial
+            dimensions in `LAT_DIM_NAMES` and `LON_DIM_NAMES` are accepted. May be backed by a lazily read NetCDF file.
+        weights (scipy.sparse.csr_matrix): weights from `compute_grid_weights` for the grid of `da`
+        station_ids (List[str]): station identifiers of the rows of `weights`
+        chunk_size (int, optional): number of time steps read and aggregated at once. Defaults to 366.
+
+    Returns:
+        xr.DataArray: catchment averages, of dimensions (time, station_id) like `load_csv_stations_tseries`.
+            NaN where a catchment has no valid cell at a time step.
+    """
+    import xarray as xr
+
+    from .conventions import get_xr_units, set_xr_units
+
+    lat_dim, lon_dim = _grid_dims(da)
+    da = da.transpose(TIME_DIM_NAME, lat_dim, lon_dim)
+    n_time = da.sizes[TIME_DIM_NAME]
+    n_cells = da.sizes[lat_dim] * da.sizes[lon_dim]
+    if weights.shape[1] != n_cells:
+        raise ValueError(
+            "Weights are for {0} cells, the grid has {1}".format(
+                weights.shape[1], n_cells
+            )
+        )
+    weights = weights.tocsr()
+    res = np.empty((n_time, weights.shape[0]), dtype=np.float64)
+    for start in range(0, n_time, chunk_size):
+        end = min(start + chunk_size, n_time)
+        x = np.asarray(
+            da.isel({TIME_DIM_NAME: slice(start, end)}).values, dtype=np.float64
+        ).reshape(end - start, n_cells)
+        valid = np.isfinite(x)
+        total = (weights @ np.where(valid, x, 0.0).T).T
+        covered = (weights @ valid.T.astype(np.float64)).T
+        with np.errstate(invalid="ignore", divide="ignore"):
+            res[start:end] = np.where(covered > 0, total / covered, np.nan)
+    res = xr.DataArray(
+        res,
+        coords={
+            TIME_DIM_NAME: da[TIME_DIM_NAME].values,
+            STATION_ID_VARNAME: np.asarray(station_ids),
+        },
+        dims=[TIME_DIM_NAME, STATION_ID_VARNAME],
+    )
+    set_xr_units(res, get_xr_units(da) or None)
+    return res
@@ -0,0 +1,260 @@
+"""Infilling of gaps in daily streamflow from donor stations, for all stations at once.
+
+For every pair of stations (target, donor), a linear regression of the target on the donor
+is fitted over the days both have data, optionally in log space. All the pairs are fitted
+together from sums over the days, computed as matrix products of the (time, station) array of
+values and its mask of observed days: a few BLAS calls instead of a loop over pairs. The donors
+of a target are the stations best correlated with it, ranked.
+
+Gaps of at most `max_gap_days` days between two observations are then filled, for the whole
+(time, station) array at once: each day of a gap is filled from the best ranked donor that has
+data that day. Leading and trailing gaps, before the first or after the last observation of a
+station, are not filled.
+
+The provenance of each value is recorded in the integer quality codes: the categories of the
+quality codes are extended with `F1`, `F2`, ..., meaning "infilled from the donor of rank 1,
+2, ...", and the donors of each station are listed in the result.
+"""
+
+from typing import List, Tuple
+
+import numpy as np
+
+from .conventions import (
+    STATION_ID_VARNAME,
+    STREAMFLOW_MMD_VARNAME,
+    STREAMFLOW_QUALITYCODES_VARNAME,
+    TIME_DIM_NAME,
+)
+from .dtypes import CATEGORIES_ATTRIB_ID
+from .gaps import run_lengths
+
+INFILLED_CODE_PREFIX = "F"
+"""Prefix of the quality codes of infilled values, followed by the rank of the donor"""
+
+DONOR_DIM_NAME = "donor_rank"
+
+
+def _transform(x: np.ndarray, log: bool, log_offset: float) -> np.ndarray:
+    x = np.asarray(x, dtype=np.float64)
+    if log:
+        with np.errstate(invalid="ignore", divide="ignore"):
+            x = np.log(np.maximum(x, 0.0) + log_offset)
+    return x
+
+
+def _inverse(y: np.ndarray, log: bool, log_offset: float) -> np.ndarray:
+    if log:
+        return np.maximum(np.exp(y) - log_offset, 0.0)
+    return np.maximum(y, 0.0)
+
+
+def pairwise_regressions(x: np.ndarray) -> Tuple[np.ndarray, ...]:
+    """Linear regressions of every station on every other station, over the days both have data
+
+    Args:
+        x (np.ndarray): values, shape (time, station), NaN where missing
+
+    Returns:
+        Tuple[np.ndarray, ...]: arrays of shape (target, donor): number of common days, correlation,
+            intercept and slope of `target = intercept + slope * donor`
+    """
+    mask = np.isfinite(x)
+    # centring each station reduces the cancellation in the variances computed from sums
+    with np.errstate(invalid="ignore"):
+        means = np.nanmean(np.where(mask, x, np.nan), axis=0)
+    means = np.where(np.isfinite(means), means, 0.0)
+    xc = np.where(mask, x - means, 0.0)
+    m = mask.astype(np.float64)
+    n = m.T @ m
+    # sums over the days both target (row) and donor (column) have data
+    s_donor = m.T @ xc
+    s_target = s_donor.T
+    ss_donor = m.T @ (xc * xc)
+    ss_target = ss_donor.T
+    s_cross = xc.T @ xc
+    with np.errstate(invalid="ignore", divide="ignore"):
+        cov = s_cross - s_target * s_donor / n
+        var_donor = ss_donor - s_donor**2 / n
+        var_target = ss_target - s_target**2 / n
+        r = cov / np.sqrt(var_donor * var_target)
+        slope = cov / var_donor
+        intercept = (s_target - slope * s_donor) / n
+    intercept = intercept + means[:, np.newaxis] - slope * means[np.newaxis, :]
+    return n.astype(np.int64), r, intercept, slope
+
+
+def select_donors(
+    n: np.ndarray,
+    r: np.ndarray,
+    n_donors: int = 3,
+    min_overlap_days: int = 365,
+    min_correlation: float = 0.7,
+) -> np.ndarray:
+    """Best correlated donors of each target station
+
+    Args:
+        n (np.ndarray): numbers of common days, shape (target, donor)
+        r (np.ndarray): correlations, shape (target, donor)
+        n_donors (int, optional): maximum number of donors per target. Defaults to 3.
+        min_overlap_days (int, optional): minimum number of common days of a donor. Defaults to 365.
+        min_correlation (float, optional): minimum correlation of a donor. Defaults to 0.7.
+
+    Returns:
+        np.ndarray: indices of the donors, shape (target, rank), best first; -1 where there are fewer donors
+    """
+    score = np.where(
+        (n >= min_overlap_days) & np.isfinite(r) & (r >= min_correlation), r, -np.inf
+    )
+    np.fill_diagonal(score, -np.inf)
+    order = np.argsort(-score, axis=1, kind="stable")[:, :n_donors]
+    ok = np.isfinite(np.take_along_axis(score, order, axis=1))
+    return np.where(ok, order, -1)
+
+
+def fillable_gaps(missing: np.ndarray, max_gap_days: int) -> np.ndarray:
+    """Mask of the days in gaps of at most `max_gap_days` days between two observations
+
+    Args:
+        missing (np.ndarray): boolean mask of the missing values, shape (time, station)
+        max_gap_days (int): maximum length of the gaps filled
+
+    Returns:
+        np.ndarray: boolean mask, shape (time, station)
+    """
+    n_time = missing.shape[0]
+    station, start, length = run_lengths(missing)
+    keep = (start > 0) & (start + length < n_time) & (length <= max_gap_days)
+    station, start, length = station[keep], start[keep], length[keep]
+    # days of the kept runs, without a loop over the runs
+    first = np.repeat(np.cumsum(length) - length, length)
+    days = np.repeat(start, length) + np.arange(length.sum()) - first
+    res = np.zeros(missing.shape, dtype=bool)
+    res[days, np.repeat(station, length)] = True
+    return res
+
+
+def _quality_codes(ds, codes_varname: str) -> Tuple[np.ndarray, List[str]]:
+    # integer codes (time, station) and categories of the quality codes, stored as strings or codes
+    if not codes_varname in ds.data_vars:
+        shape = (len(ds[TIME_DIM_NAME]), len(ds[STATION_ID_VARNAME]))
+        return np.full(shape, -1, dtype=np.int8), []
+    da = ds[codes_varname].transpose(TIME_DIM_NAME, STATION_ID_VARNAME)
+    if CATEGORIES_ATTRIB_ID in da.attrs:
+        return np.array(da.values, dtype=np.int8), list(da.attrs[CATEGORIES_ATTRIB_ID])
+    from .dtypes import encode_strings
+
+    encoded = encode_strings(da)
+    return encoded.values.astype(np.int8), encoded.attrs[CATEGORIES_ATTRIB_ID]
+
+
+def infill_streamflow(
+    ds,
+    n_donors: int = 3,
+    max_gap_days: int = 30,
+    min_overlap_days: int = 365,
+    min_correlation: float = 0.7,
+    log: bool = True,
+    log_offset: float = 0.01,
+    varname: str = STREAMFLOW_MMD_VARNAME,
+    codes_varname: str = STREAMFLOW_QUALITYCODES_VARNAME,
+):
+    """Fills the gaps of a daily series of all stations from donor stations
+
+    Args:
+        ds (xr.Dataset): dataset, typically `CamelsAus.data`
+        n_donors (int, optional): maximum number of donors per station. Defaults to 3.
+        max_gap_days (int, optional): maximum length of the gaps filled. Defaults to 30.
+        min_overlap_days (int, optional): minimum number of days a donor has data in common with the target. Defaults to 365.
+        min_correlation (float, optional): minimum correlation of a donor with the target, in the space of the regression. Defaults to 0.7.
+        log (bool, optional): fit the regressions on `log(q + log_offset)`, suited to streamflow. Defaults to True.
+        log_offset (float, optional): offset for zero flows in log space, in the units of the series. Defaults to 0.01.
+        varname (str, optional): daily series. Defaults to "streamflow_mmd".
+        codes_varname (str, optional): quality codes of the series; if not in the dataset, the codes are only those of
+            the infilled values. Defaults to "streamflow_QualityCodes".
+
+    Returns:
+        xr.Dataset: the infilled series `varname`; its integer quality codes `codes_varname`, categories in the
+            attribute `categories` and -1 for missing values, with `F<rank>` for infilled values; and, of
+            dimensions (station_id, donor_rank), the donors `donor` ("" where none), `correlation`, `intercept`
+            and `slope` of the regressions
+    """
+    import xarray as xr
+
+    da = ds[varname].transpose(TIME_DIM_NAME, STATION_ID_VARNAME)
+    x = _transform(da.values, log, log_offset)
+    n, r, intercept, slope = pairwise_regressions(x)
+    donors = select_donors(n, r, n_donors, min_overlap_days, min_correlation)
+    n_donors = donors.shape[1]
+
+    codes, categories = _quality_codes(ds, codes_varname)
+    infilled_codes = [
+        "{0}{1}".format(INFILLED_CODE_PREFIX, k + 1) for k in range(n_donors)
+    ]
+    clash = [c for c in infilled_codes if c in categories]
+    if len(clash) > 0:
+        raise ValueError(
+            "Quality codes {0} already used by {1}".format(clash, codes_varname)
+        )
+    first_infilled_code = len(categories)
+
+    missing = ~np.isfinite(x)
+    todo = fillable_gaps(missing, max_gap_days)
+    filled = np.array(da.values, dtype=np.float64)
+    stations = np.arange(x.shape[1])
+    for k in range(n_donors):
+        if not todo.any():
+            break
+        d = donors[:, k]
+        has_donor = d >= 0
+        # regression of each target on its donor of rank k, applied to the whole time axis
+        a = np.where(has_donor, intercept[stations, np.maximum(d, 0)], np.nan)
+        b = np.where(has_donor, slope[stations, np.maximum(d, 0)], np.nan)
+        predicted = a + b * x[:, np.maximum(d, 0)]
+        use = todo & np.isfinite(predicted)
+        filled[use] = _inverse(predicted[use], log, log_offset)
+        codes[use] = first_infilled_code + k
+        todo &= ~use
+
+    ids = ds[STATION_ID_VARNAME].values
+    donor_coords = {
+        STATION_ID_VARNAME: ids,
+        DONOR_DIM_NAME: np.arange(1, n_donors + 1),
+    }
+    donor_dims = [STATION_ID_VARNAME, DONOR_DIM_NAME]
+    none = donors < 0
+    safe = np.maximum(donors, 0)
+    rows = stations[:, np.newaxis]
+
+    def donor_var(values):
+        return xr.DataArray(
+            np.where(none, np.nan, values), coords=donor_coords, dims=donor_dims
+        )
+
+    return xr.Dataset(
+        {
+            varname: da.copy(data=filled.astype(da.dtype)),
+            codes_varname: xr.DataArray(
+                codes,
+                coords=da.coords,
+                dims=da.dims,
+                attrs={CATEGORIES_ATTRIB_ID: categories + infilled_codes},
+            ),
+            "donor": xr.DataArray(
+                np.where(none, "", np.asarray(ids, dtype=str)[safe]).astype(object),
+                coords=donor_coords,
+                dims=donor_dims,
+            ),
+            "correlation": donor_var(r[rows, safe]),
+            "intercept": donor_var(intercept[rows, safe]),
+            "slope": donor_var(slope[rows, safe]),
+        },
+        attrs={
+            "n_donors": n_donors,
+            "max_gap_days": max_gap_days,
+            "min_overlap_days": min_overlap_days,
+            "min_correlation": min_correlation,
+            "log": int(log),
+            "log_offset": log_offset,
+        },
+    )
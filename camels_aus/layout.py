@@ -0,0 +1,131 @@
+"""Memory layouts of the daily series.
+
+Daily series have dimensions (time, station_id) whatever their layout in memory:
+
+* time-major (`TIME_MAJOR`, the layout of the binary cache): C-ordered, the values of a day are
+    contiguous. Suits slicing periods, appending days, and reductions over all stations.
+* station-major (`STATION_MAJOR`): Fortran-ordered, the whole record of a station is contiguous,
+    so that `da[:, j].values` is a contiguous view. Suits per-station workloads such as calibration.
+
+The layout only changes the strides of the arrays, so code indexing the arrays works unchanged
+with either. For per-station work over several series, `fused_block` gathers them into one
+(station, variable, time) array, where the inputs of a station are a single contiguous block.
+"""
+
+from typing import List
+
+import numpy as np
+
+from .conventions import STATION_ID_VARNAME, TIME_DIM_NAME
+
+TIME_MAJOR = "time_major"
+"""Daily series C-ordered, (time, station): the values of a day are contiguous"""
+
+STATION_MAJOR = "station_major"
+"""Daily series Fortran-ordered, (time, station): the record of a station is contiguous"""
+
+LAYOUTS = [TIME_MAJOR, STATION_MAJOR]
+
+
+def check_layout(layout: str) -> None:
+    """Raises a ValueError if `layout` is not one of `LAYOUTS`"""
+    if not layout in LAYOUTS:
+        raise ValueError(
+            "Unknown layout {0}, expected one of {1}".format(layout, LAYOUTS)
+        )
+
+
+def array_layout(x: np.ndarray) -> str:
+    """Layout of an array of dimensions (time, station), None if neither C nor Fortran contiguous
+
+    An array contiguous in both orders, e.g. of a single station, is time-major.
+    """
+    if x.flags.c_contiguous:
+        return TIME_MAJOR
+    if x.flags.f_contiguous:
+        return STATION_MAJOR
+    return None
+
+
+def to_layout(x: np.ndarray, layout: str) -> np.ndarray:
+    """An array of dimensions (time, station) in a layout; the array itself if already in that layout"""
+    check_layout(layout)
+    if layout == STATION_MAJOR:
+        return np.asfortranarray(x)
+    return np.ascontiguousarray(x)
+
+
+def _daily_vars(ds) -> List[str]:
+    # numeric series only: xarray stores arrays of strings (quality codes) C-ordered
+    return [
+        v
+        for v in ds.data_vars
+        if ds[v].dims == (TIME_DIM_NAME, STATION_ID_VARNAME) and ds[v].dtype.kind != "O"
+    ]
+
+
+def dataset_layout(ds) -> str:
+    """Layout of the numeric daily series of a dataset, None if they have different layouts"""
+    layouts = set([array_layout(ds[v].values) for v in _daily_vars(ds)])
+    return layouts.pop() if len(layouts) == 1 else None
+
+
+def with_layout(ds, layout: str):
+    """A dataset with its numeric daily series in a layout; series already in that layout are not copied
+
+    Args:
+        ds (xr.Dataset): dataset, typically `CamelsAus.data`
+        layout (str): `TIME_MAJOR` or `STATION_MAJOR`
+
+    Returns:
+        xr.Dataset: dataset with the same variables, dimensions and attributes
+    """
+    check_layout(layout)
+    return ds.assign(
+        dict(
+            [
+                (v, ds[v].copy(data=to_layout(ds[v].values, layout)))
+                for v in _daily_vars(ds)
+            ]
+        )
+    )
+
+
+def fused_block(
+    ds,
+    varnames: List[str],
+    station_ids: List[str] = None,
+    dtype=np.float64,
+    out: np.ndarray = None,
+) -> np.ndarray:
+    """Several daily series fused into one station-major block of dimensions (station, variable, time)
+
+    `block[j]` is a contiguous (variable, time) array of all the inputs of station `j`, and
+    `block[j, k, t0:t1]` a contiguous period of one series.
+
+    Args:
+        ds (xr.Dataset): dataset, typically `CamelsAus.data`
+        varnames (List[str]): daily series, e.g. rainfall, evapotranspiration and streamflow
+        station_ids (List[str], optional): stations. Defaults to None, all stations.
+        dtype (optional): type of the block. Defaults to np.float64.
+        out (np.ndarray, optional): C-contiguous array of shape (station, variable, time) the block is written into,
+            e.g. over a shared memory buffer. Defaults to None, a new array of type `dtype`.
+
+    Returns:
+        np.ndarray: C-contiguous array of shape (station, variable, time), `out` if given
+    """
+    if station_ids is not None:
+        ds = ds.sel({STATION_ID_VARNAME: station_ids})
+    n_time, n_stations = len(ds[TIME_DIM_NAME]), len(ds[STATION_ID_VARNAME])
+    shape = (n_stations, len(varnames), n_time)
+    if out is None:
+        out = np.empty(shape, dtype=dtype)
+    elif out.shape != shape or not out.flags.c_contiguous:
+        raise ValueError(
+            "Expected a C-contiguous array of shape {0}, got {1}".format(
+                shape, out.shape
+            )
+        )
+    for k, v in enumerate(varnames):
+        out[:, k, :] = ds[v].transpose(TIME_DIM_NAME, STATION_ID_VARNAME).values.T
+    return out
@@ -0,0 +1,304 @@
+"""Persistent memoisation of products derived from the CAMELS-AUS data.
+
+Results are stored on disk, one pickle file per key, in a directory shared by all jobs using
+the same data. A key is a hash of the fingerprint of the source data (dataset version,
+variables, stations and time axis of the subset used, and a stamp of the content of the source
+files or binary cache, or a hash of the values for `MemoStore.memoise`), of the name of the
+product and of its parameters. The total size of the directory is kept under a budget by
+evicting the least recently used results; a hit refreshes the modification time of a file, used
+as its last access time.
+
+Writers may run concurrently, in several processes: results are written to a temporary file
+then renamed, so that a reader never sees a partial file, and writes and evictions are
+serialised by an exclusive lock on a lock file of the directory (where `fcntl` is available).
+"""
+
+import hashlib
+import importlib
+import json
+import os
+import pickle
+import tempfile
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, List, Tuple, Union
+
+import numpy as np
+
+from .conventions import STATION_ID_VARNAME, TIME_DIM_NAME
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover - not on Windows
+    fcntl = None
+
+MEMO_SUBDIR = "memo"
+"""Subdirectory of the binary cache where derived products are memoised"""
+
+DEFAULT_MAX_BYTES = 2 * 1024**3
+"""Default size budget of a memoisation directory, 2 GiB"""
+
+RESULT_EXT = ".pkl"
+LOCK_FN = ".lock"
+
+PRODUCTS = {
+    "resampled": "camels_aus.resample:resample_dataset",
+    "flood_events": "camels_aus.events:flood_events",
+    "annual_maxima": "camels_aus.events:annual_maxima",
+    "recessions": "camels_aus.events:recessions",
+    "climate_indices": "camels_aus.climate:climate_indices",
+    "infilled": "camels_aus.infill:infill_streamflow",
+}
+"""Registry of the derived products, by name: functions `f(ds, **params)`, or their "module:function" paths"""
+
+
+def register_product(name: str = None) -> Callable:
+    """Decorator registering a function `f(ds, **params)` as a derived product, under its name by default"""
+
+    def decorator(func: Callable) -> Callable:
+        PRODUCTS[func.__name__ if name is None else name] = func
+        return func
+
+    return decorator
+
+
+def product_function(name: str) -> Callable:
+    """The function of a registered product"""
+    if not name in PRODUCTS:
+        raise KeyError(
+            "Unknown product {0}, registered products are {1}".format(
+                name, list(PRODUCTS.keys())
+            )
+        )
+    func = PRODUCTS[name]
+    if isinstance(func, str):
+        module, attr = func.split(":")
+        func = getattr(importlib.import_module(module), attr)
+        PRODUCTS[name] = func
+    return func
+
+
+def dataset_fingerprint(ds, version: str = None, stamp: str = None) -> Dict[str, Any]:
+    """Description of a dataset identifying the data derived products are computed from
+
+    The values themselves are not hashed: the version, variables, stations and time axis, with
+    a stamp of the content of the source (see `directory_stamp`, and the `write_id` of a binary
+    cache manifest), identify a dataset loaded from the reference files or the binary cache.
+
+    Args:
+        ds (xr.Dataset): dataset, or subset of the dataset, a product is computed from
+        version (str, optional): version of the dataset. Defaults to None.
+        stamp (str, optional): stamp of the content the dataset was loaded from. Defaults to None.
+
+    Returns:
+        Dict[str, Any]: fingerprint, serialisable to JSON
+    """
+    fp = {
+        "version": version,
+        "stamp": stamp,
+        "variables": sorted([(v, str(ds[v].dtype)) for v in ds.data_vars]),
+        "stations": [str(s) for s in ds[STATION_ID_VARNAME].values],
+    }
+    if TIME_DIM_NAME in ds.dims:
+        time = ds[TIME_DIM_NAME].values
+        fp["time"] = [str(time[0])[:10], str(time[-1])[:10], len(time)]
+    return fp
+
+
+def directory_stamp(directory: str) -> str:
+    """Hash of the relative paths, sizes and modification times of the files of a directory, a cheap stamp of their content"""
+    content = []
+    for root, _, files in os.walk(directory):
+        for fn in files:
+            st = os.stat(os.path.join(root, fn))
+            rel = os.path.relpath(os.path.join(root, fn), directory)
+            content.append([rel.replace(os.sep, "/"), st.st_size, st.st_mtime_ns])
+    return hashlib.sha1(json.dumps(sorted(content)).encode()).hexdigest()
+
+
+def content_stamp(ds) -> str:
+    """Hash of the values of all the variables and coordinates of a dataset, a stamp of a dataset modified in memory
+
+    Reads all the values, including those of memory-mapped arrays.
+    """
+    h = hashlib.sha1()
+    for v in sorted(ds.variables):
+        x = ds[v].values
+        h.update(json.dumps([str(v), str(x.dtype), list(x.shape)]).encode())
+        if x.dtype.kind == "O":
+            h.update("\x00".join([str(e) for e in x.ravel()]).encode())
+        else:
+            h.update(np.ascontiguousarray(x).reshape(-1).view(np.uint8).data)
+    return h.hexdigest()
+
+
+def product_key(name: str, fingerprint: Dict[str, Any], params: Dict[str, Any]) -> str:
+    """Hash of a product name, dataset fingerprint and parameters"""
+    content = {"product": name, "data": fingerprint, "params": params}
+    return hashlib.sha1(
+        json.dumps(content, sort_keys=True, default=str).encode()
+    ).hexdigest()
+
+
+class MemoStore:
+    """Directory of memoised results, with a size budget and least recently used eviction"""
+
+    def __init__(self, directory: str, max_bytes: int = DEFAULT_MAX_BYTES) -> None:
+        """Constructor
+
+        Args:
+            directory (str): directory of the results, created if needed
+            max_bytes (int, optional): size budget of the results. Defaults to DEFAULT_MAX_BYTES.
+        """
+        os.makedirs(directory, exist_ok=True)
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.writes = 0
+        self.evictions = 0
+
+    def _filename(self, key: str) -> str:
+        return os.path.join(self.directory, key + RESULT_EXT)
+
+    @contextmanager
+    def _lock(self):
+        with open(os.path.join(self.directory, LOCK_FN), "a") as f:
+            if fcntl is not None:
+                fcntl.flock(f, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                if fcntl is not None:
+                    fcntl.flock(f, fcntl.LOCK_UN)
+
+    def _entries(self) -> List[Tuple[float, int, str]]:
+        # (last access, size, filename) of the results, least recently used first
+        entries = []
+        for fn in os.listdir(self.directory):
+            if not fn.endswith(RESULT_EXT):
+                continue
+            path = os.path.join(self.directory, fn)
+            try:
+                st = os.stat(path)
+            except FileNotFoundError:
+                continue
+            entries.append((st.st_mtime, st.st_size, path))
+        return sorted(entries)
+
+    def __contains__(self, key: str) -> bool:
+        return os.path.exists(self._filename(key))
+
+    def get(self, key: str) -> Tuple[bool, Any]:
+        """Looks up a result
+
+        Returns:
+            Tuple[bool, Any]: whether the result was found, and the result
+        """
+        fn = self._filename(key)
+        try:
+            with open(fn, "rb") as f:
+                value = pickle.load(f)
+            os.utime(fn)
+        except FileNotFoundError:
+            # absent, or evicted by another process since
+            self.misses += 1
+            return False, None
+        self.hits += 1
+        return True, value
+
+    def put(self, key: str, value: Any) -> None:
+        """Stores a result, then evicts the least recently used results over the size budget"""
+        fd, tmp = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                pickle.dump(value, f, protocol=pickle.HIGHEST_PROTOCOL)
+            with self._lock():
+                os.replace(tmp, self._filename(key))
+                self.writes += 1
+                self._evict(self.max_bytes, keep=self._filename(key))
+        except BaseException:
+            if os.path.exists(tmp):
+                os.remove(tmp)
+            raise
+
+    def _evict(self, max_bytes: int, keep: str = None) -> None:
+        entries = self._entries()
+        total = sum([e[1] for e in entries])
+        for _, size, path in entries:
+            if total <= max_bytes:
+                break
+            if path == keep:
+                continue
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            total -= size
+            self.evictions += 1
+
+    def evict(self, max_bytes: int = None) -> None:
+        """Evicts the least recently used results until their total size is under a budget, by default the budget of the store"""
+        with self._lock():
+            self._evict(self.max_bytes if max_bytes is None else max_bytes)
+
+    def clear(self) -> None:
+        """Removes all the results"""
+        self.evict(0)
+
+    @property
+    def nbytes(self) -> int:
+        """Total size of the results stored"""
+        return sum([e[1] for e in self._entries()])
+
+    def stats(self) -> Dict[str, int]:
+        """Hits, misses, writes and evictions of this store object, and the number and size of the results stored"""
+        entries = self._entries()
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "writes": self.writes,
+            "evictions": self.evictions,
+            "entries": len(entries),
+            "nbytes": sum([e[1] for e in entries]),
+        }
+
+    def memoise(
+        self,
+        func: Callable,
+        name: str = None,
+        version: str = None,
+        stamp: Union[str, Callable] = None,
+    ):
+        """Memoised version of a function `f(ds, **params)` of a dataset
+
+        Args:
+            func (Callable): function of a dataset and keyword parameters
+            name (str, optional): name of the product in the keys. Defaults to None, the qualified name of the function.
+            version (str, optional): version of the dataset, part of its fingerprint. Defaults to None.
+            stamp (Union[str, Callable], optional): stamp of the content of the dataset, part of its fingerprint, or a
+                function `stamp(ds)` computing it, e.g. `lambda ds: directory_stamp(source_dir)`. Defaults to None,
+                `content_stamp`, a hash of all the values of the dataset.
+
+        Returns:
+            Callable: function `f(ds, **params)` returning memoised results
+        """
+        name = (
+            "{0}.{1}".format(func.__module__, func.__qualname__)
+            if name is None
+            else name
+        )
+
+        get_stamp = content_stamp if stamp is None else stamp
+
+        def memoised(ds, **params):
+            ds_stamp = get_stamp(ds) if callable(get_stamp) else get_stamp
+            key = product_key(name, dataset_fingerprint(ds, version, ds_stamp), params)
+            found, value = self.get(key)
+            if not found:
+                value = func(ds, **params)
+                self.put(key, value)
+            return value
+
+        memoised.__name__ = func.__name__
+        memoised.__doc__ = func.__doc__
+        return memoised
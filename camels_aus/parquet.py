@@ -0,0 +1,316 @@
+"""Export of the CAMELS-AUS dataset to partitioned Parquet files in long format, and reading back.
+
+Daily series are written in long format (station_id, date, one column per variable), one
+station at a time so that peak memory stays near the size of one partition. Station
+attributes and streamflow gauging statistics are written to separate tables.
+Variables stored as integer codes by a dtype policy (see `camels_aus.dtypes`) are written as
+their strings, so that they read back as strings.
+
+Requires the optional dependency `pyarrow`.
+"""
+
+import json
+import os
+from typing import Dict, List
+from urllib.parse import quote
+
+import numpy as np
+import pandas as pd
+import xarray as xr
+
+from .conventions import (
+    DRAINAGE_DIVISION_VARNAME,
+    STATION_ID_VARNAME,
+    TIME_DIM_NAME,
+    XR_UNITS_ATTRIB_ID,
+    daily_varnames,
+    get_xr_units,
+    set_xr_units,
+    streamflow_gaugingstats_names,
+)
+from .dtypes import decode_categorical
+
+DATE_COLNAME = "date"
+DAILY_SUBDIR = "daily"
+ATTRIBUTES_TABLE_FN = "attributes.parquet"
+GAUGINGSTATS_TABLE_FN = "gauging_stats.parquet"
+MANIFEST_FN = "_camels_aus.json"
+
+PARTITION_BY_STATION = "station"
+PARTITION_BY_DRAINAGE_DIVISION = "drainage_division"
+
+
+def _pyarrow():
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError:
+        raise ImportError(
+            "Parquet export requires the optional package 'pyarrow' (pip install pyarrow)"
+        )
+    return pa, pq
+
+
+def _to_arrow_array(pa, values: np.ndarray):
+    if values.dtype.kind == "O":
+        return pa.array(values, type=pa.string(), from_pandas=True)
+    return pa.array(values, from_pandas=True)
+
+
+def _field_metadata(da: xr.DataArray) -> Dict[bytes, bytes]:
+    units = get_xr_units(da)
+    return {XR_UNITS_ATTRIB_ID.encode(): units.encode()} if units else None
+
+
+def _station_table(pa, ds: xr.Dataset, varnames: List[str]):
+    arrays = [_to_arrow_array(pa, ds[STATION_ID_VARNAME].values)]
+    fields = [pa.field(STATION_ID_VARNAME, pa.string())]
+    for v in varnames:
+        a = _to_arrow_array(pa, decode_categorical(ds[v]).values)
+        arrays.append(a)
+        fields.append(pa.field(v, a.type, metadata=_field_metadata(ds[v])))
+    return pa.Table.from_arrays(arrays, schema=pa.schema(fields))
+
+
+def _daily_table(pa, ds: xr.Dataset, varnames: List[str], station_index: int, dates):
+    n = len(dates)
+    station_id = ds[STATION_ID_VARNAME].values[station_index]
+    arrays = [
+        pa.DictionaryArray.from_arrays(
+            pa.array(np.zeros(n, dtype=np.int32)), pa.array([station_id])
+        ),
+        dates,
+    ]
+    fields = [
+        pa.field(STATION_ID_VARNAME, pa.dictionary(pa.int32(), pa.string())),
+        pa.field(DATE_COLNAME, pa.date32()),
+    ]
+    for v in varnames:
+        da = ds[v]
+        # one station at a time: only this column is made contiguous in memory
+        col = decode_categorical(da.isel({STATION_ID_VARNAME: station_index})).values
+        col = np.ascontiguousarray(col)
+        a = _to_arrow_array(pa, col)
+        arrays.append(a)
+        fields.append(pa.field(v, a.type, metadata=_field_metadata(da)))
+    return pa.Table.from_arrays(arrays, schema=pa.schema(fields))
+
+
+def _partition_path(directory: str, partition_by: str, key: str) -> str:
+    daily_dir = os.path.join(directory, DAILY_SUBDIR)
+    if partition_by == PARTITION_BY_STATION:
+        return os.path.join(daily_dir, quote(key, safe="") + ".parquet")
+    # hive style, so that DuckDB, Spark and pyarrow.dataset recover the key as a column
+    return os.path.join(
+        daily_dir,
+        "{0}={1}".format(DRAINAGE_DIVISION_VARNAME, quote(key, safe="")),
+        "part-0.parquet",
+    )
+
+
+def write_parquet(
+    ds: xr.Dataset,
+    directory: str,
+    partition_by: str = PARTITION_BY_STATION,
+    compression: str = "zstd",
+) -> None:
+    """Writes a CAMELS-AUS dataset to a directory of Parquet files
+
+    Layout of the output directory:
+
+    * `daily/`: daily series in long format (station_id, date, variables...).
+        One file per station if partitioned by station, or one hive-style
+        `drainage_division=<name>` directory per division, with one row group per station.
+    * `attributes.parquet`: one row per station, with all the station attributes
+    * `gauging_stats.parquet`: one row per station, with the streamflow gauging statistics
+    * `_camels_aus.json`: a small manifest used by `read_parquet`
+
+    Args:
+        ds (xr.Dataset): dataset, typically `CamelsAus.data`
+        directory (str): output directory
+        partition_by (str, optional): "station" or "drainage_division". Defaults to "station".
+        compression (str, optional): Parquet compression codec. Defaults to "zstd".
+
+    Raises:
+        ValueError: unknown partitioning scheme
+    """
+    pa, pq = _pyarrow()
+    if partition_by not in [PARTITION_BY_STATION, PARTITION_BY_DRAINAGE_DIVISION]:
+        raise ValueError(
+            "Unknown partitioning '{0}', expected '{1}' or '{2}'".format(
+                partition_by, PARTITION_BY_STATION, PARTITION_BY_DRAINAGE_DIVISION
+            )
+        )
+    os.makedirs(os.path.join(directory, DAILY_SUBDIR), exist_ok=True)
+    daily = [v for v in daily_varnames() if v in ds.data_vars]
+    gauging = [v for v in streamflow_gaugingstats_names() if v in ds.data_vars]
+    attributes = [
+        v
+        for v in ds.data_vars
+        if ds[v].dims == (STATION_ID_VARNAME,) and v not in gauging
+    ]
+    pq.write_table(
+        _station_table(pa, ds, attributes),
+        os.path.join(directory, ATTRIBUTES_TABLE_FN),
+        compression=compression,
+    )
+    pq.write_table(
+        _station_table(pa, ds, gauging),
+        os.path.join(directory, GAUGINGSTATS_TABLE_FN),
+        compression=compression,
+    )
+
+    time = pd.DatetimeIndex(ds[TIME_DIM_NAME].values)
+    dates = pa.array(time.values.astype("datetime64[D]"), type=pa.date32())
+    station_ids = [str(s) for s in ds[STATION_ID_VARNAME].values]
+    if partition_by == PARTITION_BY_STATION:
+        keys = station_ids
+    else:
+        keys = [
+            str(k) for k in decode_categorical(ds[DRAINAGE_DIVISION_VARNAME]).values
+        ]
+
+    writers = {}
+    try:
+        for i, key in enumerate(keys):
+            table = _daily_table(pa, ds, daily, i, dates)
+            if not key in writers:
+                fn = _partition_path(directory, partition_by, key)
+                os.makedirs(os.path.dirname(fn), exist_ok=True)
+                writers[key] = pq.ParquetWriter(
+                    fn, table.schema, compression=compression, write_statistics=True
+                )
+            # One row group per station: min/max statistics on station_id and date
+            # let query engines skip row groups.
+            writers[key].write_table(table, row_group_size=len(time))
+            del table
+    finally:
+        for w in writers.values():
+            w.close()
+
+    manifest = {
+        "partition_by": partition_by,
+        "start": str(time[0].date()),
+        "length": len(time),
+        STATION_ID_VARNAME: station_ids,
+        "partitions": sorted(set(keys)),
+        "daily_varnames": daily,
+    }
+    with open(os.path.join(directory, MANIFEST_FN), "w") as f:
+        json.dump(manifest, f, indent=1)
+
+
+def _table_to_vars(table) -> Dict[str, xr.DataArray]:
+    station_ids = table.column(STATION_ID_VARNAME).to_numpy(zero_copy_only=False)
+    res = {}
+    for field in table.schema:
+        if field.name == STATION_ID_VARNAME:
+            continue
+        values = table.column(field.name).to_numpy(zero_copy_only=False)
+        da = xr.DataArray(
+            values,
+            coords={STATION_ID_VARNAME: station_ids},
+            dims=[STATION_ID_VARNAME],
+        )
+        _set_units_from_field(da, field)
+        res[field.name] = da
+    return res
+
+
+def _set_units_from_field(da: xr.DataArray, field) -> None:
+    if field.metadata is not None:
+        units = field.metadata.get(XR_UNITS_ATTRIB_ID.encode())
+        if units is not None:
+            set_xr_units(da, units.decode())
+
+
+def read_parquet(
+    directory: str, station_ids: List[str] = None, varnames: List[str] = None
+) -> xr.Dataset:
+    """Reads a directory written by `write_parquet` back into the layout of `CamelsAus.data`
+
+    Args:
+        directory (str): directory written by `write_parquet`
+        station_ids (List[str], optional): subset of stations to read. Defaults to None, all stations.
+        varnames (List[str], optional): subset of daily variables to read. Defaults to None, all variables.
+
+    Returns:
+        xr.Dataset: dataset with daily series of dimensions (time, station_id) and station attributes
+    """
+    pa, pq = _pyarrow()
+    manifest_fn = os.path.join(directory, MANIFEST_FN)
+    if not os.path.exists(manifest_fn):
+        raise FileNotFoundError("File {0} not found".format(manifest_fn))
+    with open(manifest_fn, "r") as f:
+        manifest = json.load(f)
+    all_stations = manifest[STATION_ID_VARNAME]
+    if station_ids is None:
+        station_ids = all_stations
+    station_ids = [str(s) for s in station_ids]
+    if varnames is None:
+        varnames = manifest["daily_varnames"]
+    start = np.datetime64(manifest["start"], "D")
+    n = manifest["length"]
+    time = pd.DatetimeIndex(start + np.arange(n))
+    column_of = dict([(s, i) for i, s in enumerate(station_ids)])
+
+    d = {}
+    attributes = pq.read_table(os.path.join(directory, ATTRIBUTES_TABLE_FN))
+    gauging = pq.read_table(os.path.join(directory, GAUGINGSTATS_TABLE_FN))
+    for table in [attributes, gauging]:
+        for k, da in _table_to_vars(table).items():
+            d[k] = da.sel({STATION_ID_VARNAME: station_ids})
+
+    if manifest["partition_by"] == PARTITION_BY_STATION:
+        files = [
+            _partition_path(directory, PARTITION_BY_STATION, s) for s in station_ids
+        ]
+        station_filter = None
+    else:
+        divisions = dict(
+            zip(
+                all_stations,
+                [
+                    str(x)
+                    for x in attributes.column(DRAINAGE_DIVISION_VARNAME).to_pylist()
+                ],
+            )
+        )
+        wanted = sorted(set([divisions[s] for s in station_ids]))
+        files = [
+            _partition_path(directory, PARTITION_BY_DRAINAGE_DIVISION, k)
+            for k in wanted
+        ]
+        station_filter = [(STATION_ID_VARNAME, "in", station_ids)]
+
+    arrays = {}
+    for fn in files:
+        table = pq.read_table(
+            fn,
+            columns=[STATION_ID_VARNAME, DATE_COLNAME] + varnames,
+            filters=station_filter,
+        )
+        if table.num_rows == 0:
+            continue
+        # rows are grouped by station, and dates are daily from the manifest start date
+        stations = table.column(STATION_ID_VARNAME).to_numpy(zero_copy_only=False)
+        rows = (
+            table.column(DATE_COLNAME).to_numpy().astype("datetime64[D]") - start
+        ).astype(np.int64)
+        cols = np.array([column_of[str(s)] for s in stations])
+        for v in varnames:
+            field = table.schema.field(v)
+            values = table.column(v).to_numpy(zero_copy_only=False)
+            if not v in arrays:
+                fill = None if values.dtype.kind == "O" else np.nan
+                arrays[v] = xr.DataArray(
+                    np.full((n, len(station_ids)), fill, dtype=values.dtype),
+                    coords={TIME_DIM_NAME: time, STATION_ID_VARNAME: station_ids},
+                    dims=[TIME_DIM_NAME, STATION_ID_VARNAME],
+                )
+                _set_units_from_field(arrays[v], field)
+            arrays[v].values[rows, cols] = values
+    for v in varnames:
+        if v in arrays:
+            d[v] = arrays[v]
+    return xr.Dataset(data_vars=d)
@@ -0,0 +1,184 @@
+"""Filters of the daily streamflow by quality code, applied lazily.
+
+The quality codes are converted once to one packed bitmask per code (one bit per day and
+station, along the time axis). A named filter, defined by the codes it includes or excludes,
+is combined once from these bitmasks. Filtered views of a daily series then unpack only the
+bits of the days and stations requested, so that no full size copy of the series is made
+for each filter.
+"""
+
+from typing import List, Tuple
+
+import numpy as np
+
+from .conventions import STATION_ID_VARNAME, TIME_DIM_NAME
+
+DEFAULT_QUALITY_FILTERS = {
+    "best_available": (["A"], None),
+    "exclude_estimated": (None, ["E"]),
+}
+"""Filters defined on every dataset, as (codes included, codes excluded)"""
+
+
+def _unpack_rows(packed: np.ndarray, start: int, stop: int) -> np.ndarray:
+    # rows [start, stop) of a bitmask packed along the first axis
+    p = packed[start // 8 : (stop + 7) // 8]
+    bits = np.unpackbits(p, axis=0).view(bool)
+    offset = start - (start // 8) * 8
+    return bits[offset : offset + (stop - start)]
+
+
+class QualityMasks:
+    """Packed bitmasks of the quality codes of a daily series, one per code"""
+
+    def __init__(self, codes: np.ndarray, categories: List[str] = None) -> None:
+        """Constructor
+
+        Args:
+            codes (np.ndarray): quality codes, shape (time, station); strings, NaN where missing, or
+                integer codes of `categories`, -1 where missing
+            categories (List[str], optional): categories of integer codes. Defaults to None, `codes` are strings.
+        """
+        import pandas as pd
+
+        codes = np.asarray(codes)
+        self.shape = codes.shape
+        if categories is None:
+            cat = pd.Categorical(codes.ravel())
+            self.categories = [str(c) for c in cat.categories]
+            c = cat.codes.reshape(self.shape)
+        else:
+            self.categories = [str(c) for c in categories]
+            c = codes
+        self.bits = dict(
+            [(k, np.packbits(c == i, axis=0)) for i, k in enumerate(self.categories)]
+        )
+        self._filters = {}
+        for name, (include, exclude) in DEFAULT_QUALITY_FILTERS.items():
+            self.define(name, include, exclude)
+
+    def _padding(self) -> np.ndarray:
+        # packed mask with ones for the days of the time axis, zeros for the padding bits
+        return np.packbits(np.ones(self.shape, dtype=bool), axis=0)
+
+    def define(
+        self, name: str, include: List[str] = None, exclude: List[str] = None
+    ) -> None:
+        """Defines a named filter
+
+        Args:
+            name (str): name of the filter
+            include (List[str], optional): codes of the days kept; other days, including days without a code, are filtered out. Defaults to None.
+            exclude (List[str], optional): codes of the days filtered out. Defaults to None.
+
+        Raises:
+            ValueError: both or neither of `include` and `exclude` are given
+        """
+        if (include is None) == (exclude is None):
+            raise ValueError("Exactly one of include or exclude must be given")
+        codes = include if include is not None else exclude
+        combined = np.zeros(((self.shape[0] + 7) // 8, self.shape[1]), dtype=np.uint8)
+        for k in codes:
+            if k in self.bits:
+                combined |= self.bits[k]
+        if exclude is not None:
+            combined = ~combined & self._padding()
+        self._filters[name] = combined
+
+    @property
+    def filters(self) -> List[str]:
+        """Names of the filters defined"""
+        return list(self._filters.keys())
+
+    def packed(self, name: str) -> np.ndarray:
+        """Packed bitmask of the days kept by a filter, shape (ceil(time / 8), station)"""
+        if not name in self._filters:
+            raise KeyError(
+                "Unknown quality filter {0}, defined filters are {1}".format(
+                    name, self.filters
+                )
+            )
+        return self._filters[name]
+
+    def keep(self, name: str, start: int = 0, stop: int = None) -> np.ndarray:
+        """Boolean mask of the days kept by a filter, for rows [start, stop) of the time axis"""
+        stop = self.shape[0] if stop is None else stop
+        return _unpack_rows(self.packed(name), start, stop)
+
+    def counts(self, name: str) -> np.ndarray:
+        """Number of days kept by a filter per station, counted on the packed bits"""
+        packed = self.packed(name)
+        if hasattr(np, "bitwise_count"):
+            return np.bitwise_count(packed).sum(axis=0, dtype=np.int64)
+        return np.unpackbits(packed, axis=0).sum(axis=0, dtype=np.int64)
+
+
+class QualityFilteredView:
+    """A daily series seen through a quality filter; values are filtered when accessed, for the requested subset only"""
+
+    def __init__(self, data, masks: QualityMasks, name: str) -> None:
+        """Constructor
+
+        Args:
+            data (xr.DataArray): daily series, dimensions (time, station_id), e.g. `streamflow_mmd`
+            masks (QualityMasks): quality masks of the same shape
+            name (str): name of a filter defined in `masks`
+        """
+        data = data.transpose(TIME_DIM_NAME, STATION_ID_VARNAME)
+        if data.shape != masks.shape:
+            raise ValueError(
+                "Series of shape {0} and quality codes of shape {1}".format(
+                    data.shape, masks.shape
+                )
+            )
+        masks.packed(name)
+        self.data = data
+        self.masks = masks
+        self.name = name
+
+    @property
+    def shape(self) -> Tuple[int, int]:
+        return self.data.shape
+
+    def sel(self, station_ids: List[str] = None, start=None, end=None):
+        """Filtered values for some stations and a period
+
+        Args:
+            station_ids (List[str], optional): stations. Defaults to None, all stations.
+            start (optional): first day. Defaults to None.
+            end (optional): last day, inclusive. Defaults to None.
+
+        Returns:
+            xr.DataArray: values, NaN on the days filtered out
+        """
+        rows = self.data.indexes[TIME_DIM_NAME].slice_indexer(start, end)
+        t0, t1, _ = rows.indices(self.shape[0])
+        cols = slice(None)
+        if station_ids is not None:
+            cols = self.data.indexes[STATION_ID_VARNAME].get_indexer(station_ids)
+            if (cols < 0).any():
+                raise KeyError("Unknown stations in {0}".format(station_ids))
+        x = self.data[t0:t1, cols]
+        keep = self.masks.keep(self.name, t0, t1)[:, cols]
+        return x.where(keep)
+
+    @property
+    def values(self) -> np.ndarray:
+        """Filtered values of all stations and days"""
+        return self.sel().values
+
+    def __getitem__(self, key) -> np.ndarray:
+        # positional indexing, e.g. view[:, 3] or view[100:200]
+        rows = key[0] if isinstance(key, tuple) else key
+        if isinstance(rows, slice) and rows.step in (None, 1):
+            t0, t1, _ = rows.indices(self.shape[0])
+            cols = key[1] if isinstance(key, tuple) and len(key) > 1 else slice(None)
+            x = np.asarray(self.data.values[t0:t1, cols], dtype=np.float64)
+            keep = self.masks.keep(self.name, t0, t1)[:, cols]
+            return np.where(keep, x, np.nan)
+        x = np.where(self.masks.keep(self.name), self.data.values, np.nan)
+        return x[key]
+
+    def counts(self) -> np.ndarray:
+        """Number of days kept by the filter per station, whether or not a value is present"""
+        return self.masks.counts(self.name)
@@ -1,3 +1,4 @@
+import os
 from typing import Callable, Dict, List, Tuple
 import pandas as pd
 import numpy as np
@@ -12,13 +13,83 @@ def column_values(df: pd.DataFrame, colname: str) -> np.ndarray:
 
 timestamp_v = np.vectorize(pd.Timestamp)
 
-import xarray as xr
-
 
 def negative_is_missing(x: np.ndarray) -> np.ndarray:
     return x < 0.0
 
 
+def daily_series_sources() -> Dict[str, Tuple[str, str, Callable, str, object]]:
+    """Where and how the daily series of the dataset are stored in the reference (CSV) form
+
+    Returns:
+        Dict[str, Tuple[str, str, Callable, str, object]]: for each variable name, a tuple
+            (directory relative to the dataset root, file name, missing value function, units, dtype)
+    """
+    streamflow_dir = "03_streamflow"
+    hydromet_dir = "05_hydrometeorology"
+    precipitation_dir = os.path.join(hydromet_dir, "01_precipitation_timeseries")
+    evap_dir = os.path.join(hydromet_dir, "02_EvaporativeDemand_timeseries")
+    awap_dir = os.path.join(hydromet_dir, "03_Other", "AWAP")
+    return {
+        STREAMFLOW_MMD_VARNAME: (
+            streamflow_dir,
+            "streamflow_mmd.csv",
+            negative_is_missing,
+            "mm",
+            np.float32,
+        ),
+        STREAMFLOW_QUALITYCODES_VARNAME: (
+            streamflow_dir,
+            "streamflow_QualityCodes.csv",
+            None,
+            None,
+            "str",
+        ),
+        PRECIPITATION_AWAP_VARNAME: (
+            precipitation_dir,
+            "precipitation_AWAP.csv",
+            negative_is_missing,
+            "mm",
+            np.float32,
+        ),
+        ET_MORTON_ACTUAL_SILO_VARNAME: (
+            evap_dir,
+            "et_morton_actual_SILO.csv",
+            negative_is_missing,
+            "mm",
+            np.float32,
+        ),
+        SOLARRAD_AWAP_VARNAME: (
+            awap_dir,
+            "solarrad_AWAP.csv",
+            negative_is_missing,
+            "MJ/m^2",
+            np.float32,
+        ),
+        TMAX_AWAP_VARNAME: (
+            awap_dir,
+            "tmax_AWAP.csv",
+            negative_is_missing,
+            "°C",
+            np.float32,
+        ),
+        TMIN_AWAP_VARNAME: (
+            awap_dir,
+            "tmin_AWAP.csv",
+            negative_is_missing,
+            "°C",
+            np.float32,
+        ),
+        VPRP_AWAP_VARNAME: (
+            awap_dir,
+            "vprp_AWAP.csv",
+            negative_is_missing,
+            "hPa",
+            np.float32,
+        ),
+    }
+
+
 def load_csv_stations_tseries(
     filename: str,
     is_missing: Callable[[np.ndarray], np.ndarray] = None,
@@ -28,7 +99,7 @@ def load_csv_stations_tseries(
     """Loads a CAMELS-Aus time series from a comma-separated values file
 
     Args:
-        filename (str): filename
+        filename (str): filename, or a file-like object
         is_missing (Callable[[np.ndarray], np.ndarray], optional): Function that post-processes the loaded time series to set missing values to np.nan (e.g. replace all negative values). Defaults to None, in which case nothing is changed.
         units (str, optional): Units of the time series. Defaults to None.
         dtype ([type], optional): expected column type. See pandas.read_csv. Defaults to None.
@@ -39,7 +110,9 @@ def load_csv_stations_tseries(
     if dtype is None:
         dtype = "str"
     c_flows = pd.read_csv(filename, index_col=False, dtype=dtype)
-    # TODO sanity checks
+    missing = [c for c in ["year", "month", "day"] if not c in c_flows.columns]
+    if len(missing) > 0:
+        raise ValueError("Columns {0} not found in {1}".format(missing, filename))
     indx = timestamp_v(
         year=column_values(c_flows, "year").astype(np.int32),
         month=column_values(c_flows, "month").astype(np.int32),
@@ -63,16 +136,13 @@ def _mk_oned_var(dim_name, dim_values, var_values: np.ndarray):
     return xr.DataArray(var_values, coords={dim_name: dim_values}, dims=[dim_name])
 
 
-def _all_in(names, a_set):
-    return np.all([x in a_set for x in names])
-
-
 def load_csv_stations_columns(
     filename: str, colnames: List[str] = None, station_id_varname=STATION_ID_VARNAME
 ) -> Dict[str, np.ndarray]:
     x = pd.read_csv(filename)
-    assert _all_in(colnames, x.columns)
-    assert station_id_varname in x.columns
+    missing = [c for c in [station_id_varname] + colnames if not c in x.columns]
+    if len(missing) > 0:
+        raise ValueError("Columns {0} not found in {1}".format(missing, filename))
     station_ids = column_values(x, station_id_varname)
     y = [
         (
@@ -0,0 +1,165 @@
+"""Regional aggregation of the daily series, e.g. by drainage division or river region.
+
+Stations are mapped once to integer group codes, and a sparse (group, station) matrix of
+catchment area weights. Regional series of all the daily variables are then obtained with one
+sparse matrix product; missing values are excluded and the weights of the remaining stations
+renormalised at each time step.
+"""
+
+from typing import List
+
+import numpy as np
+
+from .conventions import STATION_ID_VARNAME, TIME_DIM_NAME
+from .dtypes import CATEGORIES_ATTRIB_ID
+
+REGIONAL_FREQUENCIES = ["D", "M", "Y"]
+"""Frequencies of regional series: daily, monthly, annual (calendar years)"""
+
+
+class RegionalAggregator:
+    """Area-weighted, NaN-aware aggregation of station series to groups of stations"""
+
+    def __init__(
+        self, groups: np.ndarray, weights: np.ndarray = None, name: str = "region"
+    ) -> None:
+        """Constructor
+
+        Args:
+            groups (np.ndarray): group label of each station, e.g. its drainage division
+            weights (np.ndarray, optional): weight of each station, e.g. its catchment area. Defaults to None, equal weights.
+            name (str, optional): name of the group dimension of the results. Defaults to "region".
+        """
+        import pandas as pd
+        import scipy.sparse
+
+        groups = np.asarray(groups, dtype=object)
+        n = len(groups)
+        weights = (
+            np.ones(n) if weights is None else np.asarray(weights, dtype=np.float64)
+        )
+        if len(weights) != n:
+            raise ValueError("{0} weights for {1} stations".format(len(weights), n))
+        codes, labels = pd.factorize(groups, sort=True)
+        keep = (codes >= 0) & np.isfinite(weights) & (weights > 0)
+        self.name = name
+        self.codes = codes
+        self.labels = np.asarray(labels)
+        self.matrix = scipy.sparse.csr_matrix(
+            (weights[keep], (codes[keep], np.arange(n)[keep])),
+            shape=(len(labels), n),
+        )
+
+    @property
+    def n_stations(self) -> np.ndarray:
+        """Number of stations with a positive weight in each group"""
+        return np.diff(self.matrix.indptr)
+
+    def aggregate(self, x: np.ndarray) -> np.ndarray:
+        """Weighted average over the groups of stations
+
+        Args:
+            x (np.ndarray): values of shape (n, n_stations); several variables may be stacked along the first axis
+
+        Returns:
+            np.ndarray: values of shape (n, n_groups), NaN where all stations of a group are missing
+        """
+        x = np.asarray(x, dtype=np.float64)
+        valid = np.isfinite(x)
+        total = (self.matrix @ np.where(valid, x, 0.0).T).T
+        covered = (self.matrix @ valid.T.astype(np.float64)).T
+        with np.errstate(invalid="ignore", divide="ignore"):
+            return np.where(covered > 0, total / covered, np.nan)
+
+
+def period_mean(x: np.ndarray, time: np.ndarray, freq: str):
+    """NaN-aware means of daily values over calendar months or years
+
+    Args:
+        x (np.ndarray): values of shape (n_days, ...), days contiguous and in increasing order
+        time (np.ndarray): days
+        freq (str): "M" or "Y"
+
+    Returns:
+        Tuple[np.ndarray, np.ndarray]: first day of each period, and the period means
+    """
+    from .resample import PeriodMapping
+
+    mapping = PeriodMapping(time, freq)
+    means, _ = mapping.reduce(x, how="mean")
+    return mapping.labels.astype("datetime64[ns]"), means
+
+
+def regional_series(
+    ds,
+    aggregator: RegionalAggregator,
+    varnames: List[str] = None,
+    freq: str = "D",
+):
+    """Regional series of daily variables
+
+    Args:
+        ds (xr.Dataset): dataset, typically `CamelsAus.data`
+        aggregator (RegionalAggregator): aggregator for the stations of `ds`
+        varnames (List[str], optional): numeric daily variables to aggregate. Defaults to None, all numeric daily variables;
+            not the integer codes of categorical variables, e.g. memory-mapped quality codes.
+        freq (str, optional): "D" for daily series, "M" and "Y" for the means of the regional daily series
+            over calendar months and years. Defaults to "D".
+
+    Returns:
+        xr.Dataset: regional series of dimensions (time, group), with the number of stations in each group as a coordinate
+    """
+    import xarray as xr
+
+    from .conventions import daily_varnames
+
+    if not freq in REGIONAL_FREQUENCIES:
+        raise ValueError(
+            "Unsupported frequency {0}, expected one of {1}".format(
+                freq, REGIONAL_FREQUENCIES
+            )
+        )
+    if varnames is None:
+        varnames = [
+            v
+            for v in daily_varnames()
+            if v in ds.data_vars
+            and ds[v].dtype.kind in "fiu"
+            and not CATEGORIES_ATTRIB_ID in ds[v].attrs
+        ]
+    time = ds[TIME_DIM_NAME].values
+    n_time = len(time)
+    stacked = np.concatenate(
+        [
+            ds[v].transpose(TIME_DIM_NAME, STATION_ID_VARNAME).values.astype(np.float64)
+            for v in varnames
+        ]
+    )
+    regional = aggregator.aggregate(stacked).reshape(
+        len(varnames), n_time, len(aggregator.labels)
+    )
+    if freq != "D":
+        time, regional = period_mean(regional.transpose(1, 0, 2), time, freq)
+        regional = regional.transpose(1, 0, 2)
+    coords = {
+        TIME_DIM_NAME: time,
+        aggregator.name: aggregator.labels,
+        "n_stations": (aggregator.name, aggregator.n_stations),
+    }
+    res = xr.Dataset(
+        dict(
+            [
+                (
+                    v,
+                    xr.DataArray(
+                        regional[i],
+                        coords=coords,
+                        dims=[TIME_DIM_NAME, aggregator.name],
+                        attrs=ds[v].attrs,
+                    ),
+                )
+                for i, v in enumerate(varnames)
+            ]
+        )
+    )
+    return res
@@ -1,41 +1,39 @@
-"""Access arrangements to the CAMELS-AUS dataset
-"""
+"""Access arrangements to the CAMELS-AUS dataset"""
 
-from typing import Callable, List
-import numpy as np
-import xarray as xr
+from __future__ import annotations
+
+from typing import TYPE_CHECKING, Callable, List, Tuple
 import os
-import geopandas as gpd
 
 from .conventions import (
+    CATCHMENT_AREA_VARNAME,
+    STATION_ID_VARNAME,
+    STREAMFLOW_QUALITYCODES_VARNAME,
+    TIME_DIM_NAME,
     check_camels_aus_version,
+    daily_varnames,
     other_attributes_names,
     anthropogenicinfluences_attributes_names,
     landcover_attributes_names,
     topography_attributes_names,
     geology_attributes_names,
 )
-from .read import (
-    load_csv_stations_columns,
-    load_csv_stations_metadata,
-    load_csv_stations_tseries,
-    load_streamflow_gaugingstats,
-    negative_is_missing,
-    load_boundary_area,
-    load_geology_attributes,
-    load_topography_attributes,
-    load_landcover_attributes,
-    load_anthropogenicinfluences_attributes,
-    load_other_attributes,
-    STREAMFLOW_MMD_VARNAME,
-    STREAMFLOW_QUALITYCODES_VARNAME,
-    PRECIPITATION_AWAP_VARNAME,
-    ET_MORTON_ACTUAL_SILO_VARNAME,
-    SOLARRAD_AWAP_VARNAME,
-    TMAX_AWAP_VARNAME,
-    TMIN_AWAP_VARNAME,
-    VPRP_AWAP_VARNAME,
-)
+
+if TYPE_CHECKING:
+    # numpy, xarray, pandas and geopandas (with shapely, pyproj, pyogrio) are imported
+    # on first use, so that importing this module is fast.
+    from concurrent.futures import Executor
+
+    import geopandas as gpd
+    import numpy as np
+    import xarray as xr
+
+    from .aio import SharedTasks
+    from .gaps import GapIndex
+    from .memo import MemoStore
+    from .quality import QualityFilteredView, QualityMasks
+    from .spatial import CatchmentIndex, SimplifiedBoundaries
+    from .units import ScaledView
 
 
 def download_camels_aus(local_directory: str, version="1.0") -> None:
@@ -110,20 +108,293 @@ class CamelsAus:
             subset (List[str], optional): IGNORED. Defaults to None.
             timespan ([type], optional): IGNORED. Defaults to None.
         """
-        pass
+        self._ds = None
+        self._regional_aggregators = {}
+        self._resampled = {}
+        self._gap_index = None
+        self._quality_masks = None
+        self._version = None
+        self._source_directory = None
+        self._data_stamp = None
+        self._boundaries_fn = None
+        self._boundaries = None
+        self._cache_directory = None
+        self._simplified_boundaries = None
+        self._spatial_index = None
+        self._grid_weights = {}
+        self._memo_directory = None
+        self._memo_store = None
+        self._load_time_series_func = None
+        self._dtype_policy = None
+        self._shared_tasks = None
+
+    def _reset_derived(self) -> None:
+        # products computed from the loaded data or boundaries, discarded by every loader
+        self._regional_aggregators = {}
+        self._resampled = {}
+        self._gap_index = None
+        self._quality_masks = None
+        self._simplified_boundaries = None
+        self._spatial_index = None
+        self._grid_weights = {}
 
-    def load_from_text_files(self, directory: str, version: str = "1.0") -> None:
+    def load_from_text_files(
+        self,
+        directory: str,
+        version: str = "1.0",
+        dtype_policy=None,
+        varnames: List[str] = None,
+    ) -> None:
         """Loads the CAMELS-AUS data from the reference form (mostly CSV files) into memory
 
         Args:
             directory (str): directory where the file-based data was downloaded and extracted.
             version (str, optional): version of the dataset. Defaults to '1.0' (only one supported currently).
+            dtype_policy (Union[str, DtypePolicy], optional): types of the variables, a `camels_aus.dtypes.DtypePolicy`
+                or the name of one of `DTYPE_POLICIES` such as "compact". Defaults to None, float32 daily series
+                and attributes as inferred by pandas.
+            varnames (List[str], optional): daily series to load; the others can be loaded later with `load_variable`.
+                Defaults to None, all the daily series.
 
         Raises:
             FileNotFoundError: One of the files in the dataset is not found
             Exception: Unhandled version
         """
         check_camels_aus_version(version)
+        self._load_from_text_files(
+            directory, version, self.load_time_series, dtype_policy, varnames
+        )
+
+    async def aload(
+        self,
+        directory: str,
+        version: str = "1.0",
+        dtype_policy=None,
+        varnames: List[str] = None,
+        executor: Executor = None,
+    ) -> None:
+        """Asynchronous `load_from_text_files`: the files are parsed in an executor, without blocking the event loop
+
+        Each file is parsed by a separate job, so that a thread pool parses several files at once.
+        A file being parsed for another call, e.g. by `aload_variable`, is parsed only once.
+        Cancelling the call cancels the parsing of the files no other call waits for; jobs already
+        running in the executor complete, and their results are discarded.
+
+        Args:
+            directory (str): directory where the file-based data was downloaded and extracted.
+            version (str, optional): version of the dataset. Defaults to '1.0' (only one supported currently).
+            dtype_policy (Union[str, DtypePolicy], optional): types of the variables, see `load_from_text_files`. Defaults to None.
+            varnames (List[str], optional): daily series to load. Defaults to None, all the daily series.
+            executor (Executor, optional): executor parsing the files. Defaults to None, the event loop default executor.
+
+        Raises:
+            FileNotFoundError: One of the files in the dataset is not found
+        """
+        import asyncio
+
+        from .dtypes import policy_key
+
+        check_camels_aus_version(version)
+        policy = self._get_policy(dtype_policy)
+        varnames = self._daily_varnames(varnames)
+        directory = os.path.abspath(directory)
+        tasks = self._get_shared_tasks()
+        loop = asyncio.get_running_loop()
+        results = await asyncio.gather(
+            tasks.run(
+                ("attributes", directory),
+                lambda: loop.run_in_executor(
+                    executor, self._read_attributes, directory
+                ),
+            ),
+            *[
+                tasks.run(
+                    ("daily", directory, v, policy_key(policy)),
+                    lambda v=v: loop.run_in_executor(
+                        executor,
+                        self._read_daily,
+                        directory,
+                        v,
+                        self.load_time_series,
+                        policy,
+                    ),
+                )
+                for v in varnames
+            ],
+        )
+        metadata, attributes, boundaries_fn = results[0]
+        self._set_text_dataset(
+            metadata,
+            dict(zip(varnames, results[1:])),
+            attributes,
+            version,
+            directory,
+            boundaries_fn,
+            self.load_time_series,
+            policy,
+        )
+
+    def _get_shared_tasks(self) -> SharedTasks:
+        from .aio import SharedTasks
+
+        if self._shared_tasks is None:
+            self._shared_tasks = SharedTasks()
+        return self._shared_tasks
+
+    def _check_can_load_variable(self, varname: str) -> None:
+        self._daily_varnames([varname])
+        if self._source_directory is None or self._load_time_series_func is None:
+            raise ValueError(
+                "Daily series {0} is not loaded, and the data was not loaded from text files".format(
+                    varname
+                )
+            )
+
+    def _add_variable(self, varname: str, da: xr.DataArray) -> xr.DataArray:
+        if self._dtype_policy is not None:
+            import xarray as xr
+
+            from .dtypes import apply_dtype_policy
+
+            da = apply_dtype_policy(xr.Dataset({varname: da}), self._dtype_policy)[
+                varname
+            ]
+        self._ds = self._ds.assign({varname: da})
+        self._resampled = {}
+        self._gap_index = None
+        self._quality_masks = None
+        return self._ds[varname]
+
+    def load_variable(self, varname: str) -> xr.DataArray:
+        """A daily series, parsed from the text files and added to the data if not loaded yet
+
+        Args:
+            varname (str): daily series, e.g. "streamflow_mmd"
+
+        Raises:
+            KeyError: unknown daily series
+            ValueError: the series is not loaded, and the data was not loaded from text files
+
+        Returns:
+            xr.DataArray: daily series
+        """
+        if self._ds is not None and varname in self._ds.data_vars:
+            return self._ds[varname]
+        self._check_can_load_variable(varname)
+        da = self._read_daily(
+            self._source_directory,
+            varname,
+            self._load_time_series_func,
+            self._dtype_policy,
+        )
+        return self._add_variable(varname, da)
+
+    async def aload_variable(
+        self, varname: str, executor: Executor = None
+    ) -> xr.DataArray:
+        """Asynchronous `load_variable`: the file is parsed in an executor, without blocking the event loop
+
+        Concurrent calls for the same series share one parse. Cancelling a call does not affect the others;
+        the parse is cancelled when no call waits for it any more.
+
+        Args:
+            varname (str): daily series, e.g. "streamflow_mmd"
+            executor (Executor, optional): executor parsing the file. Defaults to None, the event loop default executor.
+
+        Returns:
+            xr.DataArray: daily series
+        """
+        import asyncio
+
+        from .dtypes import policy_key
+
+        if self._ds is not None and varname in self._ds.data_vars:
+            return self._ds[varname]
+        self._check_can_load_variable(varname)
+        directory = os.path.abspath(self._source_directory)
+        policy = self._dtype_policy
+        loop = asyncio.get_running_loop()
+        da = await self._get_shared_tasks().run(
+            ("daily", directory, varname, policy_key(policy)),
+            lambda: loop.run_in_executor(
+                executor,
+                self._read_daily,
+                directory,
+                varname,
+                self._load_time_series_func,
+                policy,
+            ),
+        )
+        if varname in self._ds.data_vars:
+            # added by another call sharing the parse
+            return self._ds[varname]
+        return self._add_variable(varname, da)
+
+    def _load_from_text_files(
+        self,
+        directory: str,
+        version: str,
+        load_time_series: Callable,
+        dtype_policy=None,
+        varnames: List[str] = None,
+    ) -> None:
+        policy = self._get_policy(dtype_policy)
+        metadata, attributes, boundaries_fn = self._read_attributes(directory)
+        daily = dict(
+            [
+                (v, self._read_daily(directory, v, load_time_series, policy))
+                for v in self._daily_varnames(varnames)
+            ]
+        )
+        self._set_text_dataset(
+            metadata,
+            daily,
+            attributes,
+            version,
+            directory,
+            boundaries_fn,
+            load_time_series,
+            policy,
+        )
+
+    @staticmethod
+    def _get_policy(dtype_policy):
+        if dtype_policy is None:
+            return None
+        from .dtypes import dtype_policy as get_policy
+
+        return get_policy(dtype_policy)
+
+    @staticmethod
+    def _daily_varnames(varnames: List[str] = None) -> List[str]:
+        from .read import daily_series_sources
+
+        sources = daily_series_sources()
+        if varnames is None:
+            return list(sources.keys())
+        unknown = [v for v in varnames if not v in sources]
+        if len(unknown) > 0:
+            raise KeyError(
+                "Unknown daily series {0}, available are {1}".format(
+                    unknown, list(sources.keys())
+                )
+            )
+        return list(varnames)
+
+    @staticmethod
+    def _read_attributes(directory: str) -> Tuple[dict, dict, str]:
+        # station metadata, station attributes and boundaries file name of the reference files
+        from .read import (
+            load_anthropogenicinfluences_attributes,
+            load_boundary_area,
+            load_csv_stations_metadata,
+            load_geology_attributes,
+            load_landcover_attributes,
+            load_other_attributes,
+            load_streamflow_gaugingstats,
+            load_topography_attributes,
+        )
+
         if not os.path.exists(directory):
             raise FileNotFoundError("Directory {0} not found".format(directory))
         id_name_metadata_dir = os.path.join(directory, "01_id_name_metadata")
@@ -175,11 +446,7 @@ class CamelsAus:
         )
         _other_attributes = load_other_attributes(catchmentattributes_05_other_fn)
 
-        # streamflow_mmd.csv
         streamflow_dir = os.path.join(directory, "03_streamflow")
-        _streamflow_mmd = self.load_time_series(
-            streamflow_dir, "streamflow_mmd.csv", negative_is_missing, "mm", np.float32
-        )
 
         # streamflow_GaugingStats.csv
         streamflow_gauging_stats_fn = os.path.join(
@@ -192,85 +459,8 @@ class CamelsAus:
 
         # streamflow_MLd.csv
         # streamflow_MLd_inclInfilled.csv
-        # streamflow_QualityCodes.csv
-        streamflow_quality_codes = self.load_time_series(
-            streamflow_dir, "streamflow_QualityCodes.csv", dtype="str"
-        )
         # streamflow_signatures.csv
-
-        hydrometeorology_dir = os.path.join(directory, "05_hydrometeorology")
-
-        precipitation_timeseries_dir = os.path.join(
-            hydrometeorology_dir, "01_precipitation_timeseries"
-        )
-        precipitation_awap = self.load_time_series(
-            precipitation_timeseries_dir,
-            "precipitation_AWAP.csv",
-            negative_is_missing,
-            "mm",
-            np.float32,
-        )
-
-        evap_timeseries_dir = os.path.join(
-            hydrometeorology_dir, "02_EvaporativeDemand_timeseries"
-        )
-        et_morton_actual_silo = self.load_time_series(
-            evap_timeseries_dir,
-            "et_morton_actual_SILO.csv",
-            negative_is_missing,
-            "mm",
-            np.float32,
-        )
-
-        other_hydromet_dir = os.path.join(hydrometeorology_dir, "03_Other")
-        other_hydromet_awap_dir = os.path.join(other_hydromet_dir, "AWAP")
-        other_hydromet_silo_dir = os.path.join(other_hydromet_dir, "SILO")
-
-        # solarrad_AWAP.csv
-        # tmax_AWAP.csv
-        # tmin_AWAP.csv
-        # vprp_AWAP.csv
-        solarrad_awap = self.load_time_series(
-            other_hydromet_awap_dir,
-            "solarrad_AWAP.csv",
-            negative_is_missing,
-            "MJ/m^2",
-            np.float32,
-        )
-        tmax_awap = self.load_time_series(
-            other_hydromet_awap_dir,
-            "tmax_AWAP.csv",
-            negative_is_missing,
-            "°C",
-            np.float32,
-        )
-        tmin_awap = self.load_time_series(
-            other_hydromet_awap_dir,
-            "tmin_AWAP.csv",
-            negative_is_missing,
-            "°C",
-            np.float32,
-        )
-        vprp_awap = self.load_time_series(
-            other_hydromet_awap_dir,
-            "vprp_AWAP.csv",
-            negative_is_missing,
-            "hPa",
-            np.float32,
-        )
-
-        d = dict(_id_name_metadata)
-        d.update({STREAMFLOW_MMD_VARNAME: _streamflow_mmd})
-        d.update({STREAMFLOW_QUALITYCODES_VARNAME: streamflow_quality_codes})
-        d.update({PRECIPITATION_AWAP_VARNAME: precipitation_awap})
-        d.update({ET_MORTON_ACTUAL_SILO_VARNAME: et_morton_actual_silo})
-
-        d.update({SOLARRAD_AWAP_VARNAME: solarrad_awap})
-        d.update({TMAX_AWAP_VARNAME: tmax_awap})
-        d.update({TMIN_AWAP_VARNAME: tmin_awap})
-        d.update({VPRP_AWAP_VARNAME: vprp_awap})
-
-        d.update(_streamflow_gauging_stats)
+        d = dict(_streamflow_gauging_stats)
         d.update(_location_boundary_area)
         d.update(_geology_attributes)
         d.update(_topography_attributes)
@@ -278,14 +468,60 @@ class CamelsAus:
         d.update(_anthropogenicinfluences_attributes)
         d.update(_other_attributes)
 
-        self._ds = xr.Dataset(data_vars=d)
-
         spatial_dir = os.path.join(directory, "02_location_boundary_area")
         boundaries_fn = os.path.join(
             spatial_dir, "shp", "CAMELS_AUS_Boundaries_adopted.shp"
         )
         _check_fileexists(boundaries_fn)
-        self.boundaries = gpd.read_file(filename=boundaries_fn)
+        return dict(_id_name_metadata), d, boundaries_fn
+
+    @staticmethod
+    def _read_daily(
+        directory: str, varname: str, load_time_series: Callable, policy=None
+    ) -> xr.DataArray:
+        # one daily series of the reference files, of the type of the dtype policy if any
+        from .read import daily_series_sources
+
+        rel_dir, short_fn, is_missing, units, dtype = daily_series_sources()[varname]
+        if policy is not None and dtype != "str":
+            # parse directly to the type of the policy, without an intermediate copy
+            dtype = policy.daily_float or dtype
+        return load_time_series(
+            os.path.join(directory, rel_dir), short_fn, is_missing, units, dtype
+        )
+
+    def _set_text_dataset(
+        self,
+        metadata: dict,
+        daily: dict,
+        attributes: dict,
+        version: str,
+        directory: str,
+        boundaries_fn: str,
+        load_time_series: Callable,
+        policy=None,
+    ) -> None:
+        import xarray as xr
+
+        from .memo import directory_stamp
+
+        d = dict(metadata)
+        d.update(daily)
+        d.update(attributes)
+        self._ds = xr.Dataset(data_vars=d)
+        if policy is not None:
+            from .dtypes import apply_dtype_policy
+
+            self._ds = apply_dtype_policy(self._ds, policy)
+        self._reset_derived()
+        self._version = version
+        self._source_directory = directory
+        self._data_stamp = directory_stamp(directory)
+        self._load_time_series_func = load_time_series
+        self._dtype_policy = policy
+        self._boundaries_fn = boundaries_fn
+        self._boundaries = None
+        self._cache_directory = None
 
     def load_time_series(
         self,
@@ -295,6 +531,8 @@ class CamelsAus:
         units: str = None,
         dtype=None,
     ) -> xr.DataArray:
+        from .read import load_csv_stations_tseries
+
         full_fn = os.path.join(directory, short_fn)
         _check_fileexists(full_fn)
         tseries = load_csv_stations_tseries(
@@ -302,6 +540,566 @@ class CamelsAus:
         )
         return tseries
 
+    @property
+    def boundaries(self) -> gpd.GeoDataFrame:
+        """Catchment boundaries. Read on first access, which is when geopandas is imported."""
+        if self._boundaries is None and self._boundaries_fn is not None:
+            import geopandas as gpd
+
+            self._boundaries = gpd.read_file(filename=self._boundaries_fn)
+        return self._boundaries
+
+    @boundaries.setter
+    def boundaries(self, value: gpd.GeoDataFrame) -> None:
+        self._boundaries = value
+        self._boundaries_fn = None
+        self._simplified_boundaries = None
+        self._spatial_index = None
+        self._grid_weights = {}
+
+    @property
+    def simplified_boundaries(self) -> SimplifiedBoundaries:
+        """Catchment boundaries at several levels of detail, read from the binary cache if available, otherwise computed on first access"""
+        if self._simplified_boundaries is None:
+            from .spatial import SimplifiedBoundaries
+
+            # boundaries set by the user are not those of the cache
+            from_cache = (
+                self._cache_directory is not None and self._boundaries_fn is not None
+            )
+            if from_cache and SimplifiedBoundaries.exists(self._cache_directory):
+                self._simplified_boundaries = SimplifiedBoundaries.load(
+                    self._cache_directory
+                )
+            elif self.boundaries is not None:
+                self._simplified_boundaries = SimplifiedBoundaries.build(
+                    self.boundaries
+                )
+        return self._simplified_boundaries
+
+    @property
+    def spatial_index(self) -> CatchmentIndex:
+        """STRtree spatial index over the catchment boundaries, built once from the full resolution geometries (read from the binary cache if available)"""
+        if self._spatial_index is None and self.simplified_boundaries is not None:
+            from .spatial import CatchmentIndex
+
+            self._spatial_index = CatchmentIndex.from_simplified(
+                self.simplified_boundaries
+            )
+        return self._spatial_index
+
+    def boundaries_geojson(
+        self, bbox: Tuple[float, float, float, float] = None, zoom: float = None
+    ) -> str:
+        """GeoJSON of the catchment boundaries intersecting a bounding box, simplified for a web map zoom level
+
+        Args:
+            bbox (Tuple[float, float, float, float], optional): (min lon, min lat, max lon, max lat). Defaults to None, all catchments.
+            zoom (float, optional): web map zoom level. Defaults to None, full resolution.
+
+        Returns:
+            str: GeoJSON FeatureCollection
+        """
+        if self.simplified_boundaries is None:
+            raise ValueError("No catchment boundaries loaded")
+        return self.simplified_boundaries.geojson(bbox, zoom)
+
+    def grid_weights(
+        self, lon: np.ndarray, lat: np.ndarray, cache_directory: str = None
+    ):
+        """Sparse (station, cell) area weights of a grid over the catchments, computed once per grid definition
+
+        Weights are kept in memory, and saved in the `grid_weights` subdirectory of the binary cache.
+
+        Args:
+            lon (np.ndarray): longitudes of the cell centres
+            lat (np.ndarray): latitudes of the cell centres
+            cache_directory (str, optional): where to save and look up weights. Defaults to None, the binary cache this dataset was loaded from, if any.
+
+        Returns:
+            scipy.sparse.csr_matrix: weights, rows in the order of `simplified_boundaries.station_ids`
+        """
+        from .gridded import (
+            WEIGHTS_SUBDIR,
+            compute_grid_weights,
+            grid_key,
+            load_grid_weights,
+            save_grid_weights,
+        )
+
+        sb = self.simplified_boundaries
+        if sb is None:
+            raise ValueError("No catchment boundaries loaded")
+        key = grid_key(lon, lat, sb.station_ids, sb.levels[0])
+        if key in self._grid_weights:
+            return self._grid_weights[key]
+        if cache_directory is None:
+            cache_directory = self._cache_directory
+        fn = (
+            None
+            if cache_directory is None
+            else os.path.join(cache_directory, WEIGHTS_SUBDIR, key + ".npz")
+        )
+        if fn is not None and os.path.exists(fn):
+            w, _ = load_grid_weights(fn)
+        else:
+            w = compute_grid_weights(sb.levels[0], lon, lat)
+            if fn is not None:
+                os.makedirs(os.path.dirname(fn), exist_ok=True)
+                save_grid_weights(fn, w, sb.station_ids)
+        self._grid_weights[key] = w
+        return w
+
+    def aggregate_grid(self, da: xr.DataArray, chunk_size: int = 366) -> xr.DataArray:
+        """Averages gridded time series (e.g. local NetCDF grids of rainfall or soil moisture) over the catchments
+
+        Args:
+            da (xr.DataArray): gridded data of dimensions (time, lat, lon), see `camels_aus.gridded.aggregate_grid`
+            chunk_size (int, optional): number of time steps read and aggregated at once. Defaults to 366.
+
+        Returns:
+            xr.DataArray: catchment averages, of dimensions (time, station_id), the layout and stations of the daily
+                series of `data`; NaN for stations without a catchment boundary
+        """
+        from .gridded import _grid_dims, aggregate_grid
+
+        lat_dim, lon_dim = _grid_dims(da)
+        w = self.grid_weights(da[lon_dim].values, da[lat_dim].values)
+        res = aggregate_grid(
+            da, w, self.simplified_boundaries.station_ids, chunk_size=chunk_size
+        )
+        # rows of the weights are in the order of the boundaries
+        return res.reindex({STATION_ID_VARNAME: self._ds[STATION_ID_VARNAME].values})
+
+    @property
+    def gap_index(self) -> GapIndex:
+        """Run-length index of the missing values in the daily series, read from the binary cache if available, otherwise built on first access"""
+        if self._gap_index is None and self._ds is not None:
+            from .gaps import GapIndex
+
+            if self._cache_directory is not None and GapIndex.exists(
+                self._cache_directory
+            ):
+                self._gap_index = GapIndex.load(self._cache_directory)
+            else:
+                self._gap_index = GapIndex.from_dataset(self._ds)
+        return self._gap_index
+
+    @property
+    def quality_masks(self) -> QualityMasks:
+        """Packed bitmasks of the streamflow quality codes, computed on first access"""
+        if self._quality_masks is None and self._ds is not None:
+            from .quality import QualityMasks
+
+            if not STREAMFLOW_QUALITYCODES_VARNAME in self._ds:
+                raise KeyError(
+                    "No variable {0}".format(STREAMFLOW_QUALITYCODES_VARNAME)
+                )
+            from .dtypes import CATEGORIES_ATTRIB_ID
+
+            codes = self._ds[STREAMFLOW_QUALITYCODES_VARNAME]
+            self._quality_masks = QualityMasks(
+                codes.transpose(TIME_DIM_NAME, STATION_ID_VARNAME).values,
+                codes.attrs.get(CATEGORIES_ATTRIB_ID),
+            )
+        return self._quality_masks
+
+    def define_quality_filter(
+        self, name: str, include: List[str] = None, exclude: List[str] = None
+    ) -> None:
+        """Defines a named filter of the days by streamflow quality code, reusable with `quality_filtered`
+
+        Args:
+            name (str): name of the filter
+            include (List[str], optional): codes of the days kept. Defaults to None.
+            exclude (List[str], optional): codes of the days filtered out. Defaults to None.
+        """
+        self.quality_masks.define(name, include, exclude)
+
+    def quality_filtered(
+        self, name: str = "exclude_estimated", varname: str = "streamflow_mmd"
+    ) -> QualityFilteredView:
+        """A daily series seen through a quality filter, without copying the series
+
+        Args:
+            name (str, optional): name of the filter; "best_available" and "exclude_estimated" are always defined. Defaults to "exclude_estimated".
+            varname (str, optional): daily series. Defaults to "streamflow_mmd".
+
+        Returns:
+            QualityFilteredView: filtered view
+        """
+        from .quality import QualityFilteredView
+
+        return QualityFilteredView(self._ds[varname], self.quality_masks, name)
+
+    def apply_dtype_policy(self, policy) -> None:
+        """Converts the variables of the loaded dataset according to a dtype policy
+
+        Args:
+            policy (Union[str, DtypePolicy]): a `camels_aus.dtypes.DtypePolicy`, or the name of one of `DTYPE_POLICIES`.
+                Also applied to the variables loaded later with `load_variable`.
+        """
+        from .dtypes import apply_dtype_policy, dtype_policy
+
+        policy = dtype_policy(policy)
+        self._ds = apply_dtype_policy(self._ds, policy)
+        self._dtype_policy = policy
+        self._reset_derived()
+
+    @property
+    def layout(self) -> str:
+        """Memory layout of the daily series, "time_major" or "station_major", None if mixed; see `camels_aus.layout`"""
+        from .layout import dataset_layout
+
+        return None if self._ds is None else dataset_layout(self._ds)
+
+    def set_layout(self, layout: str) -> None:
+        """Changes the memory layout of the daily series, copying the series not already in that layout
+
+        Station-major series make the whole record of a station contiguous, e.g. `data.streamflow_mmd[:, j].values`
+        is a view, for per-station workloads. Dimensions are unchanged.
+
+        Args:
+            layout (str): "time_major" or "station_major"
+        """
+        from .layout import with_layout
+
+        self._ds = with_layout(self._ds, layout)
+
+    def station_block(
+        self, varnames: List[str], station_ids: List[str] = None
+    ) -> np.ndarray:
+        """Daily series fused into one float64 array of dimensions (station, variable, time), see `camels_aus.layout.fused_block`
+
+        Args:
+            varnames (List[str]): daily series
+            station_ids (List[str], optional): stations. Defaults to None, all stations.
+
+        Returns:
+            np.ndarray: C-contiguous array; `block[j]` holds all the series of station `j` contiguously
+        """
+        from .layout import fused_block
+
+        return fused_block(self._ds, varnames, station_ids)
+
+    def memory_report(self, by: str = "variable"):
+        """Bytes used by the loaded dataset, per variable or per group of variables
+
+        Args:
+            by (str, optional): "variable" or "group". Defaults to "variable".
+
+        Returns:
+            pd.DataFrame: bytes used, see `camels_aus.dtypes.memory_report`
+        """
+        from .dtypes import memory_report
+
+        return memory_report(self._ds, by=by)
+
+    def resampled(
+        self,
+        freq: str = "M",
+        how: str = "sum",
+        min_completeness: float = 0.0,
+        water_year_start: int = 7,
+        varnames: List[str] = None,
+    ) -> xr.Dataset:
+        """Monthly, annual or water year totals or means of the daily series, memoised in the binary cache
+
+        Args:
+            freq (str, optional): "M", "Y" or "WY". Defaults to "M".
+            how (str, optional): "sum" or "mean". Defaults to "sum".
+            min_completeness (float, optional): minimum proportion of days with data per period, below which values are NaN. Defaults to 0.0.
+            water_year_start (int, optional): first month of the water years. Defaults to 7, July.
+            varnames (List[str], optional): daily variables. Defaults to None, all numeric daily variables.
+
+        Returns:
+            xr.Dataset: resampled series, see `camels_aus.resample.resample_dataset`
+        """
+        from .resample import (
+            RESAMPLED_SUBDIR,
+            load_resampled,
+            resample_dataset,
+            resampling_key,
+            save_resampled,
+        )
+
+        args = dict(
+            freq=freq,
+            how=how,
+            min_completeness=min_completeness,
+            water_year_start=water_year_start,
+            varnames=varnames,
+        )
+        key = resampling_key(self._ds, **args)
+        if key in self._resampled:
+            return self._resampled[key]
+        fn = None
+        if self._cache_directory is not None:
+            fn = os.path.join(self._cache_directory, RESAMPLED_SUBDIR, key + ".npz")
+        if fn is not None and os.path.exists(fn):
+            res = load_resampled(fn)
+        else:
+            res = resample_dataset(self._ds, **args)
+            if fn is not None:
+                os.makedirs(os.path.dirname(fn), exist_ok=True)
+                save_resampled(fn, res)
+        self._resampled[key] = res
+        return res
+
+    def calibrate(self, model: Callable, strategy: Callable, **kwargs):
+        """Calibrates a rainfall-runoff model for every station and fold, over a process pool
+
+        Args:
+            model (Callable): `model(params, rainfall, pet) -> streamflow`
+            strategy (Callable): `strategy(objective) -> (params, score)`, e.g. `camels_aus.calibration.RandomSearch`
+            kwargs: other arguments of `camels_aus.calibration.calibrate_all`, e.g. folds, n_workers, checkpoint
+
+        Returns:
+            pd.DataFrame: one row per (station, fold), with the score and calibrated parameters
+        """
+        from .calibration import calibrate_all
+
+        return calibrate_all(self._ds, model, strategy, **kwargs)
+
+    def flood_events(self, **kwargs):
+        """Peaks over threshold flood events of all stations, with their rainfall totals
+
+        Args:
+            kwargs: arguments of `camels_aus.events.flood_events`, e.g. quantile, min_separation
+
+        Returns:
+            pd.DataFrame: one row per event, with columns `station_id`, `start`, `peak_time`, `peak`, `volume`, `duration` and `rainfall`
+        """
+        from .events import flood_events
+
+        return flood_events(self._ds, **kwargs)
+
+    def annual_maxima(
+        self, water_year_start: int = None, min_completeness: float = 0.0
+    ):
+        """Annual maximum daily streamflow of all stations
+
+        Args:
+            water_year_start (int, optional): first month of the water years. Defaults to None, calendar years.
+            min_completeness (float, optional): minimum proportion of days with data in a year. Defaults to 0.0.
+
+        Returns:
+            pd.DataFrame: one row per station and year, with columns `station_id`, `year`, `peak_time`, `peak` and `completeness`
+        """
+        from .events import annual_maxima
+
+        return annual_maxima(self._ds, water_year_start, min_completeness)
+
+    def recessions(self, min_length: int = 5):
+        """Streamflow recessions of all stations
+
+        Args:
+            min_length (int, optional): minimum number of days of decrease. Defaults to 5.
+
+        Returns:
+            pd.DataFrame: one row per recession, with columns `station_id`, `start`, `duration`, `initial_flow`, `final_flow` and `k`
+        """
+        from .events import recessions
+
+        return recessions(self._ds, min_length)
+
+    def climate_indices(
+        self, periods: List[Tuple[str, str]] = None, pet: str = None
+    ) -> xr.DataArray:
+        """Climate indices (aridity, precipitation seasonality, high and low precipitation frequency and duration, ...) of all stations over periods
+
+        Args:
+            periods (List[Tuple[str, str]], optional): periods, as (first day, last day). Defaults to None, the whole record.
+            pet (str, optional): daily variable used as potential evapotranspiration. Defaults to None, a Priestley-Taylor estimate.
+
+        Returns:
+            xr.DataArray: indices of dimensions (station_id, period, index), see `camels_aus.climate.CLIMATE_INDICES`
+        """
+        from .climate import climate_indices
+
+        return climate_indices(self._ds, periods, pet)
+
+    def infilled(self, **kwargs) -> xr.Dataset:
+        """Daily streamflow with gaps filled from donor stations, see `camels_aus.infill.infill_streamflow`
+
+        Args:
+            kwargs: parameters of `infill_streamflow`, e.g. `max_gap_days` and `n_donors`
+
+        Returns:
+            xr.Dataset: infilled series, its integer quality codes recording the provenance of the values, and the donors of each station
+        """
+        from .infill import infill_streamflow
+
+        return infill_streamflow(self._ds, **kwargs)
+
+    def arrow_reader(
+        self,
+        varnames: List[str] = None,
+        batch_days: int = None,
+        attributes: List[str] = None,
+    ):
+        """The daily series in long format, one row per (day, station), as a stream of Arrow record batches wrapping the data arrays without copy
+
+        Args:
+            varnames (List[str], optional): daily series. Defaults to None, all numeric daily series.
+            batch_days (int, optional): number of days per batch. Defaults to None, `camels_aus.arrow.DEFAULT_BATCH_DAYS`.
+            attributes (List[str], optional): station attributes added as columns. Defaults to None.
+
+        Returns:
+            pa.RecordBatchReader: batches with columns `time`, `station_id`, then one per variable, e.g. for DuckDB
+        """
+        from .arrow import DEFAULT_BATCH_DAYS, daily_reader
+
+        return daily_reader(
+            self._ds,
+            varnames,
+            DEFAULT_BATCH_DAYS if batch_days is None else batch_days,
+            attributes=attributes,
+        )
+
+    def arrow_daily(
+        self,
+        varnames: List[str] = None,
+        batch_days: int = None,
+        attributes: List[str] = None,
+    ):
+        """The daily series in long format as an Arrow table wrapping the data arrays without copy, see `arrow_reader`; e.g. `polars.from_arrow(repo.arrow_daily())`"""
+        return self.arrow_reader(varnames, batch_days, attributes).read_all()
+
+    def arrow_attributes(self, varnames: List[str] = None):
+        """Station attributes as an Arrow table, one row per station, with the `station_id` dictionary column of `arrow_daily`
+
+        Args:
+            varnames (List[str], optional): station variables. Defaults to None, all station variables.
+
+        Returns:
+            pa.Table: attributes
+        """
+        from .arrow import attributes_table
+
+        return attributes_table(self._ds, varnames)
+
+    def set_memo_store(self, directory: str, max_bytes: int = None) -> None:
+        """Sets the directory where derived products are memoised, by default the `memo` subdirectory of the binary cache
+
+        Args:
+            directory (str): directory, possibly shared by several jobs
+            max_bytes (int, optional): size budget of the directory. Defaults to None, `camels_aus.memo.DEFAULT_MAX_BYTES`.
+        """
+        from .memo import DEFAULT_MAX_BYTES, MemoStore
+
+        self._memo_directory = directory
+        self._memo_store = MemoStore(
+            directory, DEFAULT_MAX_BYTES if max_bytes is None else max_bytes
+        )
+
+    @property
+    def memo_store(self) -> MemoStore:
+        """Store of the memoised derived products; None if neither a store nor a binary cache is set"""
+        from .memo import MEMO_SUBDIR, MemoStore
+
+        directory = self._memo_directory
+        if directory is None and self._cache_directory is not None:
+            directory = os.path.join(self._cache_directory, MEMO_SUBDIR)
+        if directory is None:
+            return None
+        if self._memo_store is None or self._memo_store.directory != directory:
+            self._memo_store = MemoStore(directory)
+        return self._memo_store
+
+    def derived(
+        self,
+        name: str,
+        varnames: List[str] = None,
+        station_ids: List[str] = None,
+        **params,
+    ):
+        """A derived product of the data, memoised on disk across jobs
+
+        Args:
+            name (str): product registered in `camels_aus.memo.PRODUCTS`, e.g. "annual_maxima", or with `camels_aus.memo.register_product`
+            varnames (List[str], optional): variables the product is computed from. Defaults to None, all variables.
+            station_ids (List[str], optional): stations. Defaults to None, all stations.
+            params: parameters of the product function
+
+        Returns:
+            Any: the result of the product function on the subset of the data
+        """
+        from .memo import dataset_fingerprint, product_function, product_key
+
+        func = product_function(name)
+        ds = self._ds
+        if station_ids is not None:
+            ds = ds.sel({STATION_ID_VARNAME: station_ids})
+        if varnames is not None:
+            ds = ds[varnames]
+        store = self.memo_store
+        if store is None:
+            return func(ds, **params)
+        key = product_key(
+            name, dataset_fingerprint(ds, self._version, self._data_stamp), params
+        )
+        found, value = store.get(key)
+        if not found:
+            value = func(ds, **params)
+            store.put(key, value)
+        return value
+
+    def converted(self, varname: str, units: str) -> ScaledView:
+        """A daily series in other units, e.g. streamflow in ML/d or m^3/s, converted on access without copying the series
+
+        Args:
+            varname (str): daily series, e.g. "streamflow_mmd"
+            units (str): target units, see `camels_aus.units.UNIT_DEFINITIONS`
+
+        Returns:
+            ScaledView: converted view; `sel` and `values` give the converted values
+        """
+        from .units import converted_view
+
+        return converted_view(self._ds, varname, units)
+
+    def regional_aggregator(self, by: str = "drainage_division"):
+        """Catchment area weighted aggregator of the stations by region, built once per grouping
+
+        Args:
+            by (str, optional): station variable giving the region, e.g. "drainage_division" or "river_region". Defaults to "drainage_division".
+
+        Returns:
+            RegionalAggregator: aggregator
+        """
+        from .dtypes import decode_categorical
+        from .regional import RegionalAggregator
+
+        if not by in self._regional_aggregators:
+            if not by in self._ds:
+                raise KeyError("No station variable {0}".format(by))
+            self._regional_aggregators[by] = RegionalAggregator(
+                decode_categorical(self._ds[by]).values,
+                self._ds[CATCHMENT_AREA_VARNAME].values,
+                name=by,
+            )
+        return self._regional_aggregators[by]
+
+    def regional_series(
+        self, by: str = "drainage_division", varnames: List[str] = None, freq: str = "D"
+    ) -> xr.Dataset:
+        """Catchment area weighted regional series of the daily variables
+
+        Args:
+            by (str, optional): station variable giving the region, e.g. "drainage_division" or "river_region". Defaults to "drainage_division".
+            varnames (List[str], optional): daily variables. Defaults to None, all numeric daily variables.
+            freq (str, optional): "D", "M" or "Y" for daily series, or their monthly or annual means. Defaults to "D".
+
+        Returns:
+            xr.Dataset: regional series of dimensions (time, `by`)
+        """
+        from .regional import regional_series
+
+        return regional_series(
+            self._ds, self.regional_aggregator(by), varnames=varnames, freq=freq
+        )
+
     @property
     def data(self) -> xr.Dataset:
         """Camels aggregated xarray dataset"""
@@ -310,18 +1108,7 @@ class CamelsAus:
     @property
     def daily_data(self) -> xr.DataArray:
         """All daily time series in the dataset"""
-        return self._ds[
-            [
-                STREAMFLOW_MMD_VARNAME,
-                STREAMFLOW_QUALITYCODES_VARNAME,
-                PRECIPITATION_AWAP_VARNAME,
-                ET_MORTON_ACTUAL_SILO_VARNAME,
-                SOLARRAD_AWAP_VARNAME,
-                TMAX_AWAP_VARNAME,
-                TMIN_AWAP_VARNAME,
-                VPRP_AWAP_VARNAME,
-            ]
-        ]
+        return self._ds[daily_varnames()]
 
     @property
     def other_attributes(self) -> xr.DataArray:
@@ -343,8 +1130,198 @@ class CamelsAus:
     def geology_attributes(self) -> xr.DataArray:
         return self._ds[geology_attributes_names()]
 
-    def load_from_cached_files(self, directory: str, version: str = "1.0") -> None:
-        raise NotImplemented("Not yet implemented")
+    def to_parquet(self, directory: str, partition_by: str = "station") -> None:
+        """Exports the dataset to Parquet files: daily series in long format, attributes and gauging statistics in separate tables
+
+        Daily series are written one station at a time, so that peak memory stays near the size of one partition.
+        Requires the optional package `pyarrow`.
+
+        Args:
+            directory (str): output directory
+            partition_by (str, optional): "station" or "drainage_division". Defaults to "station".
+        """
+        from .parquet import write_parquet
+
+        write_parquet(self._ds, directory, partition_by=partition_by)
+
+    def load_from_parquet(
+        self, directory: str, station_ids: List[str] = None, varnames: List[str] = None
+    ) -> None:
+        """Loads the dataset from Parquet files written by `to_parquet`
+
+        Args:
+            directory (str): directory written by `to_parquet`
+            station_ids (List[str], optional): subset of stations to load. Defaults to None, all stations.
+            varnames (List[str], optional): subset of daily variables to load. Defaults to None, all variables.
+        """
+        from .memo import directory_stamp
+        from .parquet import read_parquet
+
+        self._ds = read_parquet(directory, station_ids=station_ids, varnames=varnames)
+        self._reset_derived()
+        self._version = None
+        self._source_directory = None
+        self._data_stamp = directory_stamp(directory)
+        self._load_time_series_func = None
+        self._dtype_policy = None
+        self._boundaries_fn = None
+        self._boundaries = None
+        self._cache_directory = None
+
+    def load_from_store(self, store, version: str) -> None:
+        """Loads one version of the data from a content-addressed store (see `camels_aus.store.ContentStore`)
+
+        Daily series are read from binary caches keyed by the hash of their source file,
+        so switching between versions only parses the files that differ.
+
+        Args:
+            store (Union[str, ContentStore]): content-addressed store, or its root directory
+            version (str): version label, as registered with `ContentStore.add_directory`
+        """
+        from .store import ContentStore
+
+        if isinstance(store, str):
+            store = ContentStore(store)
+        directory = store.checkout(version)
+
+        def load_time_series(directory, short_fn, is_missing, units, dtype):
+            full_fn = os.path.join(directory, short_fn)
+            _check_fileexists(full_fn)
+            return store.load_time_series(
+                version, full_fn, is_missing=is_missing, units=units, dtype=dtype
+            )
+
+        self._load_from_text_files(directory, version, load_time_series)
+
+    def load_from_cached_files(
+        self, directory: str, version: str = "1.0", mmap: bool = False
+    ) -> None:
+        """Loads the CAMELS-AUS data from a binary cache written by `save_to_cached_files`
+
+        Args:
+            directory (str): cache directory
+            version (str, optional): version of the dataset. Defaults to '1.0' (only one supported currently).
+            mmap (bool, optional): memory-map the daily series rather than reading them into memory; quality codes
+                then stay integer codes, see `camels_aus.cache.load_cache`. Defaults to False.
+
+        Raises:
+            FileNotFoundError: the directory does not contain a cache
+            ValueError: the cache holds another version of the dataset
+        """
+        from .cache import cached_boundaries_filename, load_cache, read_manifest
+
+        check_camels_aus_version(version)
+        manifest = read_manifest(directory)
+        if manifest["version"] != version:
+            raise ValueError(
+                "Cache in {0} holds version {1} of the dataset, not {2}".format(
+                    directory, manifest["version"], version
+                )
+            )
+        self._ds = load_cache(directory, mmap=mmap)
+        self._reset_derived()
+        self._version = version
+        self._source_directory = None
+        self._data_stamp = manifest.get("write_id")
+        self._load_time_series_func = None
+        self._dtype_policy = None
+        self._boundaries_fn = cached_boundaries_filename(directory)
+        self._boundaries = None
+        self._cache_directory = directory
+
+    def load_out_of_core(
+        self,
+        directory: str,
+        cache_directory: str,
+        version: str = "1.0",
+        max_block_bytes: int = 64 * 1024**2,
+    ) -> None:
+        """Loads a dataset too large for memory: the CSV files are streamed in blocks into a binary cache, then memory-mapped
+
+        The cache is built only if `cache_directory` does not hold one already. Reductions over the whole dataset
+        can then be computed block by block with `chunked`.
+
+        Args:
+            directory (str): directory with the CSV files, same layout as CAMELS-AUS
+            cache_directory (str): cache directory
+            version (str, optional): version of the dataset. Defaults to '1.0' (only one supported currently).
+            max_block_bytes (int, optional): approximate size of the blocks of rows parsed at once. Defaults to 64 MiB.
+        """
+        from .cache import MANIFEST_FN, build_cache_from_text_files
+
+        check_camels_aus_version(version)
+        if not os.path.exists(os.path.join(cache_directory, MANIFEST_FN)):
+            build_cache_from_text_files(
+                directory, cache_directory, version, max_block_bytes
+            )
+        self.load_from_cached_files(cache_directory, version=version, mmap=True)
+        self._source_directory = directory
+
+    def chunked(self, max_block_bytes: int = None, n_workers: int = None):
+        """Out-of-core reductions over the daily series of the binary cache, computed block by block over a pool of threads
+
+        Args:
+            max_block_bytes (int, optional): approximate size of each block of values. Defaults to None, 64 MiB.
+            n_workers (int, optional): number of threads. Defaults to None, the number of CPUs.
+
+        Returns:
+            ChunkedCache: reductions, e.g. `resample` and `station_statistics`
+        """
+        from .chunked import DEFAULT_BLOCK_BYTES, ChunkedCache
+
+        if self._cache_directory is None:
+            raise ValueError(
+                "Chunked computations need a binary cache; load the data with load_from_cached_files or load_out_of_core"
+            )
+        return ChunkedCache(
+            self._cache_directory,
+            DEFAULT_BLOCK_BYTES if max_block_bytes is None else max_block_bytes,
+            n_workers,
+        )
+
+    def save_to_cached_files(
+        self, directory: str, version: str = "1.0", layout: str = None
+    ) -> None:
+        """Saves the data loaded in memory to a binary cache, much faster to load than the CSV files
+
+        If the data was loaded with `load_from_text_files`, the cache records where each daily file ends,
+        so that `update_from_text_files` can later append new days by parsing only the new rows.
+
+        Args:
+            directory (str): cache directory
+            version (str, optional): version of the dataset. Defaults to '1.0' (only one supported currently).
+            layout (str, optional): layout of the daily series in the cache, "time_major" or "station_major";
+                only time-major caches can be updated. Defaults to None, time-major.
+        """
+        from .cache import save_cache
+        from .layout import TIME_MAJOR
+
+        check_camels_aus_version(version)
+        save_cache(
+            self._ds,
+            directory,
+            version=version,
+            source_directory=self._source_directory,
+            boundaries=self.boundaries,
+            layout=TIME_MAJOR if layout is None else layout,
+        )
+
+    def update_from_text_files(self, directory: str, cache_directory: str) -> int:
+        """Appends to a binary cache the days found in the daily CSV files after the end of the cached time axis, then reloads the cache
+
+        Only the new rows of each daily file are parsed, and the missing data summaries and the gap index are updated incrementally.
+
+        Args:
+            directory (str): directory with the CSV files, same layout as CAMELS-AUS
+            cache_directory (str): cache directory written by `save_to_cached_files`
+
+        Returns:
+            int: number of days appended
+        """
+        from .cache import append_from_text_files, read_manifest
 
-    def save_to_cached_files(self, directory: str, version: str = "1.0") -> None:
-        raise NotImplemented("Not yet implemented")
+        n = append_from_text_files(cache_directory, directory)
+        version = read_manifest(cache_directory)["version"]
+        self.load_from_cached_files(cache_directory, version=version)
+        self._source_directory = directory
+        return n
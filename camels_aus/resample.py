@@ -0,0 +1,219 @@
+"""Resampling of the daily series to monthly, annual and water year totals or means.
+
+The daily time axis is mapped once to periods: the index of the first day of each period,
+and the number of days in the full period. All series are then reduced per period with
+`np.add.reduceat`, along the time axis of the (time, station) arrays. A period with a
+proportion of days with data below a completeness threshold is set to NaN; totals are not
+rescaled for the missing days.
+"""
+
+import hashlib
+import json
+import os
+from typing import List
+
+import numpy as np
+
+from .conventions import STATION_ID_VARNAME, TIME_DIM_NAME
+from .dtypes import CATEGORIES_ATTRIB_ID
+
+RESAMPLING_FREQUENCIES = ["M", "Y", "WY"]
+"""Monthly, calendar year, and water year with a configurable first month"""
+
+RESAMPLING_METHODS = ["sum", "mean"]
+
+
+class PeriodMapping:
+    """Mapping of a contiguous daily time axis to periods"""
+
+    def __init__(
+        self, time: np.ndarray, freq: str = "M", water_year_start: int = 7
+    ) -> None:
+        """Constructor
+
+        Args:
+            time (np.ndarray): days, contiguous and in increasing order
+            freq (str, optional): "M", "Y" or "WY". Defaults to "M".
+            water_year_start (int, optional): first month of the water years, for freq "WY". Defaults to 7, July.
+        """
+        if not freq in RESAMPLING_FREQUENCIES:
+            raise ValueError(
+                "Unsupported frequency {0}, expected one of {1}".format(
+                    freq, RESAMPLING_FREQUENCIES
+                )
+            )
+        if not 1 <= water_year_start <= 12:
+            raise ValueError("water_year_start must be a month, 1 to 12")
+        days = np.asarray(time).astype("datetime64[D]")
+        months = days.astype("datetime64[M]").astype(np.int64)
+        first_month = 0
+        if freq == "M":
+            period = months
+        else:
+            first_month = 0 if freq == "Y" else water_year_start - 1
+            period = (months - first_month) // 12
+        self.freq = freq
+        self.water_year_start = water_year_start if freq == "WY" else 1
+        self.starts = np.concatenate([[0], np.nonzero(np.diff(period))[0] + 1])
+        ids = period[self.starts]
+        if freq == "M":
+            first = ids.astype("datetime64[M]")
+            following = (ids + 1).astype("datetime64[M]")
+        else:
+            first = (ids * 12 + first_month).astype("datetime64[M]")
+            following = ((ids + 1) * 12 + first_month).astype("datetime64[M]")
+        self.labels = first.astype("datetime64[D]")
+        self.period_days = (following.astype("datetime64[D]") - self.labels).astype(
+            np.int64
+        )
+        self.n_days = len(days)
+
+    def __len__(self) -> int:
+        return len(self.starts)
+
+    def reduce(self, x: np.ndarray, how: str = "sum", min_completeness: float = 0.0):
+        """Reduces daily values per period
+
+        Args:
+            x (np.ndarray): values of shape (time, ...)
+            how (str, optional): "sum" or "mean". Defaults to "sum".
+            min_completeness (float, optional): minimum proportion of the days of a full period with data;
+                periods below are NaN. Partial periods at the ends of the time axis count their absent days as missing. Defaults to 0.0.
+
+        Returns:
+            Tuple[np.ndarray, np.ndarray]: reduced values of shape (period, ...), and the completeness of each period
+        """
+        if not how in RESAMPLING_METHODS:
+            raise ValueError(
+                "Unsupported method {0}, expected one of {1}".format(
+                    how, RESAMPLING_METHODS
+                )
+            )
+        x = np.asarray(x)
+        if x.shape[0] != self.n_days:
+            raise ValueError(
+                "{0} days in the values, {1} in the mapping".format(
+                    x.shape[0], self.n_days
+                )
+            )
+        valid = np.isfinite(x)
+        total = np.add.reduceat(
+            np.where(valid, x, 0.0), self.starts, axis=0, dtype=np.float64
+        )
+        count = np.add.reduceat(valid, self.starts, axis=0, dtype=np.int64)
+        shape = (len(self),) + (1,) * (x.ndim - 1)
+        completeness = count / self.period_days.reshape(shape)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            res = total if how == "sum" else total / count
+        res = np.where((count > 0) & (completeness >= min_completeness), res, np.nan)
+        return res, completeness
+
+
+def resample_dataset(
+    ds,
+    freq: str = "M",
+    how: str = "sum",
+    min_completeness: float = 0.0,
+    water_year_start: int = 7,
+    varnames: List[str] = None,
+):
+    """Resamples the numeric daily series of a dataset
+
+    Args:
+        ds (xr.Dataset): dataset, typically `CamelsAus.data`
+        freq (str, optional): "M", "Y" or "WY". Defaults to "M".
+        how (str, optional): "sum" or "mean". Defaults to "sum".
+        min_completeness (float, optional): minimum proportion of days with data per period. Defaults to 0.0.
+        water_year_start (int, optional): first month of the water years. Defaults to 7.
+        varnames (List[str], optional): daily variables. Defaults to None, all numeric daily variables;
+            not the integer codes of categorical variables, e.g. memory-mapped quality codes.
+
+    Returns:
+        xr.Dataset: series of dimensions (time, station_id), the time coordinate being the first day of each period.
+            The completeness of each period is in the variables `<variable>_completeness`.
+    """
+    import xarray as xr
+
+    from .conventions import daily_varnames
+
+    if varnames is None:
+        varnames = [
+            v
+            for v in daily_varnames()
+            if v in ds.data_vars
+            and ds[v].dtype.kind in "fiu"
+            and not CATEGORIES_ATTRIB_ID in ds[v].attrs
+        ]
+    mapping = PeriodMapping(ds[TIME_DIM_NAME].values, freq, water_year_start)
+    coords = {
+        TIME_DIM_NAME: mapping.labels.astype("datetime64[ns]"),
+        STATION_ID_VARNAME: ds[STATION_ID_VARNAME].values,
+    }
+    dims = [TIME_DIM_NAME, STATION_ID_VARNAME]
+    d = {}
+    for v in varnames:
+        x = ds[v].transpose(TIME_DIM_NAME, STATION_ID_VARNAME).values
+        res, completeness = mapping.reduce(x, how, min_completeness)
+        d[v] = xr.DataArray(res, coords=coords, dims=dims, attrs=ds[v].attrs)
+        d[v + "_completeness"] = xr.DataArray(
+            completeness.astype(np.float32), coords=coords, dims=dims
+        )
+    return xr.Dataset(
+        d,
+        attrs={
+            "freq": freq,
+            "how": how,
+            "min_completeness": min_completeness,
+            "water_year_start": mapping.water_year_start,
+        },
+    )
+
+
+RESAMPLED_SUBDIR = "resampled"
+"""Subdirectory of the binary cache where resampled series are memoised"""
+
+
+def resampling_key(ds, **kwargs) -> str:
+    """Hash identifying resampling arguments and the time axis and stations of a dataset"""
+    time = ds[TIME_DIM_NAME].values
+    content = dict(kwargs)
+    content["start"] = str(time[0])[:10]
+    content["length"] = len(time)
+    content["stations"] = [str(s) for s in ds[STATION_ID_VARNAME].values]
+    return hashlib.sha1(json.dumps(content, sort_keys=True).encode()).hexdigest()
+
+
+def save_resampled(filename: str, resampled) -> None:
+    """Saves a dataset from `resample_dataset` to a .npz file"""
+    arrays = {
+        TIME_DIM_NAME: resampled[TIME_DIM_NAME].values,
+        STATION_ID_VARNAME: resampled[STATION_ID_VARNAME].values.astype(str),
+    }
+    attrs = {"dataset": resampled.attrs, "variables": {}}
+    for v in resampled.data_vars:
+        arrays[v] = resampled[v].values
+        attrs["variables"][v] = resampled[v].attrs
+    arrays["__attrs__"] = np.array(json.dumps(attrs))
+    tmp = filename + ".tmp.npz"
+    np.savez(tmp, **arrays)
+    os.replace(tmp, filename)
+
+
+def load_resampled(filename: str):
+    """Loads a dataset saved with `save_resampled`"""
+    import xarray as xr
+
+    with np.load(filename) as f:
+        attrs = json.loads(str(f["__attrs__"]))
+        coords = {
+            TIME_DIM_NAME: f[TIME_DIM_NAME],
+            STATION_ID_VARNAME: f[STATION_ID_VARNAME].astype(object),
+        }
+        dims = [TIME_DIM_NAME, STATION_ID_VARNAME]
+        d = dict(
+            [
+                (v, xr.DataArray(f[v], coords=coords, dims=dims, attrs=a))
+                for v, a in attrs["variables"].items()
+            ]
+        )
+    return xr.Dataset(d, attrs=attrs["dataset"])
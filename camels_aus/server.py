@@ -0,0 +1,320 @@
+"""A small asynchronous HTTP service over a `CamelsAus` repository, for dashboards.
+
+Routes (all GET):
+
+* `/stations`: station identifiers and names
+* `/stations/{station_id}/series?variables=a,b&start=YYYY-MM-DD&end=YYYY-MM-DD&format=json|arrow`
+* `/stations/{station_id}/attributes`
+* `/attributes?format=json|arrow`: attributes of all stations
+* `/boundaries?bbox=min_lon,min_lat,max_lon,max_lat&zoom=z`: catchment boundaries as GeoJSON,
+    simplified for the zoom level (see `camels_aus.spatial`)
+
+Response bodies are computed in an executor, so that slicing and serialisation do not block the
+event loop. They are kept in an LRU cache and carry ETags; a request with a matching
+`If-None-Match` header gets a 304 response. Concurrent requests for the same resource share
+one computation.
+
+Variables stored as integer codes by a dtype policy (see `camels_aus.dtypes`) are served as strings.
+
+Requires the optional dependency `aiohttp` (and `pyarrow` for the Arrow format).
+"""
+
+import asyncio
+import hashlib
+import json
+from collections import OrderedDict
+from concurrent.futures import Executor
+from typing import Callable, Dict, Tuple
+
+import numpy as np
+
+from .conventions import (
+    STATION_ID_VARNAME,
+    STATION_NAME_VARNAME,
+    TIME_DIM_NAME,
+    daily_varnames,
+)
+from .dtypes import decode_categorical
+
+JSON_CONTENT_TYPE = "application/json"
+GEOJSON_CONTENT_TYPE = "application/geo+json"
+ARROW_CONTENT_TYPE = "application/vnd.apache.arrow.stream"
+
+
+class ResponseCache:
+    """Least recently used cache of response bodies, with their content type and ETag"""
+
+    def __init__(self, max_entries: int = 256) -> None:
+        """Constructor
+
+        Args:
+            max_entries (int, optional): maximum number of responses kept. Defaults to 256.
+        """
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key) -> Tuple[bytes, str, str]:
+        """Cached (body, content type, etag) for a key, None if not cached"""
+        entry = self._entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        self._entries.move_to_end(key)
+        return entry
+
+    def put(self, key, body: bytes, content_type: str) -> Tuple[bytes, str, str]:
+        """Caches a response body, evicting the least recently used entries beyond capacity"""
+        etag = '"{0}"'.format(hashlib.sha1(body).hexdigest())
+        entry = (body, content_type, etag)
+        self._entries[key] = entry
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+        return entry
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+def _json_values(x: np.ndarray) -> list:
+    if x.dtype.kind == "f":
+        return np.where(np.isnan(x), None, x.astype(object)).tolist()
+    if x.dtype.kind == "O":
+        return [None if (isinstance(v, float) and np.isnan(v)) else v for v in x]
+    return x.tolist()
+
+
+def _json_body(content) -> bytes:
+    return json.dumps(content, separators=(",", ":")).encode()
+
+
+def _arrow_body(columns: Dict[str, np.ndarray]) -> bytes:
+    import pyarrow as pa
+
+    arrays = {}
+    for k, x in columns.items():
+        if x.dtype.kind == "O":
+            arrays[k] = pa.array(x, type=pa.string(), from_pandas=True)
+        else:
+            arrays[k] = pa.array(x, from_pandas=True)
+    table = pa.table(arrays)
+    sink = pa.BufferOutputStream()
+    with pa.ipc.new_stream(sink, table.schema) as writer:
+        writer.write_table(table)
+    return sink.getvalue().to_pybytes()
+
+
+class DataService:
+    """Builds the response bodies served over a `CamelsAus` repository. Methods are blocking, and run in an executor by the HTTP handlers."""
+
+    def __init__(self, repo) -> None:
+        """Constructor
+
+        Args:
+            repo (CamelsAus): repository with data loaded
+        """
+        self.repo = repo
+        self.ds = repo.data
+
+    @staticmethod
+    def _values(x, varname: str) -> np.ndarray:
+        # strings of the variables stored as integer codes by a dtype policy
+        return decode_categorical(x[varname]).values
+
+    def _check_station(self, station_id: str) -> None:
+        if not station_id in self.ds.indexes[STATION_ID_VARNAME]:
+            raise KeyError("Unknown station {0}".format(station_id))
+
+    def stations(self) -> Tuple[bytes, str]:
+        ids = self.ds[STATION_ID_VARNAME].values
+        names = (
+            self._values(self.ds, STATION_NAME_VARNAME)
+            if STATION_NAME_VARNAME in self.ds
+            else ids
+        )
+        content = [
+            {STATION_ID_VARNAME: str(s), STATION_NAME_VARNAME: str(n)}
+            for s, n in zip(ids, names)
+        ]
+        return _json_body(content), JSON_CONTENT_TYPE
+
+    def series(
+        self,
+        station_id: str,
+        variables: str = None,
+        start: str = None,
+        end: str = None,
+        format: str = "json",
+    ) -> Tuple[bytes, str]:
+        self._check_station(station_id)
+        varnames = [v for v in daily_varnames() if v in self.ds.data_vars]
+        if variables is not None:
+            requested = variables.split(",")
+            unknown = [v for v in requested if not v in varnames]
+            if len(unknown) > 0:
+                raise KeyError("Unknown variables {0}".format(unknown))
+            varnames = requested
+        x = self.ds[varnames].sel(
+            {STATION_ID_VARNAME: station_id, TIME_DIM_NAME: slice(start, end)}
+        )
+        time = x[TIME_DIM_NAME].values.astype("datetime64[D]")
+        if format == "arrow":
+            columns = {TIME_DIM_NAME: time}
+            columns.update(dict([(v, self._values(x, v)) for v in varnames]))
+            return _arrow_body(columns), ARROW_CONTENT_TYPE
+        content = {
+            STATION_ID_VARNAME: station_id,
+            TIME_DIM_NAME: time.astype(str).tolist(),
+        }
+        content.update(dict([(v, _json_values(self._values(x, v))) for v in varnames]))
+        return _json_body(content), JSON_CONTENT_TYPE
+
+    def _attribute_names(self):
+        return [
+            v for v in self.ds.data_vars if self.ds[v].dims == (STATION_ID_VARNAME,)
+        ]
+
+    def station_attributes(self, station_id: str) -> Tuple[bytes, str]:
+        self._check_station(station_id)
+        x = self.ds[self._attribute_names()].sel({STATION_ID_VARNAME: station_id})
+        content = dict(
+            [
+                (v, _json_values(np.atleast_1d(self._values(x, v)))[0])
+                for v in x.data_vars
+            ]
+        )
+        content[STATION_ID_VARNAME] = station_id
+        return _json_body(content), JSON_CONTENT_TYPE
+
+    def attributes(self, format: str = "json") -> Tuple[bytes, str]:
+        columns = {STATION_ID_VARNAME: self.ds[STATION_ID_VARNAME].values}
+        columns.update(
+            dict([(v, self._values(self.ds, v)) for v in self._attribute_names()])
+        )
+        if format == "arrow":
+            return _arrow_body(columns), ARROW_CONTENT_TYPE
+        content = dict([(k, _json_values(x)) for k, x in columns.items()])
+        return _json_body(content), JSON_CONTENT_TYPE
+
+    def boundaries(self, bbox: str = None, zoom: str = None) -> Tuple[bytes, str]:
+        if self.repo.simplified_boundaries is None:
+            raise KeyError("No catchment boundaries loaded")
+        if bbox is not None:
+            bbox = tuple([float(x) for x in bbox.split(",")])
+            if len(bbox) != 4:
+                raise ValueError("bbox must be min_lon,min_lat,max_lon,max_lat")
+        zoom = None if zoom is None else float(zoom)
+        return self.repo.boundaries_geojson(bbox, zoom).encode(), GEOJSON_CONTENT_TYPE
+
+
+def create_app(
+    repo,
+    cache_size: int = 256,
+    executor: Executor = None,
+    response_cache: ResponseCache = None,
+):
+    """Creates the aiohttp application serving a `CamelsAus` repository
+
+    Args:
+        repo (CamelsAus): repository with data loaded
+        cache_size (int, optional): maximum number of responses kept in the LRU cache. Defaults to 256.
+        executor (Executor, optional): executor computing the responses. Defaults to None, the event loop default executor.
+        response_cache (ResponseCache, optional): response cache to use, e.g. to monitor hits and misses. Defaults to None, a new cache of `cache_size` entries.
+
+    Returns:
+        aiohttp.web.Application: application
+    """
+    try:
+        from aiohttp import web
+    except ImportError:
+        raise ImportError(
+            "The HTTP service requires the optional package 'aiohttp' (pip install aiohttp)"
+        )
+
+    service = DataService(repo)
+    cache = ResponseCache(cache_size) if response_cache is None else response_cache
+    in_flight = {}
+
+    async def respond(request, compute: Callable[[], Tuple[bytes, str]]):
+        key = (request.path, tuple(sorted(request.query.items())))
+        entry = cache.get(key)
+        if entry is None:
+            if not key in in_flight:
+                loop = asyncio.get_running_loop()
+                in_flight[key] = loop.run_in_executor(executor, compute)
+            future = in_flight[key]
+            try:
+                body, content_type = await asyncio.shield(future)
+            except KeyError as e:
+                raise web.HTTPNotFound(text=str(e))
+            except ValueError as e:
+                raise web.HTTPBadRequest(text=str(e))
+            finally:
+                if in_flight.get(key) is future and future.done():
+                    del in_flight[key]
+            entry = cache.put(key, body, content_type)
+        body, content_type, etag = entry
+        headers = {"ETag": etag, "Cache-Control": "max-age=0, must-revalidate"}
+        if request.headers.get("If-None-Match") == etag:
+            return web.Response(status=304, headers=headers)
+        return web.Response(body=body, content_type=content_type, headers=headers)
+
+    async def stations(request):
+        return await respond(request, service.stations)
+
+    async def series(request):
+        q = request.query
+        return await respond(
+            request,
+            lambda: service.series(
+                request.match_info["station_id"],
+                q.get("variables"),
+                q.get("start"),
+                q.get("end"),
+                q.get("format", "json"),
+            ),
+        )
+
+    async def station_attributes(request):
+        return await respond(
+            request,
+            lambda: service.station_attributes(request.match_info["station_id"]),
+        )
+
+    async def attributes(request):
+        return await respond(
+            request, lambda: service.attributes(request.query.get("format", "json"))
+        )
+
+    async def boundaries(request):
+        q = request.query
+        return await respond(
+            request, lambda: service.boundaries(q.get("bbox"), q.get("zoom"))
+        )
+
+    app = web.Application()
+    app.router.add_get("/stations", stations)
+    app.router.add_get("/stations/{station_id}/series", series)
+    app.router.add_get("/stations/{station_id}/attributes", station_attributes)
+    app.router.add_get("/attributes", attributes)
+    app.router.add_get("/boundaries", boundaries)
+    return app
+
+
+def serve(
+    repo, host: str = "127.0.0.1", port: int = 8080, cache_size: int = 256
+) -> None:
+    """Serves a `CamelsAus` repository over HTTP until interrupted
+
+    Args:
+        repo (CamelsAus): repository with data loaded
+        host (str, optional): interface to listen on. Defaults to "127.0.0.1".
+        port (int, optional): port. Defaults to 8080.
+        cache_size (int, optional): maximum number of responses kept in the LRU cache. Defaults to 256.
+    """
+    from aiohttp import web
+
+    web.run_app(create_app(repo, cache_size=cache_size), host=host, port=port)
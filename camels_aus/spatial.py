@@ -0,0 +1,424 @@
+"""Spatial features over the catchment boundaries: simplified levels of detail for mapping,
+and a spatial index for point and polygon queries.
+
+Catchment polygons are simplified once per level of detail, with a topology-preserving
+algorithm applied to each polygon (CAMELS-AUS catchments are nested, so they do not form
+a coverage with shared edges that could be simplified jointly). Levels are saved as WKB
+alongside the binary dataset cache. GeoJSON output is built from per-feature strings
+serialised once per level, and cached per (level, map tile); bounding box queries go
+through the tiles covering the box.
+
+`CatchmentIndex` is an STRtree over the full resolution polygons. It is built from the
+level 0 WKB of the cache, which avoids reading the shapefile in each process; building
+the tree itself takes milliseconds for the few hundred CAMELS-AUS catchments.
+
+Requires shapely 2 and geopandas, imported on first use.
+"""
+
+import json
+import os
+from collections import OrderedDict
+from typing import List, Tuple
+
+import numpy as np
+
+from .conventions import STATION_ID_VARNAME
+
+BOUNDARIES_ID_COLUMNS = [STATION_ID_VARNAME, "CatchID", "StationID"]
+"""Candidate names of the column identifying stations in the boundaries attribute table"""
+
+DEFAULT_TOLERANCES = [0.0, 0.0005, 0.002, 0.008, 0.03]
+"""Simplification tolerances of the levels of detail, in degrees. Level 0 is the full resolution."""
+
+LOD_SUBDIR = "boundaries_lod"
+DEFAULT_MAX_CACHED_TILES = 1024
+"""Default number of (level, tile) GeoJSON outputs kept in memory"""
+
+_TILE_SIZE_PX = 256
+_MAX_TILE_ZOOM = 22
+
+
+def boundaries_station_ids(boundaries) -> np.ndarray:
+    """Station identifiers of the catchment boundaries
+
+    Args:
+        boundaries (gpd.GeoDataFrame): catchment boundaries, as `CamelsAus.boundaries`
+
+    Raises:
+        KeyError: no column identifying stations was found
+
+    Returns:
+        np.ndarray: station identifiers, as strings
+    """
+    columns = dict([(c.lower(), c) for c in boundaries.columns])
+    for c in BOUNDARIES_ID_COLUMNS:
+        if c.lower() in columns:
+            return boundaries[columns[c.lower()]].astype(str).values
+    raise KeyError(
+        "None of the columns {0} found in the boundaries".format(BOUNDARIES_ID_COLUMNS)
+    )
+
+
+def _to_lonlat(boundaries):
+    if boundaries.crs is not None and not boundaries.crs.is_geographic:
+        return boundaries.to_crs(4326)
+    return boundaries
+
+
+def write_wkb(filename: str, geoms: np.ndarray) -> None:
+    """Writes geometries as concatenated WKB to a .npz file, without pickling"""
+    import shapely
+
+    wkb = shapely.to_wkb(geoms)
+    offsets = np.zeros(len(wkb) + 1, dtype=np.int64)
+    offsets[1:] = np.cumsum([len(b) for b in wkb])
+    data = np.frombuffer(b"".join(wkb), dtype=np.uint8)
+    np.savez(filename, data=data, offsets=offsets)
+
+
+def read_wkb(filename: str) -> np.ndarray:
+    """Reads geometries written by `write_wkb`"""
+    import shapely
+
+    with np.load(filename) as f:
+        data, offsets = f["data"].tobytes(), f["offsets"]
+    wkb = [data[offsets[i] : offsets[i + 1]] for i in range(len(offsets) - 1)]
+    return shapely.from_wkb(wkb)
+
+
+def tile_bounds(z: int, x: int, y: int) -> Tuple[float, float, float, float]:
+    """Bounds (min lon, min lat, max lon, max lat) of a web map tile in the usual XYZ scheme"""
+    n = 2.0**z
+
+    def lat(yy):
+        return float(np.degrees(np.arctan(np.sinh(np.pi * (1 - 2 * yy / n)))))
+
+    return (x / n * 360.0 - 180.0, lat(y + 1), (x + 1) / n * 360.0 - 180.0, lat(y))
+
+
+def tiles_covering(
+    bbox: Tuple[float, float, float, float], z: int
+) -> List[Tuple[int, int, int]]:
+    """XYZ web map tiles at zoom z covering a bounding box (min lon, min lat, max lon, max lat)"""
+    n = 2**z
+
+    def tx(lon):
+        return int(np.clip(np.floor((lon + 180.0) / 360.0 * n), 0, n - 1))
+
+    def ty(lat):
+        lat = np.radians(np.clip(lat, -85.0511, 85.0511))
+        y = (1.0 - np.log(np.tan(lat) + 1.0 / np.cos(lat)) / np.pi) / 2.0 * n
+        return int(np.clip(np.floor(y), 0, n - 1))
+
+    xmin, ymin, xmax, ymax = bbox
+    return [
+        (z, x, y)
+        for x in range(tx(xmin), tx(xmax) + 1)
+        for y in range(ty(ymax), ty(ymin) + 1)
+    ]
+
+
+def bbox_tile_zoom(bbox: Tuple[float, float, float, float]) -> int:
+    """Coarsest web map zoom level at which a bounding box spans about two tiles across, so that few tiles cover it"""
+    xmin, ymin, xmax, ymax = bbox
+    width = max(xmax - xmin, ymax - ymin, 1e-9)
+    return int(np.clip(np.floor(np.log2(360.0 / width)), 0, _MAX_TILE_ZOOM))
+
+
+class SimplifiedBoundaries:
+    """Catchment boundaries at several levels of detail, with bounding box queries returning GeoJSON"""
+
+    def __init__(
+        self,
+        station_ids: np.ndarray,
+        levels: List[np.ndarray],
+        tolerances: List[float],
+        max_cached_tiles: int = DEFAULT_MAX_CACHED_TILES,
+    ) -> None:
+        """Constructor; see `SimplifiedBoundaries.build` and `SimplifiedBoundaries.load`
+
+        Args:
+            station_ids (np.ndarray): station identifiers of the catchments
+            levels (List[np.ndarray]): shapely geometries of the catchments, one array per level of detail
+            tolerances (List[float]): simplification tolerance of each level, in degrees
+            max_cached_tiles (int, optional): number of (level, tile) outputs kept in memory, the least recently
+                used are evicted. Defaults to DEFAULT_MAX_CACHED_TILES.
+        """
+        import shapely
+
+        self.station_ids = np.asarray(station_ids).astype(str)
+        self.levels = levels
+        self.tolerances = list(tolerances)
+        self._bounds = shapely.bounds(levels[0])
+        self._feature_json = [None] * len(levels)
+        self.max_cached_tiles = max_cached_tiles
+        self._tile_cache = OrderedDict()
+
+    @staticmethod
+    def build(boundaries, tolerances: List[float] = None) -> "SimplifiedBoundaries":
+        """Simplifies catchment boundaries at several levels of detail
+
+        Args:
+            boundaries (gpd.GeoDataFrame): catchment boundaries, as `CamelsAus.boundaries`
+            tolerances (List[float], optional): tolerance of each level, in degrees. Defaults to None, `DEFAULT_TOLERANCES`.
+
+        Returns:
+            SimplifiedBoundaries: simplified boundaries
+        """
+        import shapely
+
+        if tolerances is None:
+            tolerances = DEFAULT_TOLERANCES
+        boundaries = _to_lonlat(boundaries)
+        geoms = np.asarray(boundaries.geometry.values)
+        levels = [
+            geoms if t <= 0 else shapely.simplify(geoms, t, preserve_topology=True)
+            for t in tolerances
+        ]
+        return SimplifiedBoundaries(
+            boundaries_station_ids(boundaries), levels, tolerances
+        )
+
+    def save(self, directory: str) -> None:
+        """Saves the levels of detail in a subdirectory of a (cache) directory"""
+        d = os.path.join(directory, LOD_SUBDIR)
+        os.makedirs(d, exist_ok=True)
+        for i, geoms in enumerate(self.levels):
+            write_wkb(os.path.join(d, "level_{0}.npz".format(i)), geoms)
+        with open(os.path.join(d, "levels.json"), "w") as f:
+            json.dump(
+                {
+                    "tolerances": self.tolerances,
+                    STATION_ID_VARNAME: self.station_ids.tolist(),
+                },
+                f,
+            )
+
+    @staticmethod
+    def exists(directory: str) -> bool:
+        """Whether levels of detail were saved in a (cache) directory"""
+        return os.path.exists(os.path.join(directory, LOD_SUBDIR, "levels.json"))
+
+    @staticmethod
+    def load(directory: str) -> "SimplifiedBoundaries":
+        """Loads levels of detail saved with `save`"""
+        d = os.path.join(directory, LOD_SUBDIR)
+        with open(os.path.join(d, "levels.json"), "r") as f:
+            desc = json.load(f)
+        levels = [
+            read_wkb(os.path.join(d, "level_{0}.npz".format(i)))
+            for i in range(len(desc["tolerances"]))
+        ]
+        return SimplifiedBoundaries(
+            desc[STATION_ID_VARNAME], levels, desc["tolerances"]
+        )
+
+    def level_for_zoom(self, zoom: float) -> int:
+        """Coarsest level of detail whose tolerance is less than about one pixel at a web map zoom level"""
+        pixel_size = 360.0 / (_TILE_SIZE_PX * 2.0**zoom)
+        ok = [i for i, t in enumerate(self.tolerances) if t <= pixel_size]
+        return max(ok) if len(ok) > 0 else 0
+
+    def intersecting(
+        self, bbox: Tuple[float, float, float, float], candidates: np.ndarray = None
+    ) -> np.ndarray:
+        """Indices of the catchments intersecting a bounding box (min lon, min lat, max lon, max lat)
+
+        Args:
+            bbox (Tuple[float, float, float, float]): (min lon, min lat, max lon, max lat)
+            candidates (np.ndarray, optional): indices of the catchments tested. Defaults to None, all catchments.
+
+        Returns:
+            np.ndarray: indices of the catchments, in increasing order
+        """
+        import shapely
+
+        xmin, ymin, xmax, ymax = bbox
+        if candidates is None:
+            candidates = np.arange(len(self.station_ids))
+        b = self._bounds[candidates]
+        candidates = candidates[
+            (b[:, 0] <= xmax)
+            & (b[:, 2] >= xmin)
+            & (b[:, 1] <= ymax)
+            & (b[:, 3] >= ymin)
+        ]
+        box = shapely.box(xmin, ymin, xmax, ymax)
+        keep = shapely.intersects(self.levels[0][candidates], box)
+        return candidates[keep]
+
+    def _features(self, level: int) -> List[str]:
+        """GeoJSON features of a level, serialised once"""
+        import shapely
+
+        if self._feature_json[level] is None:
+            geometries = shapely.to_geojson(self.levels[level])
+            self._feature_json[level] = [
+                '{{"type":"Feature","id":{0},"properties":{{"{1}":{0}}},"geometry":{2}}}'.format(
+                    json.dumps(s), STATION_ID_VARNAME, g
+                )
+                for s, g in zip(self.station_ids, geometries)
+            ]
+        return self._feature_json[level]
+
+    def _collection(self, level: int, indices: np.ndarray) -> str:
+        features = self._features(level)
+        return (
+            '{"type":"FeatureCollection","features":['
+            + ",".join([features[i] for i in indices])
+            + "]}"
+        )
+
+    def tile_geojson(self, z: int, x: int, y: int, level: int = None) -> str:
+        """GeoJSON of the catchments intersecting a web map tile, cached per (level, tile)
+
+        Args:
+            z (int): zoom level
+            x (int): tile column
+            y (int): tile row
+            level (int, optional): level of detail. Defaults to None, the level suited to the zoom level.
+
+        Returns:
+            str: GeoJSON FeatureCollection
+        """
+        if level is None:
+            level = self.level_for_zoom(z)
+        return self._tile(level, z, x, y)[1]
+
+    def _tile(self, level: int, z: int, x: int, y: int) -> Tuple[np.ndarray, str]:
+        # catchments intersecting a tile and their GeoJSON, in a bounded LRU cache
+        key = (level, z, x, y)
+        if key in self._tile_cache:
+            self._tile_cache.move_to_end(key)
+            return self._tile_cache[key]
+        indices = self.intersecting(tile_bounds(z, x, y))
+        entry = (indices, self._collection(level, indices))
+        self._tile_cache[key] = entry
+        while len(self._tile_cache) > self.max_cached_tiles:
+            self._tile_cache.popitem(last=False)
+        return entry
+
+    def geojson(
+        self, bbox: Tuple[float, float, float, float] = None, zoom: float = None
+    ) -> str:
+        """GeoJSON of the catchments intersecting a bounding box, simplified for a zoom level
+
+        Features are serialised once per level of detail and reused across queries. A bounding box is
+        answered from the cached web map tiles covering it, at the zoom level of `bbox_tile_zoom`,
+        so that repeated queries over the same area only test the catchments of those tiles.
+
+        Args:
+            bbox (Tuple[float, float, float, float], optional): (min lon, min lat, max lon, max lat). Defaults to None, all catchments.
+            zoom (float, optional): web map zoom level. Defaults to None, full resolution.
+
+        Returns:
+            str: GeoJSON FeatureCollection
+        """
+        level = 0 if zoom is None else self.level_for_zoom(zoom)
+        if bbox is None:
+            return self._collection(level, np.arange(len(self.station_ids)))
+        tiles = tiles_covering(bbox, bbox_tile_zoom(bbox))
+        candidates = np.unique(
+            np.concatenate(
+                [np.zeros(0, dtype=np.int64)]
+                + [self._tile(level, *t)[0] for t in tiles]
+            )
+        )
+        return self._collection(level, self.intersecting(bbox, candidates))
+
+
+EQUAL_AREA_CRS = "EPSG:3577"
+"""Australian Albers equal area projection, used to compute overlap fractions"""
+
+
+class CatchmentIndex:
+    """STRtree spatial index over the catchment boundaries, for batched point and polygon queries returning station identifiers"""
+
+    def __init__(
+        self, station_ids: np.ndarray, geoms: np.ndarray, crs="EPSG:4283"
+    ) -> None:
+        """Constructor
+
+        Args:
+            station_ids (np.ndarray): station identifiers of the catchments
+            geoms (np.ndarray): shapely polygons of the catchments, longitudes and latitudes
+            crs (optional): coordinate reference system of the geometries. Defaults to "EPSG:4283" (GDA94).
+        """
+        import shapely
+
+        self.station_ids = np.asarray(station_ids).astype(str)
+        self.geoms = np.asarray(geoms)
+        self.crs = crs
+        self.tree = shapely.STRtree(self.geoms)
+        self._areas = None
+
+    @staticmethod
+    def from_boundaries(boundaries) -> "CatchmentIndex":
+        """Index over catchment boundaries as in `CamelsAus.boundaries`"""
+        boundaries = _to_lonlat(boundaries)
+        crs = boundaries.crs if boundaries.crs is not None else "EPSG:4283"
+        return CatchmentIndex(
+            boundaries_station_ids(boundaries),
+            np.asarray(boundaries.geometry.values),
+            crs,
+        )
+
+    @staticmethod
+    def from_simplified(simplified: SimplifiedBoundaries) -> "CatchmentIndex":
+        """Index over the full resolution level of `SimplifiedBoundaries`, e.g. as read from the binary cache"""
+        return CatchmentIndex(simplified.station_ids, simplified.levels[0])
+
+    def _equal_area(self, geoms: np.ndarray):
+        import geopandas as gpd
+
+        return gpd.GeoSeries(geoms, crs=self.crs).to_crs(EQUAL_AREA_CRS)
+
+    def catchments_containing(self, lon: np.ndarray, lat: np.ndarray):
+        """Catchments containing each of a batch of points. Nested catchments mean a point can be in several catchments.
+
+        Args:
+            lon (np.ndarray): longitudes of the points
+            lat (np.ndarray): latitudes of the points
+
+        Returns:
+            pd.DataFrame: one row per (point, catchment) match, with columns `point` (index of the point) and `station_id`
+        """
+        import pandas as pd
+        import shapely
+
+        points = shapely.points(
+            np.asarray(lon, dtype=float), np.asarray(lat, dtype=float)
+        )
+        point_idx, tree_idx = self.tree.query(points, predicate="within")
+        return pd.DataFrame(
+            {"point": point_idx, STATION_ID_VARNAME: self.station_ids[tree_idx]}
+        )
+
+    def catchments_intersecting(self, geoms, overlap_fractions: bool = False):
+        """Catchments intersecting each of a batch of geometries, e.g. fire footprints
+
+        Args:
+            geoms: a shapely geometry, or an array of them, in longitudes and latitudes
+            overlap_fractions (bool, optional): also compute the fraction of each catchment area covered
+                by the geometry, in an equal area projection. Defaults to False.
+
+        Returns:
+            pd.DataFrame: one row per (geometry, catchment) match, with columns `geometry` (index of the geometry),
+                `station_id` and optionally `overlap_fraction`
+        """
+        import pandas as pd
+        import shapely
+
+        geoms = np.atleast_1d(np.asarray(geoms, dtype=object))
+        geom_idx, tree_idx = self.tree.query(geoms, predicate="intersects")
+        res = pd.DataFrame(
+            {"geometry": geom_idx, STATION_ID_VARNAME: self.station_ids[tree_idx]}
+        )
+        if overlap_fractions:
+            if self._areas is None:
+                self._areas = self._equal_area(self.geoms).area.values
+            overlap = shapely.intersection(geoms[geom_idx], self.geoms[tree_idx])
+            res["overlap_fraction"] = (
+                self._equal_area(overlap).area.values / self._areas[tree_idx]
+            )
+        return res
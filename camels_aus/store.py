@@ -0,0 +1,314 @@
+"""Content-addressed local store for several versions of the CAMELS-AUS dataset.
+
+Files are stored once under the SHA-256 hash of their content, so files identical across
+versions (official releases or locally patched variants) are deduplicated. Parsed binary
+forms of the daily series are keyed by the hash of their source file and the parsing parameters
+(type, missing value function, units): switching versions reuses the parsed form of every
+unchanged variable.
+
+Layout of the store root directory:
+
+* `objects/<hh>/<hash>`: file contents, read-only
+* `versions/<version>.json`: relative path to hash, for each file of a version
+* `parsed/<hash>/<variable>.<parameters>.npy` and `.json`: parsed daily series and their description
+* `checkouts/<version>/`: the directory tree of a version, made of hard links to the objects
+"""
+
+import hashlib
+import json
+import os
+import shutil
+import stat
+import tempfile
+from typing import Callable, Dict, List
+
+import numpy as np
+import pandas as pd
+import xarray as xr
+
+from .cache import decode_categories, encode_categories
+from .conventions import (
+    STATION_ID_VARNAME,
+    TIME_DIM_NAME,
+    check_camels_aus_version,
+    get_xr_units,
+    set_xr_units,
+)
+from .read import load_csv_stations_tseries
+
+OBJECTS_SUBDIR = "objects"
+VERSIONS_SUBDIR = "versions"
+PARSED_SUBDIR = "parsed"
+CHECKOUTS_SUBDIR = "checkouts"
+
+_HASH_BLOCK_SIZE = 1 << 20
+
+
+def file_hash(filename: str) -> str:
+    """SHA-256 hash of the content of a file, as a hexadecimal string"""
+    h = hashlib.sha256()
+    with open(filename, "rb") as f:
+        for block in iter(lambda: f.read(_HASH_BLOCK_SIZE), b""):
+            h.update(block)
+    return h.hexdigest()
+
+
+def _function_id(f: Callable) -> str:
+    # stable across processes: the qualified name and, for lambdas and closures, the code and captured values
+    if f is None:
+        return None
+    name = "{0}.{1}".format(
+        getattr(f, "__module__", None), getattr(f, "__qualname__", type(f).__name__)
+    )
+    code = getattr(f, "__code__", None)
+    if code is not None:
+        closure = [c.cell_contents for c in (f.__closure__ or [])]
+        content = code.co_code + repr((code.co_consts, closure)).encode()
+        name += ":" + hashlib.sha256(content).hexdigest()[:16]
+    return name
+
+
+def parse_parameters_key(
+    is_missing: Callable[[np.ndarray], np.ndarray] = None, units: str = None, dtype=None
+) -> str:
+    """Short hash of the parameters of `load_csv_stations_tseries`, part of the key of a parsed series"""
+    parameters = {
+        "dtype": None if dtype is None else np.dtype(dtype).str,
+        "is_missing": _function_id(is_missing),
+        "units": units,
+    }
+    content = json.dumps(parameters, sort_keys=True).encode()
+    return hashlib.sha256(content).hexdigest()[:16]
+
+
+def _atomic_write_json(filename: str, content) -> None:
+    fd, tmp_fn = tempfile.mkstemp(dir=os.path.dirname(filename), suffix=".tmp")
+    with os.fdopen(fd, "w") as f:
+        json.dump(content, f, indent=1)
+    os.replace(tmp_fn, filename)
+
+
+class ContentStore:
+    """A content-addressed store holding several versions of the CAMELS-AUS dataset, with deduplicated files and parsed caches"""
+
+    def __init__(self, root: str) -> None:
+        """Constructor
+
+        Args:
+            root (str): root directory of the store; created if it does not exist.
+        """
+        self.root = root
+        for d in [OBJECTS_SUBDIR, VERSIONS_SUBDIR, PARSED_SUBDIR, CHECKOUTS_SUBDIR]:
+            os.makedirs(os.path.join(root, d), exist_ok=True)
+
+    def object_path(self, h: str) -> str:
+        """Path of the stored content with a given hash"""
+        return os.path.join(self.root, OBJECTS_SUBDIR, h[:2], h)
+
+    def _version_fn(self, version: str) -> str:
+        return os.path.join(self.root, VERSIONS_SUBDIR, version + ".json")
+
+    def versions(self) -> List[str]:
+        """Version labels registered in the store"""
+        d = os.path.join(self.root, VERSIONS_SUBDIR)
+        return sorted(
+            [os.path.splitext(f)[0] for f in os.listdir(d) if f.endswith(".json")]
+        )
+
+    def files(self, version: str) -> Dict[str, str]:
+        """Files of a version of the dataset
+
+        Args:
+            version (str): version label
+
+        Raises:
+            KeyError: unknown version
+
+        Returns:
+            Dict[str, str]: hash of the content of each file, by path relative to the dataset root
+        """
+        fn = self._version_fn(version)
+        if not os.path.exists(fn):
+            raise KeyError(
+                "Version {0} not found in store {1}; known versions: {2}".format(
+                    version, self.root, self.versions()
+                )
+            )
+        with open(fn, "r") as f:
+            return json.load(f)["files"]
+
+    def add_file(self, filename: str) -> str:
+        """Adds a file to the store, unless identical content is already stored
+
+        Args:
+            filename (str): file to add
+
+        Returns:
+            str: hash of the file content
+        """
+        h = file_hash(filename)
+        dest = self.object_path(h)
+        if not os.path.exists(dest):
+            os.makedirs(os.path.dirname(dest), exist_ok=True)
+            fd, tmp_fn = tempfile.mkstemp(dir=os.path.dirname(dest), suffix=".tmp")
+            os.close(fd)
+            shutil.copyfile(filename, tmp_fn)
+            os.chmod(tmp_fn, stat.S_IRUSR | stat.S_IRGRP | stat.S_IROTH)
+            os.replace(tmp_fn, dest)
+        return h
+
+    def add_directory(
+        self, version: str, directory: str, format_version: str = "1.0"
+    ) -> Dict[str, str]:
+        """Registers a directory tree, e.g. a download extracted by `download_camels_aus`, as a version of the dataset
+
+        Args:
+            version (str): version label, e.g. '1.0' or '1.0-patched-2021'
+            directory (str): root directory of the dataset files
+            format_version (str, optional): CAMELS-AUS release whose file layout the directory follows. Defaults to '1.0'.
+
+        Returns:
+            Dict[str, str]: hash of each file, by path relative to the dataset root
+        """
+        check_camels_aus_version(format_version)
+        if not os.path.exists(directory):
+            raise FileNotFoundError("Directory {0} not found".format(directory))
+        files = {}
+        for parent, _, filenames in os.walk(directory):
+            for fn in filenames:
+                full_fn = os.path.join(parent, fn)
+                rel_fn = os.path.relpath(full_fn, directory).replace(os.sep, "/")
+                files[rel_fn] = self.add_file(full_fn)
+        _atomic_write_json(
+            self._version_fn(version),
+            {"format_version": format_version, "files": files},
+        )
+        checkout_dir = self._checkout_dir(version)
+        if os.path.exists(checkout_dir):
+            shutil.rmtree(checkout_dir)
+        return files
+
+    def _checkout_dir(self, version: str) -> str:
+        return os.path.join(self.root, CHECKOUTS_SUBDIR, version)
+
+    def checkout(self, version: str) -> str:
+        """Directory tree of a version of the dataset, made of hard links to the stored objects
+
+        Args:
+            version (str): version label
+
+        Returns:
+            str: root directory of the dataset, in the layout expected by `CamelsAus.load_from_text_files`
+        """
+        files = self.files(version)
+        checkout_dir = self._checkout_dir(version)
+        for rel_fn, h in files.items():
+            dest = os.path.join(checkout_dir, *rel_fn.split("/"))
+            if os.path.exists(dest):
+                continue
+            os.makedirs(os.path.dirname(dest), exist_ok=True)
+            try:
+                os.link(self.object_path(h), dest)
+            except OSError:
+                shutil.copyfile(self.object_path(h), dest)
+        return checkout_dir
+
+    def hash_of(self, version: str, filename: str) -> str:
+        """Hash of a file of a version, given its path in the checkout directory or relative to the dataset root"""
+        checkout_dir = os.path.abspath(self._checkout_dir(version))
+        full_fn = os.path.abspath(filename)
+        if full_fn.startswith(checkout_dir + os.sep):
+            filename = os.path.relpath(full_fn, checkout_dir)
+        return self.files(version)[filename.replace(os.sep, "/")]
+
+    def _parsed_fn(self, h: str, varname: str, parameters: str) -> str:
+        return os.path.join(
+            self.root, PARSED_SUBDIR, h, "{0}.{1}".format(varname, parameters)
+        )
+
+    def load_time_series(
+        self,
+        version: str,
+        filename: str,
+        is_missing: Callable[[np.ndarray], np.ndarray] = None,
+        units: str = None,
+        dtype=None,
+    ) -> xr.DataArray:
+        """Loads a daily series of a version, from the parsed cache keyed by the hash of its source file if available
+
+        The first load of a given file content with given parameters parses the CSV file and stores the parsed form.
+
+        Args:
+            version (str): version label
+            filename (str): path of the CSV file in the checkout directory, or relative to the dataset root
+            is_missing (Callable[[np.ndarray], np.ndarray], optional): see `load_csv_stations_tseries`. Defaults to None.
+            units (str, optional): units of the time series. Defaults to None.
+            dtype ([type], optional): see `load_csv_stations_tseries`. Defaults to None.
+
+        Returns:
+            xr.DataArray: A multivariate time series, xarray of dimension 2 (time X stations)
+        """
+        h = self.hash_of(version, filename)
+        varname = os.path.splitext(os.path.basename(filename))[0]
+        parsed_fn = self._parsed_fn(
+            h, varname, parse_parameters_key(is_missing, units, dtype)
+        )
+        if os.path.exists(parsed_fn + ".json"):
+            return self._read_parsed(parsed_fn)
+        tseries = load_csv_stations_tseries(
+            self.object_path(h), is_missing=is_missing, units=units, dtype=dtype
+        )
+        self._write_parsed(parsed_fn, tseries)
+        return tseries
+
+    def _write_parsed(self, parsed_fn: str, tseries: xr.DataArray) -> None:
+        time = pd.DatetimeIndex(tseries[TIME_DIM_NAME].values)
+        if not (time == pd.date_range(time[0], periods=len(time), freq="D")).all():
+            # only contiguous daily series are cached
+            return
+        os.makedirs(os.path.dirname(parsed_fn), exist_ok=True)
+        desc = {
+            "units": get_xr_units(tseries),
+            "time": [str(t.date()) for t in time[[0, -1]]],
+            "length": len(time),
+            STATION_ID_VARNAME: [str(s) for s in tseries[STATION_ID_VARNAME].values],
+        }
+        values = tseries.values
+        if values.dtype.kind == "O":
+            values, desc["categories"] = encode_categories(values, [])
+        fd, tmp_fn = tempfile.mkstemp(dir=os.path.dirname(parsed_fn), suffix=".npy")
+        with os.fdopen(fd, "wb") as f:
+            np.save(f, values)
+        os.replace(tmp_fn, parsed_fn + ".npy")
+        # the description is written last: its presence marks a complete entry
+        _atomic_write_json(parsed_fn + ".json", desc)
+
+    def _read_parsed(self, parsed_fn: str) -> xr.DataArray:
+        with open(parsed_fn + ".json", "r") as f:
+            desc = json.load(f)
+        values = np.load(parsed_fn + ".npy")
+        if "categories" in desc:
+            values = decode_categories(values, desc["categories"])
+        start = np.datetime64(desc["time"][0], "D")
+        time = pd.DatetimeIndex(start + np.arange(desc["length"]))
+        res = xr.DataArray(
+            values,
+            coords={
+                TIME_DIM_NAME: time,
+                STATION_ID_VARNAME: np.array(desc[STATION_ID_VARNAME], dtype=object),
+            },
+            dims=[TIME_DIM_NAME, STATION_ID_VARNAME],
+        )
+        set_xr_units(res, desc["units"] or None)
+        return res
+
+    def usage(self) -> Dict[str, int]:
+        """Disk usage of the store: bytes of unique stored objects, and bytes the registered versions would take without deduplication"""
+        unique = {}
+        total = 0
+        for v in self.versions():
+            for h in self.files(v).values():
+                if not h in unique:
+                    unique[h] = os.path.getsize(self.object_path(h))
+                total += unique[h]
+        return {"stored_bytes": sum(unique.values()), "logical_bytes": total}
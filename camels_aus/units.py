@@ -0,0 +1,171 @@
+"""Conversion of the daily series to other units, as lazily scaled views.
+
+A conversion is linear: `converted = factor * value + offset`, where the factor may vary per
+station (depths of runoff to volumes use the catchment area). Views apply it to the days and
+stations requested only, so that no second copy of a series is stored per unit.
+
+Supported families of units, the first listed being the reference of the family:
+
+* flows: "ML/d", "mm/d" (also "mm", the units of the daily streamflow), "m^3/s" ("m3/s"), "L/s", "GL/d"
+* temperatures: "K", "°C" ("degC")
+* pressures: "Pa", "hPa", "kPa"
+* daily radiation: "MJ/m^2", "W/m^2" (daily mean)
+"""
+
+from typing import List, Tuple
+
+import numpy as np
+
+from .conventions import (
+    CATCHMENT_AREA_VARNAME,
+    STATION_ID_VARNAME,
+    TIME_DIM_NAME,
+    get_xr_units,
+    set_xr_units,
+)
+
+AREA_SCALED = "area"
+"""Scale of depths of runoff, by the catchment area in km^2: 1 mm over 1 km^2 is 1 ML"""
+
+UNIT_DEFINITIONS = {
+    "ML/d": ("flow", 1.0, 0.0),
+    "mm/d": ("flow", AREA_SCALED, 0.0),
+    "mm": ("flow", AREA_SCALED, 0.0),
+    "m^3/s": ("flow", 86.4, 0.0),
+    "m3/s": ("flow", 86.4, 0.0),
+    "L/s": ("flow", 0.0864, 0.0),
+    "GL/d": ("flow", 1000.0, 0.0),
+    "K": ("temperature", 1.0, 0.0),
+    "°C": ("temperature", 1.0, 273.15),
+    "degC": ("temperature", 1.0, 273.15),
+    "Pa": ("pressure", 1.0, 0.0),
+    "hPa": ("pressure", 100.0, 0.0),
+    "kPa": ("pressure", 1000.0, 0.0),
+    "MJ/m^2": ("radiation", 1.0, 0.0),
+    "W/m^2": ("radiation", 0.0864, 0.0),
+}
+"""Units as (family, scale to the reference units of the family, offset to the reference units)"""
+
+
+def conversion(
+    from_units: str, to_units: str, catchment_area: np.ndarray = None
+) -> Tuple:
+    """Factor and offset converting values between units: `to = factor * from + offset`
+
+    Args:
+        from_units (str): units of the values
+        to_units (str): target units
+        catchment_area (np.ndarray, optional): catchment areas in km^2, one per station; required
+            between depths and volumes of runoff. Defaults to None.
+
+    Raises:
+        KeyError: unknown units
+        ValueError: units of different families, or catchment areas missing
+
+    Returns:
+        Tuple[Union[float, np.ndarray], float]: factor, per station if scaled by the catchment area, and offset
+    """
+    for u in [from_units, to_units]:
+        if not u in UNIT_DEFINITIONS:
+            raise KeyError(
+                "Unknown units '{0}', supported units are {1}".format(
+                    u, list(UNIT_DEFINITIONS.keys())
+                )
+            )
+    family_from, scale_from, offset_from = UNIT_DEFINITIONS[from_units]
+    family_to, scale_to, offset_to = UNIT_DEFINITIONS[to_units]
+    if family_from != family_to:
+        raise ValueError("Cannot convert {0} to {1}".format(from_units, to_units))
+    if scale_from == AREA_SCALED and scale_to == AREA_SCALED:
+        scale_from = scale_to = 1.0
+    scales = []
+    for s in [scale_from, scale_to]:
+        if s == AREA_SCALED:
+            if catchment_area is None:
+                raise ValueError(
+                    "Catchment areas are needed to convert {0} to {1}".format(
+                        from_units, to_units
+                    )
+                )
+            s = np.asarray(catchment_area, dtype=np.float64)
+        scales.append(s)
+    scale_from, scale_to = scales
+    return scale_from / scale_to, (offset_from - offset_to) / scale_to
+
+
+class ScaledView:
+    """A daily series seen in other units; values are converted when accessed, for the requested subset only"""
+
+    def __init__(self, data, factor, offset: float, units: str) -> None:
+        """Constructor
+
+        Args:
+            data (xr.DataArray): daily series, dimensions (time, station_id)
+            factor (Union[float, np.ndarray]): scaling factor, or one per station
+            offset (float): offset added after scaling
+            units (str): units of the converted values
+        """
+        self.data = data.transpose(TIME_DIM_NAME, STATION_ID_VARNAME)
+        self.factor = np.broadcast_to(
+            np.asarray(factor, dtype=np.float64), (self.data.shape[1],)
+        )
+        self.offset = offset
+        self.units = units
+
+    @property
+    def shape(self) -> Tuple[int, int]:
+        return self.data.shape
+
+    def _convert(self, x: np.ndarray, cols) -> np.ndarray:
+        return np.asarray(x, dtype=np.float64) * self.factor[cols] + self.offset
+
+    def sel(self, station_ids: List[str] = None, start=None, end=None):
+        """Converted values for some stations and a period
+
+        Args:
+            station_ids (List[str], optional): stations. Defaults to None, all stations.
+            start (optional): first day. Defaults to None.
+            end (optional): last day, inclusive. Defaults to None.
+
+        Returns:
+            xr.DataArray: converted values, with their units set
+        """
+        rows = self.data.indexes[TIME_DIM_NAME].slice_indexer(start, end)
+        cols = slice(None)
+        if station_ids is not None:
+            cols = self.data.indexes[STATION_ID_VARNAME].get_indexer(station_ids)
+            if (cols < 0).any():
+                raise KeyError("Unknown stations in {0}".format(station_ids))
+        x = self.data[rows, cols]
+        res = x.copy(data=self._convert(x.values, cols))
+        set_xr_units(res, self.units)
+        return res
+
+    @property
+    def values(self) -> np.ndarray:
+        """Converted values of all stations and days"""
+        return self._convert(self.data.values, slice(None))
+
+    def __getitem__(self, key) -> np.ndarray:
+        # positional indexing, e.g. view[:, 3] or view[100:200]
+        cols = key[1] if isinstance(key, tuple) and len(key) > 1 else slice(None)
+        rows = key[0] if isinstance(key, tuple) else key
+        return self._convert(self.data.values[rows, cols], cols)
+
+
+def converted_view(ds, varname: str, units: str) -> ScaledView:
+    """A daily series of a dataset in other units
+
+    Args:
+        ds (xr.Dataset): dataset, typically `CamelsAus.data`
+        varname (str): daily series
+        units (str): target units, see `UNIT_DEFINITIONS`
+
+    Returns:
+        ScaledView: converted view
+    """
+    da = ds[varname]
+    from_units = get_xr_units(da)
+    area = ds[CATCHMENT_AREA_VARNAME].values if CATCHMENT_AREA_VARNAME in ds else None
+    factor, offset = conversion(from_units, units, area)
+    return ScaledView(da, factor, offset, units)
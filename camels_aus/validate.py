@@ -0,0 +1,430 @@
+"""Integrity validation of a CAMELS-AUS dataset directory, before it is loaded.
+
+Checks, from the cheapest to the most expensive:
+
+* presence: all the files read by `CamelsAus.load_from_text_files` exist
+* checksums: SHA-256 digests of the files match expected digests, if given
+* headers: the columns of the station tables and daily files, read from their first line only
+* stations: the stations of every table and daily file are those of the metadata table
+* time axes: the days of each daily file are contiguous, and the same in all daily files
+* values: daily values outside the plausible range of each variable, other than the missing value codes
+
+The time axes and values are checked on whole arrays per file; the value checks, which read
+the files entirely, can be skipped. Problems are collected in a `ValidationReport` rather than
+raised, so that an ingest pipeline can report all the problems of a data drop at once.
+"""
+
+import hashlib
+import json
+import os
+from typing import Dict, List
+
+import numpy as np
+
+from .conventions import (
+    ET_MORTON_ACTUAL_SILO_VARNAME,
+    PRECIPITATION_AWAP_VARNAME,
+    SOLARRAD_AWAP_VARNAME,
+    STATION_ID_VARNAME,
+    STREAMFLOW_MMD_VARNAME,
+    TMAX_AWAP_VARNAME,
+    TMIN_AWAP_VARNAME,
+    VPRP_AWAP_VARNAME,
+    anthropogenicinfluences_attributes_names,
+    geology_attributes_names,
+    landcover_attributes_names,
+    location_boundary_names,
+    metadata_names,
+    other_attributes_names,
+    streamflow_gaugingstats_names,
+    topography_attributes_names,
+)
+
+DATE_COLUMNS = ["year", "month", "day"]
+
+METADATA_FILE = os.path.join("01_id_name_metadata", "id_name_metadata.csv")
+
+BOUNDARIES_FILE = os.path.join(
+    "02_location_boundary_area", "shp", "CAMELS_AUS_Boundaries_adopted.shp"
+)
+
+MISSING_VALUE_CODES = [-99.99]
+"""Values denoting missing data in the daily files, excluded from the range checks"""
+
+VALUE_RANGES = {
+    STREAMFLOW_MMD_VARNAME: (0.0, 1000.0),
+    PRECIPITATION_AWAP_VARNAME: (0.0, 1000.0),
+    ET_MORTON_ACTUAL_SILO_VARNAME: (0.0, 30.0),
+    SOLARRAD_AWAP_VARNAME: (0.0, 50.0),
+    TMAX_AWAP_VARNAME: (-20.0, 60.0),
+    TMIN_AWAP_VARNAME: (-30.0, 50.0),
+    VPRP_AWAP_VARNAME: (0.0, 60.0),
+}
+"""Plausible (minimum, maximum) of the daily values of each numeric daily variable, in the units of the files"""
+
+ERROR = "error"
+WARNING = "warning"
+
+
+def station_tables() -> Dict[str, List[str]]:
+    """Relative paths of the station tables, and the columns expected in each"""
+    attributes_dir = "04_attributes"
+    return {
+        METADATA_FILE: metadata_names(),
+        os.path.join(
+            "02_location_boundary_area", "location_boundary_area.csv"
+        ): location_boundary_names(),
+        os.path.join(
+            attributes_dir, "CatchmentAttributes_01_Geology&Soils.csv"
+        ): geology_attributes_names(),
+        os.path.join(
+            attributes_dir, "CatchmentAttributes_02_Topography&Geometry.csv"
+        ): topography_attributes_names(),
+        os.path.join(
+            attributes_dir, "CatchmentAttributes_03_LandCover&Vegetation.csv"
+        ): landcover_attributes_names(),
+        os.path.join(
+            attributes_dir, "CatchmentAttributes_04_AnthropogenicInfluences.csv"
+        ): anthropogenicinfluences_attributes_names(),
+        os.path.join(
+            attributes_dir, "CatchmentAttributes_05_Other.csv"
+        ): other_attributes_names(),
+        os.path.join(
+            "03_streamflow", "streamflow_GaugingStats.csv"
+        ): streamflow_gaugingstats_names(),
+    }
+
+
+def daily_files() -> Dict[str, str]:
+    """Relative paths of the daily files, by variable name"""
+    from .read import daily_series_sources
+
+    return dict(
+        [
+            (v, os.path.join(rel_dir, fn))
+            for v, (rel_dir, fn, _, _, _) in daily_series_sources().items()
+        ]
+    )
+
+
+def expected_files() -> List[str]:
+    """Relative paths of all the files read when loading the dataset"""
+    return (
+        list(station_tables().keys()) + list(daily_files().values()) + [BOUNDARIES_FILE]
+    )
+
+
+def file_checksum(filename: str) -> str:
+    """SHA-256 digest of a file, as a hexadecimal string"""
+    h = hashlib.sha256()
+    with open(filename, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            h.update(block)
+    return h.hexdigest()
+
+
+def compute_checksums(directory: str, files: List[str] = None) -> Dict[str, str]:
+    """SHA-256 digests of the files of a dataset directory, by relative path
+
+    Args:
+        directory (str): dataset directory
+        files (List[str], optional): relative paths. Defaults to None, the files of `expected_files`.
+
+    Returns:
+        Dict[str, str]: digests of the files present, with '/' separated relative paths
+    """
+    files = expected_files() if files is None else files
+    return dict(
+        [
+            (f.replace(os.sep, "/"), file_checksum(os.path.join(directory, f)))
+            for f in files
+            if os.path.exists(os.path.join(directory, f))
+        ]
+    )
+
+
+class ValidationReport:
+    """Problems found in a dataset directory, and the checks run"""
+
+    def __init__(self, directory: str) -> None:
+        self.directory = directory
+        self.issues = []
+        self.checks = []
+
+    def add(
+        self,
+        check: str,
+        message: str,
+        filename: str = None,
+        variable: str = None,
+        severity: str = ERROR,
+    ) -> None:
+        """Records a problem found by a check"""
+        self.issues.append(
+            {
+                "check": check,
+                "severity": severity,
+                "file": None if filename is None else filename.replace(os.sep, "/"),
+                "variable": variable,
+                "message": message,
+            }
+        )
+
+    @property
+    def ok(self) -> bool:
+        """Whether no error was found; warnings do not fail a validation"""
+        return not any([i["severity"] == ERROR for i in self.issues])
+
+    def errors(self) -> List[Dict]:
+        return [i for i in self.issues if i["severity"] == ERROR]
+
+    def to_dict(self) -> Dict:
+        return {
+            "directory": self.directory,
+            "ok": self.ok,
+            "checks": self.checks,
+            "issues": self.issues,
+        }
+
+    def to_frame(self):
+        """Issues as a data frame, one row per issue"""
+        import pandas as pd
+
+        return pd.DataFrame(
+            self.issues, columns=["check", "severity", "file", "variable", "message"]
+        )
+
+
+def _read_header(filename: str) -> List[str]:
+    with open(filename, "r", encoding="utf-8-sig") as f:
+        line = f.readline()
+    return [c.strip().strip('"') for c in line.rstrip("\r\n").split(",")]
+
+
+def _check_station_tables(report: ValidationReport, directory: str):
+    import pandas as pd
+
+    report.checks.append("headers")
+    reference = None
+    tables = station_tables()
+    for rel, colnames in tables.items():
+        fn = os.path.join(directory, rel)
+        if not os.path.exists(fn):
+            continue
+        header = _read_header(fn)
+        missing = [c for c in [STATION_ID_VARNAME] + colnames if not c in header]
+        if len(missing) > 0:
+            report.add("headers", "missing columns {0}".format(missing), rel)
+        if STATION_ID_VARNAME in missing:
+            continue
+        stations = pd.read_csv(fn, usecols=[STATION_ID_VARNAME], dtype=str)[
+            STATION_ID_VARNAME
+        ].values
+        if len(np.unique(stations)) != len(stations):
+            report.add("stations", "duplicated station identifiers", rel)
+        if rel == METADATA_FILE:
+            reference = stations
+    if reference is None:
+        return None
+    report.checks.append("stations")
+    for rel in tables.keys():
+        fn = os.path.join(directory, rel)
+        if rel == METADATA_FILE or not os.path.exists(fn):
+            continue
+        if not STATION_ID_VARNAME in _read_header(fn):
+            continue
+        stations = pd.read_csv(fn, usecols=[STATION_ID_VARNAME], dtype=str)[
+            STATION_ID_VARNAME
+        ].values
+        _compare_stations(report, rel, None, stations, reference)
+    return reference
+
+
+def _compare_stations(report, rel, variable, stations, reference) -> None:
+    extra = np.setdiff1d(stations, reference)
+    absent = np.setdiff1d(reference, stations)
+    if len(extra) > 0 or len(absent) > 0:
+        report.add(
+            "stations",
+            "stations differ from the metadata: {0} not in the metadata, {1} absent".format(
+                extra.tolist(), absent.tolist()
+            ),
+            rel,
+            variable,
+        )
+    elif (np.asarray(stations) != np.asarray(reference)).any():
+        report.add(
+            "stations",
+            "stations in a different order than in the metadata",
+            rel,
+            variable,
+            severity=WARNING,
+        )
+
+
+def _check_daily_files(
+    report: ValidationReport, directory: str, reference, values: bool
+) -> None:
+    import pandas as pd
+
+    report.checks += ["headers", "time"] + (["values"] if values else [])
+    headers = {}
+    time_axis = None
+    time_file = None
+    for v, rel in daily_files().items():
+        fn = os.path.join(directory, rel)
+        if not os.path.exists(fn):
+            continue
+        header = _read_header(fn)
+        if header[:3] != DATE_COLUMNS:
+            report.add(
+                "headers",
+                "the first columns are {0}, expected {1}".format(
+                    header[:3], DATE_COLUMNS
+                ),
+                rel,
+                v,
+            )
+            continue
+        stations = header[3:]
+        if len(set(stations)) != len(stations):
+            report.add("headers", "duplicated station columns", rel, v)
+        headers[v] = stations
+        if reference is not None:
+            _compare_stations(report, rel, v, np.array(stations), reference)
+
+        read_values = values and v in VALUE_RANGES
+        df = pd.read_csv(fn, usecols=None if read_values else DATE_COLUMNS)
+        ymd = df[DATE_COLUMNS]
+        if ymd.isna().any().any():
+            report.add("time", "missing dates", rel, v)
+            continue
+        try:
+            days = pd.to_datetime(ymd).values.astype("datetime64[D]")
+        except ValueError as e:
+            report.add("time", "invalid dates: {0}".format(e), rel, v)
+            continue
+        steps = np.diff(days).astype(np.int64)
+        if len(steps) > 0 and (steps != 1).any():
+            bad = np.nonzero(steps != 1)[0]
+            report.add(
+                "time",
+                "{0} breaks in the daily time axis, the first after {1}".format(
+                    len(bad), days[bad[0]]
+                ),
+                rel,
+                v,
+            )
+        if time_axis is None:
+            time_axis, time_file = days, rel
+        elif len(days) != len(time_axis) or (days != time_axis).any():
+            report.add(
+                "time",
+                "time axis {0} to {1} ({2} days) differs from {3}".format(
+                    days[0], days[-1], len(days), time_file.replace(os.sep, "/")
+                ),
+                rel,
+                v,
+            )
+        if read_values:
+            x = _parse_values(report, rel, v, df, stations)
+            _check_values(report, rel, v, x, stations)
+    if len(headers) > 1:
+        first = list(headers.values())[0]
+        for v, h in headers.items():
+            if h != first and reference is None:
+                report.add(
+                    "headers",
+                    "station columns differ from those of the other daily files",
+                    daily_files()[v],
+                    v,
+                )
+
+
+def _parse_values(report, rel, v, df, stations: List[str]) -> np.ndarray:
+    # non-numeric cells are reported, and checked no further as missing values
+    import pandas as pd
+
+    x = np.empty((len(df), len(stations)), dtype=np.float64)
+    for j, s in enumerate(stations):
+        x[:, j] = pd.to_numeric(df[s], errors="coerce").values
+    unparseable = np.isnan(x) & df[stations].notna().values
+    n = unparseable.sum(axis=0)
+    if n.sum() > 0:
+        worst = [stations[j] for j in np.argsort(-n)[:3] if n[j] > 0]
+        report.add(
+            "values",
+            "{0} values are not numbers, mostly for stations {1}".format(
+                int(n.sum()), worst
+            ),
+            rel,
+            v,
+        )
+    return x
+
+
+def _check_values(report, rel, v, x: np.ndarray, stations: List[str]) -> None:
+    low, high = VALUE_RANGES[v]
+    missing_code = np.isin(x, MISSING_VALUE_CODES)
+    with np.errstate(invalid="ignore"):
+        outside = ~missing_code & ((x < low) | (x > high))
+    outside |= np.isinf(x)
+    n = outside.sum(axis=0)
+    if n.sum() > 0:
+        worst = [stations[j] for j in np.argsort(-n)[:3] if n[j] > 0]
+        report.add(
+            "values",
+            "{0} values outside [{1}, {2}], mostly for stations {3}".format(
+                int(n.sum()), low, high, worst
+            ),
+            rel,
+            v,
+        )
+
+
+def validate_directory(
+    directory: str, checksums: Dict[str, str] = None, values: bool = True
+) -> ValidationReport:
+    """Validates a dataset directory in the reference (CSV) form, without loading it
+
+    Args:
+        directory (str): dataset directory, as downloaded and extracted
+        checksums (Dict[str, str], optional): expected SHA-256 digests by relative path, e.g. from `compute_checksums`
+            on a known good copy. Defaults to None, no checksum verification.
+        values (bool, optional): check the ranges of the daily values, reading the daily files entirely. Defaults to True.
+
+    Returns:
+        ValidationReport: problems found; `report.ok` is False if any error was found
+    """
+    report = ValidationReport(directory)
+    report.checks.append("presence")
+    if not os.path.isdir(directory):
+        report.add("presence", "directory {0} not found".format(directory))
+        return report
+    for rel in expected_files():
+        if not os.path.exists(os.path.join(directory, rel)):
+            report.add("presence", "file not found", rel)
+    if checksums is not None:
+        report.checks.append("checksums")
+        for rel, expected in checksums.items():
+            fn = os.path.join(directory, *rel.split("/"))
+            if not os.path.exists(fn):
+                report.add("checksums", "file not found", rel)
+            elif file_checksum(fn) != expected:
+                report.add("checksums", "checksum mismatch", rel)
+    reference = _check_station_tables(report, directory)
+    _check_daily_files(report, directory, reference, values)
+    report.checks = list(dict.fromkeys(report.checks))
+    return report
+
+
+def load_checksums(filename: str) -> Dict[str, str]:
+    """Expected checksums from a JSON file, as written by `save_checksums`"""
+    with open(filename, "r") as f:
+        return json.load(f)
+
+
+def save_checksums(filename: str, checksums: Dict[str, str]) -> None:
+    """Saves checksums to a JSON file"""
+    with open(filename, "w") as f:
+        json.dump(checksums, f, indent=1, sort_keys=True)
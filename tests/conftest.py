@@ -0,0 +1,196 @@
+"""Shared fixtures: a small synthetic dataset laid out like CAMELS-AUS 1.0 on disk"""
+
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from camels_aus.conventions import (
+    anthropogenicinfluences_attributes_names,
+    geology_attributes_names,
+    landcover_attributes_names,
+    location_boundary_names,
+    other_attributes_names,
+    streamflow_gaugingstats_names,
+    topography_attributes_names,
+)
+
+STATION_IDS = ["102101A", "105101A", "912101A", "A5030502", "G0010005"]
+DRAINAGE_DIVISIONS = [
+    "North East Coast",
+    "North East Coast",
+    "Carpentaria Coast",
+    "South Australian Gulf",
+    "South Australian Gulf",
+]
+START_DATE = pd.Timestamp("2000-01-01")
+N_DAYS = 3 * 365 + 1
+
+DAILY_FILES = [
+    ("03_streamflow", "streamflow_mmd.csv"),
+    ("05_hydrometeorology/01_precipitation_timeseries", "precipitation_AWAP.csv"),
+    (
+        "05_hydrometeorology/02_EvaporativeDemand_timeseries",
+        "et_morton_actual_SILO.csv",
+    ),
+    ("05_hydrometeorology/03_Other/AWAP", "solarrad_AWAP.csv"),
+    ("05_hydrometeorology/03_Other/AWAP", "tmax_AWAP.csv"),
+    ("05_hydrometeorology/03_Other/AWAP", "tmin_AWAP.csv"),
+    ("05_hydrometeorology/03_Other/AWAP", "vprp_AWAP.csv"),
+]
+
+
+def _daily_frame(dates: pd.DatetimeIndex, values: np.ndarray) -> pd.DataFrame:
+    df = pd.DataFrame({"year": dates.year, "month": dates.month, "day": dates.day})
+    for i, s in enumerate(STATION_IDS):
+        df[s] = values[:, i]
+    return df
+
+
+def _daily_values(rng, fn: str, n: int) -> np.ndarray:
+    shape = (n, len(STATION_IDS))
+    if fn == "streamflow_mmd.csv":
+        x = rng.gamma(0.5, 2.0, size=shape).round(3)
+        x[rng.random(shape) < 0.05] = -99.99
+        x[100:130, 0] = -99.99
+        return x
+    if fn == "precipitation_AWAP.csv":
+        x = rng.gamma(0.3, 8.0, size=shape).round(2)
+        x[rng.random(shape) < 0.4] = 0.0
+        return x
+    if fn.startswith("tmax"):
+        return rng.normal(25.0, 5.0, size=shape).round(2)
+    if fn.startswith("tmin"):
+        return rng.normal(12.0, 4.0, size=shape).round(2)
+    return rng.uniform(1.0, 30.0, size=shape).round(2)
+
+
+def _quality_codes(rng, n: int) -> np.ndarray:
+    codes = np.array(["A", "B", "E", "Q", "M"])
+    return codes[
+        rng.choice(5, size=(n, len(STATION_IDS)), p=[0.7, 0.1, 0.1, 0.05, 0.05])
+    ]
+
+
+def _station_table(rng, colnames) -> pd.DataFrame:
+    df = pd.DataFrame({"station_id": STATION_IDS})
+    for c in colnames:
+        df[c] = rng.uniform(0.0, 1.0, size=len(STATION_IDS)).round(4)
+    return df
+
+
+def write_daily_files(directory: str, start: pd.Timestamp, n_days: int, seed: int = 42):
+    """Writes the daily CSV files of the synthetic dataset, for days `start` onwards"""
+    rng = np.random.default_rng(seed)
+    dates = pd.date_range(start, periods=n_days, freq="D")
+    for subdir, fn in DAILY_FILES:
+        d = os.path.join(directory, subdir)
+        os.makedirs(d, exist_ok=True)
+        _daily_frame(dates, _daily_values(rng, fn, n_days)).to_csv(
+            os.path.join(d, fn), index=False
+        )
+    _daily_frame(dates, _quality_codes(rng, n_days)).to_csv(
+        os.path.join(directory, "03_streamflow", "streamflow_QualityCodes.csv"),
+        index=False,
+    )
+
+
+def write_synthetic_camels(directory: str, n_days: int = N_DAYS, seed: int = 42) -> str:
+    """Writes a small dataset with the directory layout and file formats of CAMELS-AUS 1.0"""
+    import geopandas as gpd
+    from shapely.geometry import box
+
+    rng = np.random.default_rng(seed)
+    write_daily_files(directory, START_DATE, n_days, seed)
+
+    d = os.path.join(directory, "01_id_name_metadata")
+    os.makedirs(d, exist_ok=True)
+    pd.DataFrame(
+        {
+            "station_id": STATION_IDS,
+            "station_name": ["Station {0}".format(s) for s in STATION_IDS],
+            "drainage_division": DRAINAGE_DIVISIONS,
+            "river_region": [
+                "Region {0}".format(i % 3) for i in range(len(STATION_IDS))
+            ],
+            "notes": [np.nan, "some note", np.nan, np.nan, "other note"],
+        }
+    ).to_csv(os.path.join(d, "id_name_metadata.csv"), index=False)
+
+    d = os.path.join(directory, "02_location_boundary_area")
+    os.makedirs(os.path.join(d, "shp"), exist_ok=True)
+    lba = _station_table(rng, location_boundary_names())
+    lons = 140.0 + np.arange(len(STATION_IDS)) * 1.5
+    lats = np.full(len(STATION_IDS), -30.0)
+    lba["long_outlet"] = lons
+    lba["lat_outlet"] = lats
+    lba["long_centroid"] = lons + 0.5
+    lba["lat_centroid"] = lats + 0.5
+    lba["catchment_area"] = [100.0, 250.0, 1000.0, 50.0, 400.0]
+    lba["map_zone"] = [54, 55, 53, 54, 54]
+    lba.to_csv(os.path.join(d, "location_boundary_area.csv"), index=False)
+    geoms = [box(x, y, x + 1.0, y + 1.0) for x, y in zip(lons, lats)]
+    gpd.GeoDataFrame(
+        {"station_id": STATION_IDS}, geometry=geoms, crs="EPSG:4283"
+    ).to_file(os.path.join(d, "shp", "CAMELS_AUS_Boundaries_adopted.shp"))
+
+    d = os.path.join(directory, "03_streamflow")
+    gs = _station_table(rng, streamflow_gaugingstats_names())
+    gs["start_date"] = 20000101
+    gs["end_date"] = 20021231
+    gs.to_csv(os.path.join(d, "streamflow_GaugingStats.csv"), index=False)
+
+    d = os.path.join(directory, "04_attributes")
+    os.makedirs(d, exist_ok=True)
+    geology = _station_table(rng, geology_attributes_names())
+    geology["geol_prim"] = [
+        "Sedimentary",
+        "Igneous",
+        "Sedimentary",
+        "Metamorphic",
+        "Igneous",
+    ]
+    geology["geol_sec"] = [
+        "Igneous",
+        "Sedimentary",
+        "Sedimentary",
+        "Igneous",
+        "Metamorphic",
+    ]
+    tables = [
+        ("CatchmentAttributes_01_Geology&Soils.csv", geology),
+        (
+            "CatchmentAttributes_02_Topography&Geometry.csv",
+            _station_table(rng, topography_attributes_names()),
+        ),
+        (
+            "CatchmentAttributes_03_LandCover&Vegetation.csv",
+            _station_table(rng, landcover_attributes_names()),
+        ),
+        (
+            "CatchmentAttributes_04_AnthropogenicInfluences.csv",
+            _station_table(rng, anthropogenicinfluences_attributes_names()),
+        ),
+        (
+            "CatchmentAttributes_05_Other.csv",
+            _station_table(rng, other_attributes_names()),
+        ),
+    ]
+    for fn, df in tables:
+        df.to_csv(os.path.join(d, fn), index=False)
+    return directory
+
+
+@pytest.fixture(scope="session")
+def camels_dir(tmp_path_factory) -> str:
+    return write_synthetic_camels(str(tmp_path_factory.mktemp("camels_aus")))
+
+
+@pytest.fixture(scope="session")
+def repo(camels_dir):
+    from camels_aus.repository import CamelsAus
+
+    r = CamelsAus()
+    r.load_from_text_files(camels_dir)
+    return r
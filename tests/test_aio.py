@@ -0,0 +1,82 @@
+import asyncio
+import threading
+import time
+
+import pytest
+import xarray as xr
+
+from camels_aus.repository import CamelsAus
+
+
+class CountingCamelsAus(CamelsAus):
+    """Counts the parsed files, and parses slowly enough for requests to overlap"""
+
+    def __init__(self) -> None:
+        super().__init__()
+        self.parsed = []
+        self._parsed_lock = threading.Lock()
+
+    def load_time_series(self, directory, short_fn, *args, **kwargs):
+        time.sleep(0.2)
+        with self._parsed_lock:
+            self.parsed.append(short_fn)
+        return super().load_time_series(directory, short_fn, *args, **kwargs)
+
+
+def test_aload_matches_load(repo, camels_dir):
+    r = CamelsAus()
+    asyncio.run(r.aload(camels_dir))
+    xr.testing.assert_identical(r.data, repo.data)
+
+
+def test_concurrent_requests_share_one_parse(repo, camels_dir):
+    r = CountingCamelsAus()
+    r.load_from_text_files(camels_dir, varnames=[])
+    assert not "streamflow_mmd" in r.data
+    assert r.parsed == []
+
+    async def main():
+        return await asyncio.gather(
+            *[r.aload_variable("streamflow_mmd") for _ in range(5)],
+            r.aload_variable("precipitation_AWAP"),
+        )
+
+    results = asyncio.run(main())
+    assert sorted(r.parsed) == ["precipitation_AWAP.csv", "streamflow_mmd.csv"]
+    for da in results[:5]:
+        xr.testing.assert_identical(da, repo.data.streamflow_mmd)
+    assert r._shared_tasks.started == 2
+    assert len(r._shared_tasks) == 0
+    # already loaded: no parse
+    asyncio.run(r.aload_variable("streamflow_mmd"))
+    assert len(r.parsed) == 2
+    xr.testing.assert_identical(r.load_variable("tmax_awap"), repo.data.tmax_awap)
+    with pytest.raises(KeyError):
+        r.load_variable("no_such_series")
+
+
+def test_cancellation(camels_dir):
+    r = CountingCamelsAus()
+    r.load_from_text_files(camels_dir, varnames=[])
+
+    async def cancel_one():
+        tasks = [asyncio.ensure_future(r.aload_variable("tmin_awap")) for _ in range(2)]
+        await asyncio.sleep(0.05)
+        tasks[0].cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await tasks[0]
+        return await tasks[1]
+
+    assert asyncio.run(cancel_one()).name == "tmin_awap"
+    assert "tmin_awap" in r.data
+
+    async def cancel_all():
+        task = asyncio.ensure_future(r.aload_variable("vprp_awap"))
+        await asyncio.sleep(0.05)
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+        assert len(r._shared_tasks) == 0
+
+    asyncio.run(cancel_all())
+    assert not "vprp_awap" in r.data
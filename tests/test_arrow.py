@@ -0,0 +1,88 @@
+import numpy as np
+import pytest
+
+pa = pytest.importorskip("pyarrow")
+
+from camels_aus.arrow import attributes_table, daily_batches
+from camels_aus.dtypes import DtypePolicy, apply_dtype_policy
+from camels_aus.layout import TIME_MAJOR, with_layout
+from camels_aus.repository import CamelsAus
+
+
+def test_daily_batches_wrap_the_data(repo):
+    ds = with_layout(repo.data, TIME_MAJOR)
+    batches = list(
+        daily_batches(ds, ["streamflow_mmd", "precipitation_AWAP"], batch_days=100)
+    )
+    assert len(batches) == 11
+    assert [b.num_rows for b in batches[-2:]] == [500, 480]
+    x = ds.streamflow_mmd.values
+    column = batches[3].column("streamflow_mmd")
+    # the values buffer is the memory of the data array, rows 300 to 399
+    assert column.buffers()[1].address == x[300:].ctypes.data
+    assert column.null_count == np.isnan(x[300:400]).sum()
+    assert batches[3].schema.field("streamflow_mmd").metadata == {b"units": b"mm"}
+    # long format: time-major, stations in the order of the dataset
+    table = pa.Table.from_batches(batches)
+    station_ids = table.column("station_id").to_pylist()
+    assert station_ids[:6] == [str(s) for s in ds.station_id.values] + ["102101A"]
+    times = table.column("time").to_numpy()
+    assert (times[::5] == ds.time.values).all()
+    values = table.column("precipitation_AWAP").to_numpy(zero_copy_only=False)
+    np.testing.assert_array_equal(values, ds.precipitation_AWAP.values.ravel())
+
+
+def test_daily_table_with_attributes(repo, tmp_path):
+    table = repo.arrow_daily(["streamflow_mmd"], attributes=["catchment_area"])
+    assert table.num_rows == 1096 * 5
+    assert table.column_names == [
+        "time",
+        "station_id",
+        "streamflow_mmd",
+        "catchment_area",
+    ]
+    assert table.column("catchment_area").to_pylist()[:6] == [
+        100.0,
+        250.0,
+        1000.0,
+        50.0,
+        400.0,
+        100.0,
+    ]
+    # memory-mapped cache
+    repo.save_to_cached_files(str(tmp_path / "cache"))
+    r = CamelsAus()
+    r.load_from_cached_files(str(tmp_path / "cache"), mmap=True)
+    reader = r.arrow_reader(
+        ["streamflow_mmd", "streamflow_QualityCodes"], batch_days=500
+    )
+    # memory-mapped quality codes are integer codes, wrapped as a dictionary column
+    assert pa.types.is_dictionary(reader.schema.field("streamflow_QualityCodes").type)
+    table = reader.read_all()
+    assert (
+        table.column("streamflow_mmd").chunk(1).buffers()[1].address
+        == r.data.streamflow_mmd.values[500:].ctypes.data
+    )
+    codes = table.column("streamflow_QualityCodes").to_pylist()
+    expected = repo.data.streamflow_QualityCodes.values.ravel().tolist()
+    assert codes == [None if c != c else c for c in expected]
+
+
+def test_attributes_table(repo):
+    ds = apply_dtype_policy(repo.data, DtypePolicy(categorical_strings=True))
+    table = attributes_table(ds, ["catchment_area", "geol_prim", "station_name"])
+    assert table.num_rows == 5
+    assert table.column("catchment_area").to_pylist() == [100, 250, 1000, 50, 400]
+    assert (
+        table.column("catchment_area").chunk(0).buffers()[1].address
+        == ds.catchment_area.values.ctypes.data
+    )
+    assert pa.types.is_dictionary(table.schema.field("geol_prim").type)
+    assert table.column("geol_prim").to_pylist() == list(repo.data.geol_prim.values)
+    assert table.column("station_name").to_pylist() == list(
+        repo.data.station_name.values
+    )
+    # joins to the daily series on the station dictionary
+    daily = repo.arrow_daily(["streamflow_mmd"], batch_days=1000)
+    joined = daily.join(table, "station_id")
+    assert joined.num_rows == daily.num_rows
@@ -0,0 +1,92 @@
+import os
+import shutil
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from camels_aus.cache import append_npy_rows, missing_data_summary, read_manifest
+from camels_aus.gaps import GapIndex
+from camels_aus.conventions import get_xr_units
+from camels_aus.repository import CamelsAus
+
+from conftest import (
+    DAILY_FILES,
+    N_DAYS,
+    START_DATE,
+    write_daily_files,
+    write_synthetic_camels,
+)
+
+
+def test_cache_round_trip(repo, tmp_path):
+    cache_dir = str(tmp_path / "cache")
+    repo.save_to_cached_files(cache_dir)
+    r = CamelsAus()
+    r.load_from_cached_files(cache_dir)
+    for v in repo.data.data_vars:
+        a, b = repo.data[v].values, r.data[v].values
+        if a.dtype.kind == "f":
+            np.testing.assert_array_equal(a, b)
+        else:
+            assert pd.Series(a.ravel()).equals(pd.Series(b.ravel())), v
+        assert get_xr_units(repo.data[v]) == get_xr_units(r.data[v])
+    assert (r.data.time.values == repo.data.time.values).all()
+    assert len(r.boundaries) == len(repo.boundaries)
+    with pytest.raises(ValueError):
+        r.load_from_cached_files(cache_dir, version="2.0")
+
+
+def test_append_npy_rows(tmp_path):
+    fn = str(tmp_path / "x.npy")
+    x = np.arange(12, dtype=np.float32).reshape(4, 3)
+    np.save(fn, x)
+    append_npy_rows(fn, x[:2] + 100)
+    y = np.load(fn)
+    assert y.shape == (6, 3)
+    np.testing.assert_array_equal(y[4:], x[:2] + 100)
+    with pytest.raises(ValueError):
+        append_npy_rows(fn, np.zeros((1, 2), dtype=np.float32))
+
+
+def test_incremental_update(tmp_path):
+    text_dir = str(tmp_path / "text")
+    cache_dir = str(tmp_path / "cache")
+    write_synthetic_camels(text_dir)
+    r = CamelsAus()
+    r.load_from_text_files(text_dir)
+    r.save_to_cached_files(cache_dir)
+    assert r.update_from_text_files(text_dir, cache_dir) == 0
+
+    # extended series: same first N_DAYS days, and 40 more days appended
+    extended_dir = str(tmp_path / "extended")
+    new_days_dir = str(tmp_path / "new_days")
+    shutil.copytree(text_dir, extended_dir)
+    write_daily_files(new_days_dir, START_DATE + pd.Timedelta(N_DAYS, "D"), 40, seed=1)
+    for subdir, fn in DAILY_FILES + [("03_streamflow", "streamflow_QualityCodes.csv")]:
+        with open(os.path.join(new_days_dir, subdir, fn), "r") as f:
+            new_rows = f.readlines()[1:]
+        with open(os.path.join(extended_dir, subdir, fn), "a") as f:
+            f.writelines(new_rows)
+    full = CamelsAus()
+    full.load_from_text_files(extended_dir)
+
+    assert r.update_from_text_files(extended_dir, cache_dir) == 40
+    assert len(r.data.time) == N_DAYS + 40
+    for v in ["streamflow_mmd", "precipitation_AWAP", "tmin_awap"]:
+        np.testing.assert_array_equal(r.data[v].values, full.data[v].values)
+    assert (
+        r.data.streamflow_QualityCodes.values
+        == full.data.streamflow_QualityCodes.values
+    ).all()
+    summary = missing_data_summary(cache_dir)
+    expected = full.data.streamflow_mmd.isnull().mean(dim="time").values
+    np.testing.assert_allclose(summary.streamflow_mmd.values, expected)
+    assert read_manifest(cache_dir)["length"] == N_DAYS + 40
+
+    # the gap index is extended in place, identical to one built from the full series
+    expected = GapIndex.from_dataset(full.data)
+    assert r.gap_index.length == N_DAYS + 40
+    for v in expected.varnames:
+        for a, b in zip(r.gap_index.gaps[v], expected.gaps[v]):
+            np.testing.assert_array_equal(a, b)
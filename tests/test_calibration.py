@@ -0,0 +1,103 @@
+import numpy as np
+
+from camels_aus.calibration import (
+    RandomSearch,
+    calibrate_all,
+    linear_reservoir,
+    read_checkpoint,
+)
+
+STRATEGY = RandomSearch([0.01, 0.0], [1.0, 1.0], n_samples=20, seed=1)
+FOLDS = [("2000-01-01", "2001-06-30"), ("2001-07-01", "2002-12-31")]
+
+
+def test_calibration_in_process_and_pool(repo):
+    serial = repo.calibrate(linear_reservoir, STRATEGY, folds=FOLDS, n_workers=0)
+    assert len(serial) == 10
+    assert list(serial.station_id[:2]) == ["102101A", "102101A"]
+    assert list(serial.fold[:2]) == [0, 1]
+    assert np.isfinite(serial.score).all()
+    assert all([len(p) == 2 for p in serial.params])
+
+    parallel = calibrate_all(
+        repo.data, linear_reservoir, STRATEGY, folds=FOLDS, n_workers=2
+    )
+    np.testing.assert_allclose(parallel.score, serial.score)
+
+    # inputs given by name
+    renamed = calibrate_all(
+        repo.data.rename(streamflow_mmd="observed"),
+        linear_reservoir,
+        STRATEGY,
+        folds=FOLDS,
+        n_workers=0,
+        varnames=["precipitation_AWAP", "et_morton_actual_SILO", "observed"],
+    )
+    np.testing.assert_allclose(renamed.score, serial.score)
+
+
+def test_calibration_resumes_from_checkpoint(repo, tmp_path):
+    checkpoint = str(tmp_path / "checkpoint.jsonl")
+    calibrate_all(
+        repo.data,
+        linear_reservoir,
+        STRATEGY,
+        station_ids=["102101A", "912101A"],
+        n_workers=0,
+        checkpoint=checkpoint,
+    )
+    assert len(read_checkpoint(checkpoint)) == 2
+    # an interrupted write leaves a truncated line
+    with open(checkpoint, "a") as f:
+        f.write('{"station_id": "A50')
+    res = calibrate_all(
+        repo.data,
+        linear_reservoir,
+        STRATEGY,
+        n_workers=0,
+        checkpoint=checkpoint,
+    )
+    assert len(res) == 5
+    assert len(read_checkpoint(checkpoint)) == 5
+    assert list(res.station_id) == [str(s) for s in repo.data.station_id.values]
+
+    # only the results of the same stations, fold dates, model and strategy are reused
+    res = calibrate_all(
+        repo.data,
+        linear_reservoir,
+        STRATEGY,
+        station_ids=["912101A"],
+        folds=FOLDS,
+        n_workers=0,
+        checkpoint=checkpoint,
+    )
+    assert list(res.station_id) == ["912101A", "912101A"]
+    assert list(res.fold) == [0, 1]
+    assert len(read_checkpoint(checkpoint)) == 7
+    other = RandomSearch([0.01, 0.0], [1.0, 1.0], n_samples=10, seed=1)
+    res = calibrate_all(
+        repo.data,
+        linear_reservoir,
+        other,
+        station_ids=["912101A"],
+        folds=FOLDS[1:],
+        n_workers=0,
+        checkpoint=checkpoint,
+    )
+    assert len(res) == 1 and res.fold[0] == 0
+    assert len(read_checkpoint(checkpoint)) == 8
+    res = calibrate_all(
+        repo.data,
+        linear_reservoir,
+        STRATEGY,
+        station_ids=["912101A"],
+        folds=[("2001-07-01", "2002-12-31")],
+        n_workers=0,
+        checkpoint=checkpoint,
+    )
+    assert len(res) == 1
+    assert len(read_checkpoint(checkpoint)) == 8
+    # resuming does not add blank lines
+    with open(checkpoint) as f:
+        lines = f.read().splitlines()
+    assert len(lines) == 9 and all([len(line) > 0 for line in lines])
@@ -0,0 +1,67 @@
+import json
+import os
+
+import numpy as np
+import xarray as xr
+
+from camels_aus.cache import MANIFEST_FN, build_cache_from_text_files, load_cache
+from camels_aus.dtypes import decode_categorical
+from camels_aus.resample import resample_dataset
+from camels_aus.repository import CamelsAus
+
+
+def test_streamed_cache_matches_in_memory_cache(repo, camels_dir, tmp_path):
+    streamed = str(tmp_path / "streamed")
+    # blocks of 25 rows
+    build_cache_from_text_files(camels_dir, streamed, max_block_bytes=1000)
+    in_memory = str(tmp_path / "in_memory")
+    repo.save_to_cached_files(in_memory)
+    manifests = [
+        json.load(open(os.path.join(d, MANIFEST_FN))) for d in [streamed, in_memory]
+    ]
+    assert manifests[0].pop("write_id") != manifests[1].pop("write_id")
+    assert manifests[0] == manifests[1]
+    xr.testing.assert_identical(load_cache(streamed), load_cache(in_memory))
+    with np.load(os.path.join(streamed, "gaps.npz")) as a, np.load(
+        os.path.join(in_memory, "gaps.npz")
+    ) as b:
+        assert all([(a[k] == b[k]).all() for k in a.files])
+
+
+def test_chunked_reductions(repo, camels_dir, tmp_path):
+    r = CamelsAus()
+    r.load_out_of_core(camels_dir, str(tmp_path / "cache"))
+    assert r.memory_report().loc["streamflow_mmd", "memory_mapped"]
+    # quality codes stay memory-mapped integer codes
+    assert r.memory_report().loc["streamflow_QualityCodes", "memory_mapped"]
+    codes = r.data.streamflow_QualityCodes
+    assert codes.dtype == np.int8
+    xr.testing.assert_identical(
+        decode_categorical(codes), repo.data.streamflow_QualityCodes
+    )
+    assert r.quality_masks.categories == repo.quality_masks.categories
+    for name in ["best_available", "exclude_estimated"]:
+        assert (r.quality_masks.packed(name) == repo.quality_masks.packed(name)).all()
+    chunked = r.chunked(max_block_bytes=2000, n_workers=3)
+    # up to 50 rows of 5 stations, in whole intervals between boundaries
+    assert chunked.row_blocks([0, 20, 40, 90, 100, 1000]) == [
+        (0, 40),
+        (40, 90),
+        (90, 100),
+        (100, 1000),
+        (1000, 1096),
+    ]
+    expected = resample_dataset(repo.data, "WY", "mean", min_completeness=0.9)
+    xr.testing.assert_allclose(
+        chunked.resample("WY", "mean", min_completeness=0.9), expected
+    )
+
+    stats = chunked.station_statistics("streamflow_mmd", quantiles=[0.1, 0.9])
+    assert len(chunked.station_blocks()) == 5
+    q = repo.data.streamflow_mmd.astype(np.float64)
+    np.testing.assert_allclose(stats["mean"], q.mean("time").values)
+    np.testing.assert_allclose(stats["std"], q.std("time", ddof=1).values)
+    np.testing.assert_allclose(
+        stats["q90"], q.quantile(0.9, dim="time").values, rtol=1e-6
+    )
+    np.testing.assert_allclose(stats["missing"], q.isnull().mean("time").values)
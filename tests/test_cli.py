@@ -0,0 +1,49 @@
+import json
+import os
+
+import numpy as np
+
+from camels_aus.cli import main
+from camels_aus.repository import CamelsAus
+
+
+def test_cli_cache_build_verify_info(camels_dir, tmp_path, capsys):
+    cache_dir = str(tmp_path / "cache")
+    assert main(["cache", "build", camels_dir, cache_dir]) == 0
+    assert main(["--json", "cache", "verify", cache_dir, "--deep"]) == 0
+    capsys.readouterr()
+    assert main(["--json", "info", "--cache", cache_dir]) == 0
+    info = json.loads(capsys.readouterr().out)
+    assert info["stations"] == 5
+    assert info["start"] == "2000-01-01"
+
+    os.remove(os.path.join(cache_dir, "daily", "tmax_awap.npy"))
+    assert main(["cache", "verify", cache_dir]) == 1
+
+
+def test_cli_export_subset(camels_dir, tmp_path):
+    out = str(tmp_path / "subset")
+    args = ["export", "--text", camels_dir, out, "--format", "cache"]
+    args += [
+        "--stations",
+        "912101A,G0010005",
+        "--variables",
+        "streamflow_mmd",
+        "--end",
+        "2000-12-31",
+    ]
+    assert main(args) == 0
+    r = CamelsAus()
+    r.load_from_cached_files(out)
+    assert list(r.data.station_id.values) == ["912101A", "G0010005"]
+    assert len(r.data.time) == 366
+    assert "streamflow_mmd" in r.data and not "tmax_awap" in r.data
+
+
+def test_cli_bench_and_errors(camels_dir, tmp_path, capsys):
+    assert main(["--json", "bench", "--text", camels_dir, "--repeat", "1"]) == 0
+    results = json.loads(capsys.readouterr().out)
+    assert results["load_from_text_files_s"] > 0
+    assert results["load_from_cached_files_s"] > 0
+    assert results["station_reads_station_major_s"] > 0
+    assert main(["info", "--cache", str(tmp_path / "nothing")]) == 2
@@ -0,0 +1,62 @@
+import numpy as np
+import pandas as pd
+
+from camels_aus.climate import (
+    CLIMATE_INDICES,
+    climate_indices_arrays,
+    priestley_taylor_pet,
+)
+
+PERIODS = [("2000-01-01", "2000-12-31"), ("2000-07-01", "2002-06-30")]
+
+
+def test_climate_indices_match_loops(repo):
+    ds = repo.data
+    res = repo.climate_indices(periods=PERIODS)
+    assert res.dims == ("station_id", "period", "index")
+    assert res.shape == (5, 2, len(CLIMATE_INDICES))
+    for s in ["102101A", "G0010005"]:
+        for i, (a, b) in enumerate(PERIODS):
+            p = ds.precipitation_AWAP.sel(station_id=s, time=slice(a, b)).values
+            x = res.sel(station_id=s).isel(period=i).to_series()
+            np.testing.assert_allclose(x.p_mean, p.mean())
+            high = p >= 5 * p.mean()
+            runs = np.sum(high[1:] & ~high[:-1]) + high[0]
+            np.testing.assert_allclose(x.high_prec_freq, high.sum() / len(p) * 365.25)
+            np.testing.assert_allclose(x.high_prec_dur, high.sum() / runs)
+            dry = p < 1.0
+            runs = np.sum(dry[1:] & ~dry[:-1]) + dry[0]
+            np.testing.assert_allclose(x.low_prec_freq, dry.sum() / len(p) * 365.25)
+            np.testing.assert_allclose(x.low_prec_dur, dry.sum() / runs)
+            np.testing.assert_allclose(x.aridity, x.pet_mean / x.p_mean)
+    assert (res.sel(index="frac_snow") == 0).all()
+    pet = res.sel(index="pet_mean").values
+    assert ((pet > 0) & (pet < 15)).all()
+
+
+def test_precipitation_seasonality():
+    time = pd.date_range("2000-01-01", periods=3 * 365, freq="D").values
+    t = np.arange(len(time)) / 365.25 * 2 * np.pi
+    tmean = 15 + 10 * np.sin(t)[:, np.newaxis] * np.ones((1, 2))
+    # summer and winter dominant precipitation
+    p = np.column_stack([2 + 1.5 * np.sin(t), 2 - 1.5 * np.sin(t)])
+    p[10:20, 1] = np.nan
+    res = climate_indices_arrays(
+        p, np.ones_like(p), tmean, time, [(str(time[0])[:10], str(time[-1])[:10])]
+    )
+    seasonality = res[:, 0, CLIMATE_INDICES.index("p_seasonality")]
+    np.testing.assert_allclose(seasonality, [0.75, -0.75], atol=0.01)
+
+
+def test_priestley_taylor_pet_seasons():
+    # a clear day in summer and in winter, at 35 degrees south
+    pet = priestley_taylor_pet(
+        np.array([[30.0], [14.0]]),
+        np.array([[16.0], [4.0]]),
+        np.array([[30.0], [10.0]]),
+        np.array([[12.0], [8.0]]),
+        np.array([-35.0]),
+        np.array([15, 180]),
+    )
+    assert 5.0 < pet[0, 0] < 9.0
+    assert 0.3 < pet[1, 0] < 2.0
@@ -0,0 +1,111 @@
+import asyncio
+import json
+import os
+
+import numpy as np
+import pytest
+
+from camels_aus.dtypes import DtypePolicy, decode_categorical, policy_key
+from camels_aus.repository import CamelsAus
+
+
+def test_compact_dtype_policy(repo, camels_dir):
+    r = CamelsAus()
+    r.load_from_text_files(camels_dir, dtype_policy="compact")
+    ds = r.data
+    assert ds.streamflow_mmd.dtype == np.float32
+    assert ds.geol_prim.dtype == np.int8
+    assert list(decode_categorical(ds.geol_prim).values) == list(
+        repo.data.geol_prim.values
+    )
+    assert ds.map_zone.dtype == np.int8
+    assert ds.catchment_area.dtype == np.float32
+    # synthetic attributes are proportions in [0, 1]
+    assert ds.geol_sec.dtype == np.int8
+    assert ds.prop_missing_data.dtype == np.float16
+    np.testing.assert_allclose(
+        ds.prop_missing_data.values, repo.data.prop_missing_data.values, atol=1e-3
+    )
+    # quality codes are left as strings, and regions decoded for grouping
+    assert ds.streamflow_QualityCodes.dtype == object
+    assert list(r.regional_aggregator().labels) == list(
+        repo.regional_aggregator().labels
+    )
+
+    compact = r.memory_report(by="group")
+    default = repo.memory_report(by="group")
+    assert compact.loc["daily", "nbytes"] == default.loc["daily", "nbytes"]
+    assert compact.loc["geology", "nbytes"] < default.loc["geology", "nbytes"]
+    assert compact.nbytes.sum() < default.nbytes.sum()
+
+
+def test_memory_report(repo, tmp_path):
+    report = repo.memory_report()
+    assert report.loc["streamflow_mmd", "nbytes"] == 1096 * 5 * 4
+    assert report.loc["streamflow_mmd", "group"] == "daily"
+    assert report.loc["geol_prim", "group"] == "geology"
+    assert report.loc["time", "group"] == "coordinates"
+    # object arrays include the strings referenced
+    assert report.loc["streamflow_QualityCodes", "nbytes"] > 1096 * 5 * 8
+    assert not report.memory_mapped.any()
+
+    cache_dir = str(tmp_path / "cache")
+    repo.save_to_cached_files(cache_dir)
+    r = CamelsAus()
+    r.load_from_cached_files(cache_dir, mmap=True)
+    report = r.memory_report()
+    assert report.loc["streamflow_mmd", "memory_mapped"]
+    assert report.loc["streamflow_mmd", "resident_bytes"] == 0
+
+
+def test_apply_dtype_policy_to_repository(repo, camels_dir, tmp_path):
+    pytest.importorskip("pyarrow")
+    from camels_aus.server import DataService
+
+    r = CamelsAus()
+    r.load_from_text_files(camels_dir, varnames=["streamflow_mmd"])
+    r.apply_dtype_policy(DtypePolicy(daily_float=np.float64, categorical_strings=True))
+    assert r.data.drainage_division.dtype == np.int8
+    # the policy also applies to the series loaded later
+    assert r.load_variable("tmax_awap").dtype == np.float64
+
+    # categorical attributes are written as strings
+    out_dir = str(tmp_path / "parquet")
+    r.to_parquet(out_dir, partition_by="drainage_division")
+    assert "drainage_division=North%20East%20Coast" in os.listdir(
+        os.path.join(out_dir, "daily")
+    )
+    p = CamelsAus()
+    p.load_from_parquet(out_dir)
+    assert list(p.data.drainage_division.values) == list(
+        repo.data.drainage_division.values
+    )
+    body, _ = DataService(r).attributes()
+    assert json.loads(body)["drainage_division"] == list(
+        repo.data.drainage_division.values
+    )
+
+    # a policy given by name
+    r = CamelsAus()
+    r.load_from_text_files(camels_dir, varnames=["streamflow_mmd"])
+    r.apply_dtype_policy("compact")
+    assert r.data.drainage_division.dtype == np.int8
+    assert r.load_variable("tmax_awap").dtype == np.float32
+    da = asyncio.run(r.aload_variable("precipitation_AWAP"))
+    assert da.dtype == np.float32
+
+
+def test_policy_key():
+    assert policy_key(None) is None
+    assert policy_key("compact") == policy_key(
+        DtypePolicy(
+            daily_float="float32",
+            attribute_float=np.float32,
+            bounded_float=np.dtype(np.float16),
+            downcast_integers=True,
+            categorical_strings=True,
+        )
+    )
+    assert policy_key("compact") != policy_key("float32")
+    assert policy_key(DtypePolicy()) != policy_key(DtypePolicy(daily_float=np.float64))
+    hash(policy_key(DtypePolicy(bounded_varnames=["frac_forest"])))
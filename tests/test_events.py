@@ -0,0 +1,83 @@
+import numpy as np
+
+from camels_aus.events import detect_events, detect_recessions
+
+
+def test_detect_events_declustering():
+    q = np.zeros((40, 2))
+    q[[5, 6, 7], 0] = [2.0, 5.0, 3.0]
+    # a second peak 2 days later, dependent on the first one
+    q[[9, 10], 0] = [4.0, 1.5]
+    q[8, 0] = 0.5
+    # an independent event, and a missing day in a quiet period
+    q[[30, 31], 0] = [6.0, 2.0]
+    q[20, 0] = np.nan
+    q[[10, 11], 1] = [1.0, 9.0]
+    station, start, end, peak_index, peak, volume = detect_events(
+        q, threshold=[1.0, 0.5], min_separation=3
+    )
+    np.testing.assert_array_equal(station, [0, 0, 1])
+    np.testing.assert_array_equal(start, [5, 30, 10])
+    np.testing.assert_array_equal(end, [11, 32, 12])
+    np.testing.assert_array_equal(peak_index, [6, 30, 11])
+    np.testing.assert_array_equal(peak, [5.0, 6.0, 9.0])
+    np.testing.assert_allclose(volume, [16.0, 8.0, 10.0])
+    # the first two candidate events are one day apart: with a separation of one day they are
+    # independent, the flow between them (0.5) falling below `max_trough` times the smaller peak (4.0)
+    station, start, _, _, _, _ = detect_events(
+        q, threshold=[1.0, 0.5], min_separation=1, max_trough=1.0
+    )
+    np.testing.assert_array_equal(start[station == 0], [5, 9, 30])
+    # and dependent with a trough ratio below 0.5 / 4.0
+    station, start, _, _, _, _ = detect_events(
+        q, threshold=[1.0, 0.5], min_separation=1, max_trough=0.1
+    )
+    np.testing.assert_array_equal(start[station == 0], [5, 30])
+
+
+def test_detect_recessions():
+    q = np.full((20, 1), 1.0)
+    q[3:10, 0] = 8.0 * 0.5 ** np.arange(7)
+    q[12, 0] = np.nan
+    station, start, end, k = detect_recessions(q, min_length=3)
+    np.testing.assert_array_equal(start, [3])
+    np.testing.assert_array_equal(end, [10])
+    np.testing.assert_allclose(k, [0.5])
+
+
+def test_event_tables(repo):
+    ds = repo.data
+    events = repo.flood_events(quantile=0.9)
+    assert list(events.columns) == [
+        "station_id",
+        "start",
+        "peak_time",
+        "peak",
+        "volume",
+        "duration",
+        "rainfall",
+    ]
+    q = ds.streamflow_mmd.sel(station_id="912101A").to_series()
+    e = events[events.station_id == "912101A"]
+    assert (q[e.peak_time].values == e.peak.values).all()
+    assert (e.peak.values > q.quantile(0.9)).all()
+    assert (e.start.diff().dropna().dt.days > 0).all()
+    first = e.iloc[0]
+    p = ds.precipitation_AWAP.sel(station_id="912101A").to_series()
+    expected = p[
+        first.start
+        - np.timedelta64(2, "D") : first.start
+        + np.timedelta64(first.duration - 1, "D")
+    ].sum()
+    np.testing.assert_allclose(first.rainfall, expected)
+
+    maxima = repo.annual_maxima()
+    assert len(maxima) == 15
+    m = maxima[(maxima.station_id == "912101A")]
+    np.testing.assert_allclose(m.peak.values, q.groupby(q.index.year).max().values)
+    water_years = repo.annual_maxima(water_year_start=7, min_completeness=0.9)
+    assert len(water_years) == 10
+
+    rec = repo.recessions(min_length=3)
+    assert (rec.final_flow < rec.initial_flow).all()
+    assert ((rec.k > 0) & (rec.k < 1)).all()
@@ -0,0 +1,60 @@
+import numpy as np
+import pandas as pd
+
+from camels_aus.gaps import GapIndex, run_lengths
+
+
+def _index(missing):
+    index = GapIndex(["a", "b", "c"], np.datetime64("2000-01-01"), missing.shape[0])
+    index.gaps["x"] = run_lengths(missing)
+    return index
+
+
+def test_run_lengths_and_extend():
+    missing = np.zeros((10, 3), dtype=bool)
+    missing[2:5, 0] = True
+    missing[8:, 0] = True
+    missing[:, 2] = True
+    station, start, length = run_lengths(missing)
+    assert station.tolist() == [0, 0, 2]
+    assert start.tolist() == [2, 8, 0]
+    assert length.tolist() == [3, 2, 10]
+
+    index = _index(missing)
+    new = np.zeros((5, 3), dtype=bool)
+    new[0:2, 0] = True
+    new[3, 1] = True
+    new[:, 2] = True
+    index.extend("x", new)
+    index.set_length(15)
+    expected = run_lengths(np.concatenate([missing, new]))
+    for a, b in zip(index.gaps["x"], expected):
+        np.testing.assert_array_equal(a, b)
+
+
+def test_gap_queries_match_masks():
+    rng = np.random.default_rng(3)
+    missing = rng.random((400, 3)) < 0.1
+    missing[50:120, 1] = True
+    index = _index(missing)
+    time = pd.date_range("2000-01-01", periods=400)
+
+    start, end = "2000-02-10", "2000-09-30"
+    sel = (time >= start) & (time <= end)
+    np.testing.assert_array_equal(
+        index.missing_counts("x", start, end), missing[sel].sum(axis=0)
+    )
+    np.testing.assert_allclose(index.completeness("x"), 1 - missing.mean(axis=0))
+    assert index.stations_complete("x", 0.8) == ["a", "c"]
+
+    windows = index.longest_complete_window("x")
+    for i, s in enumerate(["a", "b", "c"]):
+        runs = run_lengths(~missing[:, [i]])
+        k = np.argmax(runs[2])
+        assert windows.loc[s, "length"] == runs[2][k]
+        assert windows.loc[s, "start"] == time[runs[1][k]]
+
+    long_gaps = index.gaps_longer_than("x", 30)
+    assert long_gaps.station_id.tolist() == ["b"]
+    assert long_gaps.start[0] == pd.Timestamp("2000-02-20")
+    assert long_gaps.end[0] == pd.Timestamp("2000-04-29")
@@ -0,0 +1,83 @@
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+
+pytest.importorskip("shapely")
+pytest.importorskip("scipy")
+
+import xarray as xr
+
+from camels_aus.gridded import WEIGHTS_SUBDIR, aggregate_grid, compute_grid_weights
+from camels_aus.repository import CamelsAus
+
+
+def _grid(n_time=10):
+    lon = np.arange(139.05, 148.0, 0.1)
+    lat = np.arange(-28.05, -31.0, -0.1)
+    time = pd.date_range("2000-01-01", periods=n_time)
+    rng = np.random.default_rng(0)
+    x = rng.uniform(0, 10, size=(n_time, len(lat), len(lon)))
+    return xr.DataArray(
+        x,
+        coords={"time": time, "lat": lat, "lon": lon},
+        dims=["time", "lat", "lon"],
+        attrs={"units": "mm/d"},
+    )
+
+
+def test_weights_match_polygon_mask():
+    import shapely
+
+    da = _grid()
+    geoms = np.array([shapely.box(140.0, -30.0, 141.0, -29.0)])
+    w = compute_grid_weights(geoms, da.lon.values, da.lat.values)
+    assert w.shape == (1, da.lat.size * da.lon.size)
+    np.testing.assert_allclose(w.sum(axis=1), 1.0)
+    res = aggregate_grid(da, w, ["a"], chunk_size=3)
+    # the box covers exactly 10 x 10 cells
+    inside = da.sel(lon=slice(140.0, 141.0), lat=slice(-29.0, -30.0))
+    assert inside.sizes["lon"] == 10 and inside.sizes["lat"] == 10
+    expected = inside.mean(dim=["lat", "lon"]).values
+    np.testing.assert_allclose(res.sel(station_id="a").values, expected, rtol=1e-3)
+    assert res.dims == ("time", "station_id")
+    assert res.attrs["units"] == "mm/d"
+
+    # missing cells are excluded
+    da.values[0, :, :] = np.nan
+    da.values[1, da.lat.values > -29.5, :] = np.nan
+    res = aggregate_grid(da, w, ["a"])
+    assert np.isnan(res.values[0, 0])
+    expected = inside[1].where(inside.lat < -29.5).mean().values
+    np.testing.assert_allclose(res.values[1, 0], expected, rtol=1e-3)
+
+
+def test_repository_grid_weights_cached(repo, tmp_path):
+    cache_dir = str(tmp_path / "cache")
+    repo.save_to_cached_files(cache_dir)
+    r = CamelsAus()
+    r.load_from_cached_files(cache_dir)
+    da = _grid()
+    res = r.aggregate_grid(da)
+    assert res.shape == (10, 5)
+    assert not np.isnan(res.values).any()
+    files = os.listdir(os.path.join(cache_dir, WEIGHTS_SUBDIR))
+    assert len(files) == 1
+
+    r = CamelsAus()
+    r.load_from_cached_files(cache_dir)
+    np.testing.assert_allclose(r.aggregate_grid(da).values, res.values)
+
+    # results follow the stations of the dataset, whatever the order of the boundaries
+    boundaries = r.boundaries.iloc[::-1].reset_index(drop=True)
+    r.boundaries = boundaries
+    reordered = r.aggregate_grid(da)
+    assert list(reordered.station_id.values) == list(r.data.station_id.values)
+    np.testing.assert_allclose(reordered.values, res.values)
+    # the weights are keyed on the geometries
+    boundaries = boundaries.set_geometry(boundaries.geometry.translate(xoff=0.5))
+    r.boundaries = boundaries
+    shifted = r.aggregate_grid(da)
+    assert len(os.listdir(os.path.join(cache_dir, WEIGHTS_SUBDIR))) == 3
+    assert not np.allclose(shifted.values, res.values)
@@ -0,0 +1,53 @@
+import os
+import subprocess
+import sys
+
+pkg_dir = os.path.join(os.path.dirname(__file__), "..")
+
+# Budget for the cumulative import time of camels_aus.repository, in microseconds.
+IMPORT_TIME_BUDGET_US = 150000
+
+HEAVY_MODULES = [
+    "geopandas",
+    "shapely",
+    "pyproj",
+    "pyogrio",
+    "fiona",
+    "xarray",
+    "pandas",
+]
+
+
+def _import_report(module: str):
+    code = "import sys, {0}; print(','.join(sorted(sys.modules)))".format(module)
+    p = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", code],
+        capture_output=True,
+        text=True,
+        cwd=pkg_dir,
+        check=True,
+    )
+    cumulative = None
+    for line in p.stderr.splitlines():
+        fields = [x.strip() for x in line.split("|")]
+        if len(fields) == 3 and fields[2] == module:
+            cumulative = int(fields[1])
+    return cumulative, p.stdout.strip().split(",")
+
+
+def test_import_repository_is_lazy():
+    cumulative, modules = _import_report("camels_aus.repository")
+    for m in HEAVY_MODULES:
+        assert not m in modules, "{0} imported by camels_aus.repository".format(m)
+    assert cumulative is not None
+    assert cumulative < IMPORT_TIME_BUDGET_US
+
+
+def test_boundaries_loaded_on_first_access(camels_dir):
+    from camels_aus.repository import CamelsAus
+
+    r = CamelsAus()
+    r.load_from_text_files(camels_dir)
+    assert r._boundaries is None
+    assert len(r.boundaries) == 5
+    assert r._boundaries is not None
@@ -0,0 +1,104 @@
+import numpy as np
+import pandas as pd
+import pytest
+import xarray as xr
+
+from camels_aus.infill import (
+    fillable_gaps,
+    infill_streamflow,
+    pairwise_regressions,
+    select_donors,
+)
+
+
+def _correlated_dataset(n_days=2000):
+    rng = np.random.default_rng(1)
+    signal = np.exp(rng.normal(size=n_days))
+    q = np.column_stack(
+        [
+            2.0 * signal,
+            0.5 * signal + 0.1,
+            signal * np.exp(rng.normal(scale=0.1, size=n_days)),
+            rng.exponential(size=n_days),
+        ]
+    ).astype(np.float32)
+    codes = np.full(q.shape, "A", dtype=object)
+    return xr.Dataset(
+        {
+            "streamflow_mmd": (("time", "station_id"), q),
+            "streamflow_QualityCodes": (("time", "station_id"), codes),
+        },
+        coords={
+            "time": pd.date_range("2000-01-01", periods=n_days),
+            "station_id": ["a", "b", "c", "d"],
+        },
+    )
+
+
+def test_pairwise_regressions():
+    ds = _correlated_dataset()
+    x = ds.streamflow_mmd.values.astype(np.float64)
+    x[:100, 0] = np.nan
+    n, r, intercept, slope = pairwise_regressions(x)
+    assert n[0, 1] == 1900 and n[1, 2] == 2000
+    # station a is exactly 4 times station b minus 0.4
+    assert r[0, 1] == pytest.approx(1.0)
+    assert slope[0, 1] == pytest.approx(4.0, rel=1e-6)
+    assert intercept[0, 1] == pytest.approx(-0.4, abs=1e-5)
+    ok = np.isfinite(x[:, 2]) & np.isfinite(x[:, 3])
+    expected = np.polyfit(x[ok, 3], x[ok, 2], 1)
+    np.testing.assert_allclose([slope[2, 3], intercept[2, 3]], expected, rtol=1e-8)
+    donors = select_donors(n, r, n_donors=3, min_overlap_days=1000, min_correlation=0.7)
+    assert list(donors[0][:2]) == [1, 2]
+    assert list(donors[3]) == [-1, -1, -1]
+
+
+def test_fillable_gaps():
+    missing = np.zeros((10, 2), dtype=bool)
+    missing[0:2, 0] = True  # leading
+    missing[4:6, 0] = True
+    missing[3:8, 1] = True  # too long
+    missing[9, 1] = True  # trailing
+    res = fillable_gaps(missing, max_gap_days=3)
+    assert np.nonzero(res[:, 0])[0].tolist() == [4, 5]
+    assert not res[:, 1].any()
+
+
+def test_infill_streamflow(repo):
+    ds = _correlated_dataset()
+    q = ds.streamflow_mmd.values.copy()
+    q[500:510, 0] = np.nan
+    q[800:900, 0] = np.nan
+    q[1000:1005, 3] = np.nan
+    q[1002, :2] = np.nan
+    ds["streamflow_mmd"].values[:] = q
+    ds["streamflow_QualityCodes"].values[np.isnan(q)] = np.nan
+    res = infill_streamflow(ds, max_gap_days=30, log=False)
+    filled = res.streamflow_mmd.values
+    # from the exact donor b
+    np.testing.assert_allclose(
+        filled[500:510, 0], ds.streamflow_mmd.values[500:510, 1] * 4 - 0.4, rtol=1e-5
+    )
+    assert np.isnan(filled[800:900, 0]).all()
+    # no donor correlated with d
+    assert np.isnan(filled[1000:1005, 3]).all()
+    assert res.donor.sel(station_id="a").values.tolist()[:2] == ["b", "c"]
+    assert res.donor.sel(station_id="d").values.tolist() == ["", "", ""]
+    categories = res.streamflow_QualityCodes.attrs["categories"]
+    assert categories == ["A", "F1", "F2", "F3"]
+    codes = res.streamflow_QualityCodes.values
+    assert (codes[500:510, 0] == 1).all()
+    # a and b, best donors of each other, are both missing on day 1002: filled from c
+    assert codes[1002, :2].tolist() == [2, 2]
+    assert (codes[800:900, 0] == -1).all()
+    assert (codes[:500, 0] == 0).all()
+    # log space regressions, and the synthetic dataset of the tests
+    res = repo.infilled(min_correlation=-1.0, min_overlap_days=10)
+    assert (
+        np.isnan(res.streamflow_mmd.values).sum()
+        < np.isnan(repo.data.streamflow_mmd.values).sum()
+    )
+    assert (
+        res.streamflow_mmd.values[np.isfinite(repo.data.streamflow_mmd.values)]
+        == repo.data.streamflow_mmd.values[np.isfinite(repo.data.streamflow_mmd.values)]
+    ).all()
@@ -0,0 +1,66 @@
+import numpy as np
+import pytest
+import xarray as xr
+
+from camels_aus.cache import append_from_text_files
+from camels_aus.dtypes import decode_categorical
+from camels_aus.layout import (
+    STATION_MAJOR,
+    TIME_MAJOR,
+    dataset_layout,
+    fused_block,
+    with_layout,
+)
+from camels_aus.repository import CamelsAus
+
+
+def test_station_major_layout(repo):
+    ds = with_layout(repo.data, TIME_MAJOR)
+    assert dataset_layout(ds) == TIME_MAJOR
+    ds = with_layout(ds, STATION_MAJOR)
+    assert dataset_layout(ds) == STATION_MAJOR
+    xr.testing.assert_identical(ds, repo.data)
+    x = ds.streamflow_mmd.values
+    assert x.flags.f_contiguous
+    # the record of a station is a contiguous view
+    record = ds.streamflow_mmd[:, 2].values
+    assert record.flags.c_contiguous
+    assert np.shares_memory(record, x)
+    # already in the layout: not copied
+    assert with_layout(ds, STATION_MAJOR).streamflow_mmd.values is x
+    with pytest.raises(ValueError):
+        with_layout(ds, "column_major")
+
+
+def test_fused_block(repo):
+    varnames = ["precipitation_AWAP", "et_morton_actual_SILO", "streamflow_mmd"]
+    block = repo.station_block(varnames)
+    assert block.shape == (5, 3, 1096)
+    assert block.flags.c_contiguous and block.dtype == np.float64
+    np.testing.assert_array_equal(
+        block[3, 2], repo.data.streamflow_mmd[:, 3].values.astype(np.float64)
+    )
+    sub = fused_block(repo.data, varnames[:1], station_ids=["G0010005", "105101A"])
+    np.testing.assert_array_equal(sub[:, 0], block[[4, 1], 0])
+
+
+def _decoded(ds):
+    # memory-mapped quality codes are integer codes
+    return ds.assign(
+        streamflow_QualityCodes=decode_categorical(ds.streamflow_QualityCodes)
+    )
+
+
+def test_station_major_cache(repo, tmp_path):
+    cache_dir = str(tmp_path / "cache")
+    repo.save_to_cached_files(cache_dir, layout=STATION_MAJOR)
+    for mmap in [False, True]:
+        r = CamelsAus()
+        r.load_from_cached_files(cache_dir, mmap=mmap)
+        assert r.layout == STATION_MAJOR
+        xr.testing.assert_identical(_decoded(r.data), repo.data)
+    r.set_layout(TIME_MAJOR)
+    assert r.layout == TIME_MAJOR
+    xr.testing.assert_identical(_decoded(r.data), repo.data)
+    with pytest.raises(ValueError):
+        append_from_text_files(cache_dir, repo._source_directory)
@@ -0,0 +1,113 @@
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from camels_aus.cache import save_cache
+from camels_aus.memo import MEMO_SUBDIR, MemoStore, register_product
+from camels_aus.repository import CamelsAus
+
+
+def _write(directory, i):
+    store = MemoStore(directory, max_bytes=10**9)
+    store.put("key{0}".format(i % 3), np.full(1000, i % 3))
+    return store.get("key{0}".format(i % 3))[1].sum()
+
+
+def test_memo_store_lru_eviction(tmp_path):
+    store = MemoStore(str(tmp_path), max_bytes=25000)
+    for i in range(3):
+        store.put("k{0}".format(i), np.zeros(1000))
+        # distinct access times on coarse file systems
+        os.utime(store._filename("k{0}".format(i)), (i, i))
+    assert store.get("k0")[0]
+    store.put("k3", np.zeros(1000))
+    assert store.stats()["entries"] == 3
+    assert not "k1" in store
+    assert "k0" in store and "k3" in store
+    assert store.get("k1") == (False, None)
+    stats = store.stats()
+    assert (stats["hits"], stats["misses"], stats["writes"]) == (1, 1, 4)
+    assert stats["evictions"] == 1
+    assert stats["nbytes"] <= 25000
+    store.clear()
+    assert store.stats()["entries"] == 0
+
+
+def test_memo_store_concurrent_writers(tmp_path):
+    with ProcessPoolExecutor(max_workers=3) as pool:
+        sums = list(pool.map(_write, [str(tmp_path)] * 12, range(12)))
+    assert sums == [(i % 3) * 1000 for i in range(12)]
+    assert sorted(os.listdir(tmp_path)) == [".lock", "key0.pkl", "key1.pkl", "key2.pkl"]
+
+
+@register_product("station_totals")
+def _station_totals(ds, scale=1.0):
+    _station_totals.calls += 1
+    return ds.streamflow_mmd.sum("time").to_series() * scale
+
+
+_station_totals.calls = 0
+
+
+def test_derived_products_are_memoised(repo, tmp_path):
+    cache_dir = str(tmp_path / "cache")
+    repo.save_to_cached_files(cache_dir)
+    r = CamelsAus()
+    r.load_from_cached_files(cache_dir)
+    first = r.derived("station_totals", station_ids=["102101A", "912101A"], scale=2.0)
+    r.derived("station_totals", station_ids=["102101A", "912101A"], scale=2.0)
+    r.derived("station_totals", scale=2.0)
+    assert _station_totals.calls == 2
+    assert list(first.index) == ["102101A", "912101A"]
+    assert r.memo_store.stats()["hits"] == 1
+
+    r = CamelsAus()
+    r.load_from_cached_files(cache_dir)
+    maxima = r.derived("annual_maxima", water_year_start=7)
+    pd.testing.assert_frame_equal(
+        maxima, r.derived("annual_maxima", water_year_start=7)
+    )
+    assert r.memo_store.stats()["hits"] == 1
+    assert len(os.listdir(os.path.join(cache_dir, MEMO_SUBDIR))) == 4
+
+    # a rewrite of the cache with other values is a new fingerprint
+    doubled = repo.data.assign(streamflow_mmd=repo.data.streamflow_mmd * 2)
+    save_cache(doubled, cache_dir)
+    r = CamelsAus()
+    r.load_from_cached_files(cache_dir)
+    totals = r.derived("station_totals", station_ids=["102101A", "912101A"], scale=2.0)
+    assert _station_totals.calls == 3
+    np.testing.assert_allclose(totals.values, 2 * first.values, rtol=1e-6)
+
+
+def test_memoise_stamps_the_values(repo, tmp_path):
+    calls = []
+
+    def totals(ds, scale=1.0):
+        calls.append(scale)
+        return ds.streamflow_mmd.sum("time").values * scale
+
+    store = MemoStore(str(tmp_path))
+    memoised = store.memoise(totals, name="totals")
+    first = memoised(repo.data, scale=2.0)
+    np.testing.assert_array_equal(memoised(repo.data, scale=2.0), first)
+    assert len(calls) == 1
+    # same variables, stations and time axis, other values: a new result
+    doubled = repo.data.assign(streamflow_mmd=repo.data.streamflow_mmd * 2)
+    np.testing.assert_allclose(memoised(doubled, scale=2.0), 2 * first, rtol=1e-6)
+    assert len(calls) == 2
+
+    # a stamp given by the caller, or computed from the dataset
+    by_source = store.memoise(totals, name="totals", stamp="v1")
+    by_source(repo.data)
+    by_source(doubled)
+    assert len(calls) == 3
+    by_station = store.memoise(
+        totals, name="totals", stamp=lambda ds: str(ds.station_id.values[0])
+    )
+    by_station(repo.data)
+    assert len(calls) == 4
+    by_station(doubled)
+    assert len(calls) == 4
@@ -0,0 +1,74 @@
+import os
+
+import numpy as np
+import pytest
+
+pytest.importorskip("pyarrow")
+
+from camels_aus.conventions import get_xr_units
+from camels_aus.repository import CamelsAus
+
+
+@pytest.mark.parametrize("partition_by", ["station", "drainage_division"])
+def test_parquet_round_trip(repo, tmp_path, partition_by):
+    import pyarrow.parquet as pq
+
+    out_dir = str(tmp_path / partition_by)
+    repo.to_parquet(out_dir, partition_by=partition_by)
+    assert os.path.exists(os.path.join(out_dir, "attributes.parquet"))
+    assert os.path.exists(os.path.join(out_dir, "gauging_stats.parquet"))
+
+    r = CamelsAus()
+    r.load_from_parquet(out_dir)
+    for v in ["streamflow_mmd", "precipitation_AWAP", "tmax_awap"]:
+        np.testing.assert_array_equal(r.data[v].values, repo.data[v].values)
+        assert get_xr_units(r.data[v]) == get_xr_units(repo.data[v])
+    assert (r.data.time.values == repo.data.time.values).all()
+    assert (
+        r.data.streamflow_QualityCodes.values
+        == repo.data.streamflow_QualityCodes.values
+    ).all()
+    np.testing.assert_array_equal(
+        r.data.catchment_area.values, repo.data.catchment_area.values
+    )
+    assert list(r.data.geol_prim.values) == list(repo.data.geol_prim.values)
+
+    if partition_by == "drainage_division":
+        fn = os.path.join(
+            out_dir, "daily", "drainage_division=North%20East%20Coast", "part-0.parquet"
+        )
+        md = pq.ParquetFile(fn).metadata
+        # one row group per station, with statistics
+        assert md.num_row_groups == 2
+        assert md.row_group(0).column(1).statistics.has_min_max
+
+
+def test_parquet_subset(repo, tmp_path):
+    out_dir = str(tmp_path / "subset")
+    repo.to_parquet(out_dir, partition_by="drainage_division")
+    r = CamelsAus()
+    r.load_from_parquet(
+        out_dir, station_ids=["912101A", "102101A"], varnames=["streamflow_mmd"]
+    )
+    assert list(r.data.station_id.values) == ["912101A", "102101A"]
+    np.testing.assert_array_equal(
+        r.data.streamflow_mmd.values,
+        repo.data.streamflow_mmd.sel(station_id=["912101A", "102101A"]).values,
+    )
+    assert not "precipitation_AWAP" in r.data
+
+
+def test_loaders_reset_derived_state(repo, tmp_path):
+    cache_dir = str(tmp_path / "cache")
+    repo.save_to_cached_files(cache_dir)
+    out_dir = str(tmp_path / "parquet")
+    repo.to_parquet(out_dir)
+    r = CamelsAus()
+    r.load_from_cached_files(cache_dir)
+    assert r.simplified_boundaries is not None
+    assert r.gap_index is not None
+    r.load_from_parquet(out_dir)
+    assert r._cache_directory is None and r._version is None
+    assert r._source_directory is None and r._boundaries_fn is None
+    assert r._simplified_boundaries is None and r._gap_index is None
+    assert r.simplified_boundaries is None
@@ -0,0 +1,44 @@
+import numpy as np
+import pytest
+
+from camels_aus.quality import QualityMasks
+
+
+def test_quality_masks_packed():
+    codes = np.array([["A", "E"], ["B", np.nan], ["E", "A"]] * 5, dtype=object)
+    masks = QualityMasks(codes)
+    assert masks.categories == ["A", "B", "E"]
+    keep = masks.keep("exclude_estimated")
+    np.testing.assert_array_equal(keep, codes != "E")
+    np.testing.assert_array_equal(masks.counts("exclude_estimated"), [10, 10])
+    np.testing.assert_array_equal(
+        masks.keep("best_available", 4, 11), codes[4:11] == "A"
+    )
+    masks.define("a_or_b", include=["A", "B"])
+    np.testing.assert_array_equal(masks.counts("a_or_b"), [10, 5])
+    with pytest.raises(ValueError):
+        masks.define("bad")
+    with pytest.raises(KeyError):
+        masks.packed("unknown")
+
+
+def test_quality_filtered_view(repo):
+    q = repo.data.streamflow_mmd
+    codes = repo.data.streamflow_QualityCodes
+    expected = q.where(codes != "E")
+    view = repo.quality_filtered("exclude_estimated")
+    np.testing.assert_array_equal(view.values, expected.values)
+    sub = view.sel(station_ids=["912101A"], start="2001-03-05", end="2001-04-20")
+    np.testing.assert_array_equal(
+        sub.values,
+        expected.sel(
+            station_id=["912101A"], time=slice("2001-03-05", "2001-04-20")
+        ).values,
+    )
+    np.testing.assert_array_equal(view[13:99, 2], expected.values[13:99, 2])
+    np.testing.assert_array_equal(view.counts(), (codes != "E").sum(dim="time").values)
+
+    repo.define_quality_filter("good", include=["A", "B"])
+    good = repo.quality_filtered("good").values
+    np.testing.assert_array_equal(good, q.where(codes.isin(["A", "B"])).values)
+    assert repo.quality_filtered("best_available").name == "best_available"
@@ -0,0 +1,64 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+pytest.importorskip("scipy")
+
+from camels_aus.regional import RegionalAggregator
+from camels_aus.repository import CamelsAus
+
+
+def test_aggregator_nan_aware():
+    agg = RegionalAggregator(["b", "a", "b", "a"], [1.0, 2.0, 3.0, 1.0])
+    assert list(agg.labels) == ["a", "b"]
+    assert list(agg.n_stations) == [2, 2]
+    x = np.array([[1.0, 2.0, 3.0, 5.0], [np.nan, np.nan, 3.0, np.nan]])
+    res = agg.aggregate(x)
+    np.testing.assert_allclose(res[0], [(2 * 2 + 5) / 3, (1 + 9) / 4])
+    assert np.isnan(res[1, 0])
+    assert res[1, 1] == 3.0
+
+
+def test_regional_series_match_groupby(repo):
+    ds = repo.data
+    res = repo.regional_series(by="drainage_division")
+    assert res.streamflow_mmd.dims == ("time", "drainage_division")
+    assert not "streamflow_QualityCodes" in res
+    assert list(res.n_stations.values) == [1, 2, 2]
+
+    q = ds.streamflow_mmd.to_pandas()
+    area = ds.catchment_area.to_pandas()
+    groups = ds.drainage_division.to_pandas()
+    for g in res.drainage_division.values:
+        stations = groups.index[groups == g]
+        w = q[stations].notna() * area[stations]
+        expected = (q[stations].fillna(0) * area[stations]).sum(axis=1) / w.sum(axis=1)
+        np.testing.assert_allclose(
+            res.streamflow_mmd.sel(drainage_division=g).values, expected.values
+        )
+
+    monthly = repo.regional_series(
+        by="river_region", varnames=["precipitation_AWAP"], freq="M"
+    )
+    daily = repo.regional_series(by="river_region", varnames=["precipitation_AWAP"])
+    assert monthly.sizes["time"] == 36
+    expected = daily.precipitation_AWAP.to_pandas().resample("MS").mean()
+    np.testing.assert_allclose(monthly.precipitation_AWAP.values, expected.values)
+    annual = repo.regional_series(by="river_region", freq="Y")
+    assert annual.sizes["time"] == 3
+    assert pd.Timestamp(annual.time.values[1]) == pd.Timestamp("2001-01-01")
+
+
+def test_regional_series_skip_memory_mapped_quality_codes(repo, tmp_path):
+    cache_dir = str(tmp_path / "cache")
+    repo.save_to_cached_files(cache_dir)
+    r = CamelsAus()
+    r.load_from_cached_files(cache_dir, mmap=True)
+    assert r.data.streamflow_QualityCodes.dtype == np.int8
+    res = r.regional_series(by="drainage_division")
+    assert not "streamflow_QualityCodes" in res
+    expected = repo.regional_series(by="drainage_division")
+    assert sorted(res.data_vars) == sorted(expected.data_vars)
+    np.testing.assert_allclose(
+        res.streamflow_mmd.values, expected.streamflow_mmd.values, rtol=1e-6
+    )
@@ -0,0 +1,89 @@
+import os
+
+import numpy as np
+import pandas as pd
+
+from camels_aus.cache import save_cache
+from camels_aus.repository import CamelsAus
+from camels_aus.resample import RESAMPLED_SUBDIR, PeriodMapping
+
+
+def test_period_mapping():
+    time = pd.date_range("2000-05-15", "2002-08-10").values
+    m = PeriodMapping(time, "M")
+    assert len(m) == 28
+    assert str(m.labels[0]) == "2000-05-01"
+    assert m.period_days[0] == 31 and m.period_days[9] == 28
+    wy = PeriodMapping(time, "WY", water_year_start=7)
+    assert [str(d) for d in wy.labels] == [
+        "1999-07-01",
+        "2000-07-01",
+        "2001-07-01",
+        "2002-07-01",
+    ]
+    assert wy.period_days.tolist() == [366, 365, 365, 365]
+    y = PeriodMapping(time, "Y")
+    assert [str(d)[:4] for d in y.labels] == ["2000", "2001", "2002"]
+
+    x = np.ones((len(time), 2))
+    x[: 17 + 30, 1] = np.nan
+    res, completeness = m.reduce(x, "sum", min_completeness=0.9)
+    # May 2000 is partial: 17 days of 31
+    assert np.isnan(res[0, 0]) and completeness[0, 0] == 17 / 31
+    assert res[1, 0] == 30 and np.isnan(res[1, 1])
+    assert res[2, 1] == 31
+
+
+def test_resampled_matches_xarray_and_is_memoised(repo, tmp_path):
+    ds = repo.data
+    monthly = repo.resampled("M", "sum")
+    expected = ds.precipitation_AWAP.resample(time="MS").sum(skipna=True)
+    np.testing.assert_allclose(
+        monthly.precipitation_AWAP.values, expected.values, rtol=1e-5
+    )
+    means = repo.resampled("WY", "mean", min_completeness=0.5, water_year_start=7)
+    assert pd.Timestamp(means.time.values[0]) == pd.Timestamp("1999-07-01")
+    # the first water year has half of its days: 182 of 366
+    assert np.isnan(means.tmax_awap.values[0]).all()
+    sel = ds.tmax_awap.sel(time=slice("2000-07-01", "2001-06-30")).mean(dim="time")
+    np.testing.assert_allclose(means.tmax_awap.values[1], sel.values, rtol=1e-5)
+
+    cache_dir = str(tmp_path / "cache")
+    repo.save_to_cached_files(cache_dir)
+    r = CamelsAus()
+    r.load_from_cached_files(cache_dir)
+    res = r.resampled("Y", "sum", varnames=["streamflow_mmd"])
+    assert len(os.listdir(os.path.join(cache_dir, RESAMPLED_SUBDIR))) == 1
+    r = CamelsAus()
+    r.load_from_cached_files(cache_dir)
+    again = r.resampled("Y", "sum", varnames=["streamflow_mmd"])
+    np.testing.assert_array_equal(
+        again.streamflow_mmd.values, res.streamflow_mmd.values
+    )
+    assert again.streamflow_mmd.attrs == res.streamflow_mmd.attrs
+    assert list(again.station_id.values) == list(res.station_id.values)
+
+    # a rewrite of the cache with other values discards the memoised series
+    doubled = repo.data.assign(streamflow_mmd=repo.data.streamflow_mmd * 2)
+    save_cache(doubled, cache_dir)
+    assert not os.path.exists(os.path.join(cache_dir, RESAMPLED_SUBDIR))
+    r = CamelsAus()
+    r.load_from_cached_files(cache_dir)
+    res2 = r.resampled("Y", "sum", varnames=["streamflow_mmd"])
+    np.testing.assert_allclose(
+        res2.streamflow_mmd.values, 2 * res.streamflow_mmd.values, rtol=1e-6
+    )
+
+
+def test_memory_mapped_quality_codes_not_resampled(repo, tmp_path):
+    cache_dir = str(tmp_path / "cache")
+    repo.save_to_cached_files(cache_dir)
+    r = CamelsAus()
+    r.load_from_cached_files(cache_dir, mmap=True)
+    # integer codes of a categorical variable, not numbers
+    assert r.data.streamflow_QualityCodes.dtype == np.int8
+    res = r.resampled("M", "sum")
+    assert "streamflow_mmd" in res
+    assert sorted(res.data_vars) == sorted(repo.resampled("M", "sum").data_vars)
+    assert not "streamflow_QualityCodes" in res
+    assert not "streamflow_QualityCodes_completeness" in res
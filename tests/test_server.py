@@ -0,0 +1,75 @@
+import asyncio
+import json
+
+import numpy as np
+import pytest
+
+pytest.importorskip("aiohttp")
+
+from aiohttp.test_utils import TestClient, TestServer
+
+from camels_aus.server import ResponseCache, create_app
+
+
+def _run(repo, scenario):
+    async def main():
+        cache = ResponseCache(4)
+        app = create_app(repo, response_cache=cache)
+        async with TestClient(TestServer(app, host="127.0.0.1")) as client:
+            await scenario(cache, client)
+
+    asyncio.run(main())
+
+
+def test_series_etag_and_cache(repo):
+    async def scenario(cache, client):
+        url = (
+            "/stations/912101A/series?variables=streamflow_mmd,tmax_awap&end=2000-01-31"
+        )
+        responses = await asyncio.gather(*[client.get(url) for _ in range(5)])
+        assert all(r.status == 200 for r in responses)
+        content = json.loads(await responses[0].text())
+        assert len(content["time"]) == 31
+        expected = repo.data.tmax_awap.sel(station_id="912101A").values[:31]
+        np.testing.assert_allclose(content["tmax_awap"], expected, rtol=1e-6)
+        etag = responses[0].headers["ETag"]
+        r = await client.get(url, headers={"If-None-Match": etag})
+        assert r.status == 304
+        assert len(cache) == 1
+
+        r = await client.get("/stations/nonexistent/series")
+        assert r.status == 404
+        r = await client.get("/stations/912101A/series?variables=nope")
+        assert r.status == 404
+
+    _run(repo, scenario)
+
+
+def test_attributes_boundaries_arrow(repo):
+    pa = pytest.importorskip("pyarrow")
+
+    async def scenario(cache, client):
+        r = await client.get("/stations")
+        assert len(json.loads(await r.text())) == 5
+        r = await client.get("/stations/102101A/attributes")
+        content = json.loads(await r.text())
+        assert content["catchment_area"] == 100.0
+        assert content["notes"] is None
+        r = await client.get("/attributes?format=arrow")
+        table = pa.ipc.open_stream(await r.read()).read_all()
+        assert table.num_rows == 5
+        r = await client.get("/boundaries")
+        assert len(json.loads(await r.text())["features"]) == 5
+
+    _run(repo, scenario)
+
+
+def test_response_cache_lru():
+    c = ResponseCache(2)
+    c.put("a", b"1", "text/plain")
+    c.put("b", b"2", "text/plain")
+    c.get("a")
+    c.put("c", b"3", "text/plain")
+    assert c.get("b") is None
+    assert c.get("a") is not None
+    assert c.hits == 2 and c.misses == 1
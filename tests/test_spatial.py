@@ -0,0 +1,105 @@
+import json
+
+import numpy as np
+import pytest
+
+shapely = pytest.importorskip("shapely")
+
+from camels_aus.repository import CamelsAus
+from camels_aus.spatial import (
+    CatchmentIndex,
+    SimplifiedBoundaries,
+    bbox_tile_zoom,
+    tile_bounds,
+    tiles_covering,
+)
+
+
+def _wiggly_boundaries():
+    import geopandas as gpd
+
+    t = np.linspace(0, 2 * np.pi, 2000, endpoint=False)
+    geoms = []
+    for cx in [140.0, 142.0, 150.0]:
+        r = 0.5 + 0.01 * np.sin(40 * t)
+        geoms.append(
+            shapely.Polygon(np.column_stack([cx + r * np.cos(t), -30 + r * np.sin(t)]))
+        )
+    return gpd.GeoDataFrame(
+        {"station_id": ["a", "b", "c"]}, geometry=geoms, crs="EPSG:4283"
+    )
+
+
+def test_levels_of_detail_and_bbox():
+    sb = SimplifiedBoundaries.build(_wiggly_boundaries())
+    n_coords = [shapely.get_num_coordinates(g).sum() for g in sb.levels]
+    assert n_coords[0] > n_coords[-1]
+    assert all(np.diff(n_coords) <= 0)
+    assert sb.level_for_zoom(2) == len(sb.levels) - 1
+    assert sb.level_for_zoom(18) == 0
+
+    gj = json.loads(sb.geojson(bbox=(139.0, -31.0, 141.0, -29.0), zoom=8))
+    assert [f["id"] for f in gj["features"]] == ["a"]
+    gj = json.loads(sb.geojson(bbox=(139.0, -31.0, 143.0, -29.0), zoom=8))
+    assert [f["id"] for f in gj["features"]] == ["a", "b"]
+    assert len(json.loads(sb.geojson())["features"]) == 3
+
+    z, x, y = tiles_covering((139.9, -30.1, 140.1, -29.9), 6)[0]
+    xmin, ymin, xmax, ymax = tile_bounds(z, x, y)
+    assert xmin <= 140.0 <= xmax and ymin <= -30.0 <= ymax
+    s = sb.tile_geojson(z, x, y)
+    assert sb.tile_geojson(z, x, y) is s
+    assert "a" in [f["id"] for f in json.loads(s)["features"]]
+
+    # bounding box queries go through the bounded cache of tiles
+    sb = SimplifiedBoundaries(sb.station_ids, sb.levels, sb.tolerances, 2)
+    bbox = (139.0, -31.0, 143.0, -29.0)
+    gj = sb.geojson(bbox=bbox, zoom=8)
+    assert [f["id"] for f in json.loads(gj)["features"]] == ["a", "b"]
+    level = sb.level_for_zoom(8)
+    keys = set([(level,) + t for t in tiles_covering(bbox, bbox_tile_zoom(bbox))])
+    assert set(sb._tile_cache.keys()) == keys
+    assert sb.geojson(bbox=bbox, zoom=8) == gj
+    sb.geojson(bbox=(149.0, -31.0, 151.0, -29.0))
+    assert len(sb._tile_cache) == 2
+
+
+def test_levels_of_detail_cached_with_dataset(repo, tmp_path):
+    cache_dir = str(tmp_path / "cache")
+    repo.save_to_cached_files(cache_dir)
+    assert SimplifiedBoundaries.exists(cache_dir)
+    r = CamelsAus()
+    r.load_from_cached_files(cache_dir)
+    gj = json.loads(r.boundaries_geojson(bbox=(140.2, -29.8, 140.4, -29.6), zoom=10))
+    assert [f["id"] for f in gj["features"]] == ["102101A"]
+    # served from the cache, without reading the boundaries file
+    assert r._boundaries is None
+
+
+def test_spatial_index_points_and_polygons():
+    index = CatchmentIndex.from_boundaries(_wiggly_boundaries())
+    lon = np.array([140.0, 142.1, 145.0, 150.2, 140.05])
+    lat = np.full(5, -30.0)
+    res = index.catchments_containing(lon, lat)
+    found = dict(zip(res.point, res.station_id))
+    assert found == {0: "a", 1: "b", 3: "c", 4: "a"}
+
+    footprint = shapely.box(141.0, -31.0, 142.0, -29.0)
+    res = index.catchments_intersecting(
+        [footprint, shapely.box(0, 0, 1, 1)], overlap_fractions=True
+    )
+    assert list(res.station_id) == ["b"]
+    assert list(res.geometry) == [0]
+    # half of catchment 'b' is west of its centre
+    assert abs(res.overlap_fraction.values[0] - 0.5) < 0.02
+
+
+def test_spatial_index_from_cache(repo, tmp_path):
+    cache_dir = str(tmp_path / "cache")
+    repo.save_to_cached_files(cache_dir)
+    r = CamelsAus()
+    r.load_from_cached_files(cache_dir)
+    res = r.spatial_index.catchments_containing([140.5, 141.2], [-29.5, -29.5])
+    assert list(res.station_id) == ["102101A"]
+    assert r.spatial_index is r.spatial_index
+    assert r._boundaries is None
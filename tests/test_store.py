@@ -0,0 +1,74 @@
+import os
+import shutil
+
+import numpy as np
+import pandas as pd
+
+from camels_aus.conventions import get_xr_units
+from camels_aus.repository import CamelsAus
+from camels_aus.store import ContentStore
+
+
+def test_store_versions_share_objects_and_parsed_caches(camels_dir, repo, tmp_path):
+    store = ContentStore(str(tmp_path / "store"))
+    store.add_directory("1.0", camels_dir)
+
+    # a patched variant differing only by its precipitation file
+    patched_dir = str(tmp_path / "patched")
+    shutil.copytree(camels_dir, patched_dir)
+    precip_fn = os.path.join(
+        patched_dir,
+        "05_hydrometeorology",
+        "01_precipitation_timeseries",
+        "precipitation_AWAP.csv",
+    )
+    df = pd.read_csv(precip_fn)
+    df["102101A"] = df["102101A"] * 2
+    df.to_csv(precip_fn, index=False)
+    store.add_directory("1.0-patched", patched_dir)
+
+    assert store.versions() == ["1.0", "1.0-patched"]
+    f1, f2 = store.files("1.0"), store.files("1.0-patched")
+    changed = [k for k in f1 if f1[k] != f2[k]]
+    assert changed == [
+        "05_hydrometeorology/01_precipitation_timeseries/precipitation_AWAP.csv"
+    ]
+    usage = store.usage()
+    assert usage["stored_bytes"] < usage["logical_bytes"]
+
+    r = CamelsAus()
+    r.load_from_store(store, "1.0")
+    np.testing.assert_array_equal(
+        r.data.streamflow_mmd.values, repo.data.streamflow_mmd.values
+    )
+    assert (
+        r.data.streamflow_QualityCodes.values
+        == repo.data.streamflow_QualityCodes.values
+    ).all()
+    parsed_dir = os.path.join(store.root, "parsed")
+    n_parsed = len(os.listdir(parsed_dir))
+    assert n_parsed == 8
+
+    r.load_from_store(store.root, "1.0-patched")
+    # only the modified file was parsed again
+    assert len(os.listdir(parsed_dir)) == n_parsed + 1
+    np.testing.assert_allclose(
+        r.data.precipitation_AWAP.sel(station_id="102101A").values,
+        2 * repo.data.precipitation_AWAP.sel(station_id="102101A").values,
+        rtol=1e-6,
+    )
+    np.testing.assert_array_equal(r.data.tmax_awap.values, repo.data.tmax_awap.values)
+
+
+def test_parsed_series_keyed_on_parse_parameters(camels_dir, tmp_path):
+    store = ContentStore(str(tmp_path / "store"))
+    store.add_directory("1.0", camels_dir)
+    fn = "03_streamflow/streamflow_mmd.csv"
+    default = store.load_time_series("1.0", fn, units="mm", dtype=np.float64)
+    assert default.dtype == np.float64
+    x = store.load_time_series("1.0", fn, units="mm/d", dtype=np.float32)
+    assert x.dtype == np.float32 and get_xr_units(x) == "mm/d"
+    x = store.load_time_series("1.0", fn, is_missing=lambda x: x > 1.0, dtype=float)
+    assert x.isnull().sum() > default.isnull().sum()
+    x = store.load_time_series("1.0", fn, units="mm", dtype=np.float64)
+    assert get_xr_units(x) == "mm" and x.isnull().sum() == default.isnull().sum()
@@ -0,0 +1,47 @@
+import numpy as np
+import pytest
+
+from camels_aus.conventions import get_xr_units
+from camels_aus.units import conversion
+
+
+def test_conversion_factors():
+    factor, offset = conversion("°C", "K")
+    assert (factor, offset) == (1.0, 273.15)
+    factor, offset = conversion("K", "degC")
+    assert factor * 300.0 + offset == pytest.approx(26.85)
+    factor, offset = conversion("m^3/s", "ML/d")
+    assert factor == pytest.approx(86.4)
+    factor, offset = conversion("mm/d", "m3/s", np.array([1.0, 86.4]))
+    np.testing.assert_allclose(factor, [1.0 / 86.4, 1.0])
+    assert conversion("mm", "mm/d") == (1.0, 0.0)
+    with pytest.raises(ValueError):
+        conversion("mm", "K")
+    with pytest.raises(ValueError):
+        conversion("mm", "ML/d")
+    with pytest.raises(KeyError):
+        conversion("furlong", "mm")
+
+
+def test_converted_views(repo):
+    q = repo.data.streamflow_mmd
+    area = repo.data.catchment_area
+    view = repo.converted("streamflow_mmd", "ML/d")
+    np.testing.assert_allclose(view.values, (q * area).values, rtol=1e-6)
+    sub = view.sel(station_ids=["105101A"], start="2001-01-01", end="2001-01-31")
+    assert sub.shape == (31, 1)
+    assert get_xr_units(sub) == "ML/d"
+    np.testing.assert_allclose(
+        sub.values[:, 0],
+        q.sel(station_id="105101A", time=slice("2001-01-01", "2001-01-31")).values
+        * 250.0,
+        rtol=1e-6,
+    )
+    np.testing.assert_allclose(view[10:20, 2], q.values[10:20, 2] * 1000.0, rtol=1e-6)
+    # the series itself is unchanged
+    assert get_xr_units(q) == "mm"
+
+    tmax = repo.converted("tmax_awap", "K")
+    np.testing.assert_allclose(
+        tmax.values, repo.data.tmax_awap.values + 273.15, rtol=1e-6
+    )
@@ -0,0 +1,80 @@
+import os
+import shutil
+
+import pandas as pd
+import pytest
+
+from camels_aus.cli import main
+from camels_aus.read import load_csv_stations_columns
+from camels_aus.validate import compute_checksums, validate_directory
+
+
+def test_valid_directory(camels_dir):
+    report = validate_directory(camels_dir, checksums=compute_checksums(camels_dir))
+    assert report.ok, report.issues
+    assert report.checks == [
+        "presence",
+        "checksums",
+        "headers",
+        "stations",
+        "time",
+        "values",
+    ]
+
+
+def test_corrupt_directory(camels_dir, tmp_path):
+    d = str(tmp_path / "camels")
+    shutil.copytree(camels_dir, d)
+    checksums = compute_checksums(camels_dir)
+    awap = os.path.join(d, "05_hydrometeorology", "03_Other", "AWAP")
+    os.remove(os.path.join(awap, "vprp_AWAP.csv"))
+    fn = os.path.join(awap, "tmax_AWAP.csv")
+    df = pd.read_csv(fn)
+    df.drop(index=10).drop(columns="912101A").to_csv(fn, index=False)
+    fn = os.path.join(d, "03_streamflow", "streamflow_mmd.csv")
+    df = pd.read_csv(fn)
+    df.loc[5, "102101A"] = 5000.0
+    df.to_csv(fn, index=False)
+
+    report = validate_directory(d, checksums=checksums)
+    assert not report.ok
+    issues = report.to_frame()
+    assert set(issues.check) == {"presence", "checksums", "stations", "time", "values"}
+    assert len(issues[issues.check == "presence"]) == 1
+    assert set(issues[issues.check == "checksums"].file) == {
+        "03_streamflow/streamflow_mmd.csv",
+        "05_hydrometeorology/03_Other/AWAP/tmax_AWAP.csv",
+        "05_hydrometeorology/03_Other/AWAP/vprp_AWAP.csv",
+    }
+    assert list(issues[issues.check == "time"].variable) == ["tmax_awap"] * 2
+    assert "912101A" in issues[issues.check == "stations"].message.iloc[0]
+    values = issues[issues.check == "values"]
+    assert list(values.variable) == ["streamflow_mmd"]
+    assert "102101A" in values.message.iloc[0]
+
+    # the range checks are optional, the other checks read headers and dates only
+    report = validate_directory(d, values=False)
+    assert not "values" in report.checks
+    assert main(["validate", d, "--no-values"]) == 1
+    assert main(["validate", camels_dir]) == 0
+
+
+def test_missing_columns_raise(camels_dir):
+    fn = os.path.join(camels_dir, "01_id_name_metadata", "id_name_metadata.csv")
+    with pytest.raises(ValueError, match="not_a_column"):
+        load_csv_stations_columns(fn, ["station_name", "not_a_column"])
+
+
+def test_non_numeric_values(camels_dir, tmp_path):
+    d = str(tmp_path / "camels")
+    shutil.copytree(camels_dir, d)
+    fn = os.path.join(d, "03_streamflow", "streamflow_mmd.csv")
+    df = pd.read_csv(fn).astype({"102101A": object})
+    df.loc[5, "102101A"] = "abc"
+    df.to_csv(fn, index=False)
+
+    issues = validate_directory(d).to_frame()
+    assert list(issues.check) == ["values"]
+    assert list(issues.variable) == ["streamflow_mmd"]
+    assert "1 values are not numbers" in issues.message.iloc[0]
+    assert "102101A" in issues.message.iloc[0]